@@ -0,0 +1,186 @@
+# =============================================================================
+# MODULES
+# =============================================================================
+import numpy
+
+import argparse
+import concurrent.futures
+import contextlib
+import os
+import sys
+import json
+import csv
+
+import colorShredder
+import colorTools
+import config
+
+
+# =============================================================================
+# MACROS
+# =============================================================================
+# arguments that decide the colors of a painting; seeded jobs with the same values share one color table
+COLOR_OPTIONS = ['c', 'x', 'hls', 'hsv', 'seed']
+
+# columns of the summary file, one row per job
+SUMMARY_FIELDS = ['name', 'directory', 'seconds', 'pixels', 'collisions', 'error']
+
+DEFAULT_BATCH = dict(
+    OUTPUT_DIRECTORY = "batch",
+    WORKERS = (os.cpu_count() or 1),
+    SUMMARY_NAME = "batch.csv",
+    LOG_NAME = "log.txt"
+)
+
+# Arguments
+BATCH_PARSER = argparse.ArgumentParser(
+    description="Paints every job of a manifest across a pool of processes, each job in its own output directory. The manifest is a JSON list of jobs, or an object with a \"jobs\" list and \"defaults\" shared by every job. A job is an object of colorShredder.py arguments named without their dashes, for example {\"d\": [128, 128], \"q\": 2, \"numpy\": true, \"seed\": 1}, with an optional \"name\" for its directory and \"backend\" to paint with.",
+    allow_abbrev=False
+)
+BATCH_PARSER.add_argument('manifest', metavar='manifest', help='JSON file of the jobs to paint', type=str)
+BATCH_PARSER.add_argument('-o', metavar='dir', help='directory to make the job directories in', default=DEFAULT_BATCH['OUTPUT_DIRECTORY'], type=str)
+BATCH_PARSER.add_argument('-p', metavar='procs', help='number of jobs painted at once', default=DEFAULT_BATCH['WORKERS'], type=int)
+
+
+# =============================================================================
+# BATCH
+# =============================================================================
+def main():
+
+    batch_args = BATCH_PARSER.parse_args()
+
+    # Setup
+    list_jobs = readManifest(batch_args.manifest)
+    output_directory = os.path.abspath(batch_args.o)
+    colors_directory = os.path.join(output_directory, 'colors')
+    os.makedirs(colors_directory, exist_ok=True)
+
+    # check every job before painting any, and find the color tables they can share
+    #   a job that cannot be painted is reported as failed, the others are still painted
+    dict_colors_names = {}
+    list_results = []
+    list_valid_jobs = []
+    set_perceptual_bit_depths = set()
+    for job in list_jobs:
+        try:
+            job_args = config.makeArgs(**job['options'])
+            if (job['backend'] is not None):
+                if (job['backend'] not in colorShredder.BACKEND_WORK):
+                    raise ValueError("Unknown backend " + job['backend'])
+                job_args = colorShredder.getBackendArgs(job_args, job['backend'])
+        except Exception as error:
+            print("    {}: failed, {}".format(job['name'], repr(error)))
+            list_results.append(dict(error=repr(error), name=job['name'], directory=os.path.join(output_directory, job['name'])))
+            continue
+        job['args'] = job_args
+        list_valid_jobs.append(job)
+        if (job_args.oklab):
+            set_perceptual_bit_depths.add(colorTools.getPerceptualBitDepth(job_args))
+        job['colors_name'] = None
+        if (job['options'].get('seed') is not None):
+            colors_key = tuple(getattr(job_args, option_name) for option_name in COLOR_OPTIONS)
+            job['colors_name'] = dict_colors_names.setdefault(colors_key, os.path.join(colors_directory, ('_'.join(str(option_value) for option_value in colors_key) + '.npy')))
+
+    # the perceptual tables are made once here, rather than by every process that first needs them
+    for color_bit_depth in set_perceptual_bit_depths:
+        print("Generating the perceptual table of bit depth " + str(color_bit_depth) + "...")
+        colorTools.getPerceptualTable(color_bit_depth)
+
+    number_of_workers = max(1, min(batch_args.p, len(list_valid_jobs)))
+    with concurrent.futures.ProcessPoolExecutor(number_of_workers) as batch_manager:
+
+        # generate each shared color table once, a job whose colors could not be generated generates its own
+        print("Generating " + str(len(dict_colors_names)) + " color tables...")
+        dict_color_work_queue = {batch_manager.submit(generateColorTable, dict(zip(COLOR_OPTIONS, colors_key)), colors_name): colors_name for colors_key, colors_name in dict_colors_names.items() if not (os.path.exists(colors_name))}
+        for color_worker in concurrent.futures.as_completed(dict_color_work_queue):
+            try:
+                color_worker.result()
+            except Exception as error:
+                print("    " + dict_color_work_queue[color_worker] + ": failed, " + repr(error))
+                for job in list_valid_jobs:
+                    if (job['colors_name'] == dict_color_work_queue[color_worker]):
+                        job['colors_name'] = None
+
+        # paint the jobs, a process paints its next job as soon as it is done with the last
+        print("Painting " + str(len(list_valid_jobs)) + " jobs with " + str(number_of_workers) + " processes...")
+        dict_job_work_queue = {batch_manager.submit(runJob, job['args'], job['backend'], job['colors_name'], os.path.join(output_directory, job['name'])): job for job in list_valid_jobs}
+
+        for job_worker in concurrent.futures.as_completed(dict_job_work_queue):
+            job = dict_job_work_queue[job_worker]
+            try:
+                job_result = job_worker.result()
+                print("    {}: {:3.3f} seconds".format(job['name'], job_result['seconds']))
+            except Exception as error:
+                job_result = dict(error=repr(error))
+                print("    {}: failed, {}".format(job['name'], repr(error)))
+            list_results.append(dict(job_result, name=job['name'], directory=os.path.join(output_directory, job['name'])))
+
+    summary_name = os.path.join(output_directory, DEFAULT_BATCH['SUMMARY_NAME'])
+    with open(summary_name, 'w', newline='') as csvfile:
+        summary_writer = csv.DictWriter(csvfile, fieldnames=SUMMARY_FIELDS)
+        summary_writer.writeheader()
+        summary_writer.writerows(sorted(list_results, key=lambda job_result: job_result['name']))
+    print("Summary written to " + summary_name)
+
+    return int(any(job_result.get('error') for job_result in list_results))
+
+
+# gives the jobs of a manifest, each with its name, backend and painting options
+def readManifest(manifest_name):
+
+    with open(manifest_name) as manifest_file:
+        manifest = json.load(manifest_file)
+    if (isinstance(manifest, list)):
+        manifest = dict(jobs=manifest)
+
+    list_jobs = []
+    for index, job in enumerate(manifest['jobs']):
+        job_options = dict(manifest.get('defaults', {}), **job)
+        list_jobs.append(dict(
+            name = str(job_options.pop('name', "job{:04d}".format(index))),
+            backend = job_options.pop('backend', None),
+            options = job_options
+        ))
+
+    job_names = [job['name'] for job in list_jobs]
+    if (len(set(job_names)) != len(job_names)):
+        raise ValueError("Every job of " + manifest_name + " needs its own name")
+
+    return list_jobs
+
+
+# runs in a batch process: generates the colors of the given color options and seed, saving them for the jobs that share them
+def generateColorTable(color_options, colors_name):
+
+    color_args = config.makeArgs(**color_options)
+    with contextlib.redirect_stdout(open(os.devnull, 'w')):
+        list_colors = colorTools.generateColors(color_args, numpy.random.RandomState(color_args.seed))
+
+    # written under a temporary name, so a table is only found once it is complete
+    with open(colors_name + '.tmp', 'wb') as colors_file:
+        numpy.save(colors_file, list_colors)
+    os.replace(colors_name + '.tmp', colors_name)
+
+
+# runs in a batch process: paints a job in its directory, logging what the painting prints; gives its stats
+#   the job is painted with the arguments made for it by the main process, whose paths are absolute and so are found from the job directory
+#   the backends loaded by earlier jobs of the process are kept, so only the first job of each process compiles them
+#   a shared color table is mapped read only rather than loaded, so the processes share one copy of it
+def runJob(job_args, backend_name, colors_name, job_directory):
+
+    os.makedirs(job_directory, exist_ok=True)
+    os.chdir(job_directory)
+
+    list_colors = None
+    if (colors_name):
+        list_colors = numpy.load(colors_name, mmap_mode='r').view(numpy.ndarray)
+
+    with open(DEFAULT_BATCH['LOG_NAME'], 'w') as log_file, contextlib.redirect_stdout(log_file):
+        job_painter = colorShredder.Painter(job_args, backend_name=backend_name, list_colors=list_colors)
+        time_elapsed = job_painter.run()
+
+    return dict(seconds=time_elapsed, pixels=job_painter.count_colors_placed, collisions=job_painter.count_collisions)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
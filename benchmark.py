@@ -0,0 +1,208 @@
+# =============================================================================
+# MODULES
+# =============================================================================
+import numpy
+
+import argparse
+import subprocess
+import os
+import sys
+import tempfile
+import hashlib
+import json
+import csv
+import statistics
+
+import colorShredder
+import config
+
+
+# =============================================================================
+# MACROS
+# =============================================================================
+# command line flags of each backend that can be benchmarked
+BACKENDS = dict(
+    python = [],
+    numba = ['-numba'],
+    numpy = ['-numpy'],
+    opencl = ['-opencl'],
+    rtree = ['-rtree'],
+    multi = ['-multi'],
+    partition = ['-multi', '-partition', '-numpy'],
+    opencl_multi = ['-opencl', '-multi'],
+    rtree_multi = ['-rtree', '-multi']
+)
+
+# columns of the results file, one row per timed painting
+RESULT_FIELDS = ['backend', 'd', 'c', 'q', 'seed', 'repeat', 'seconds', 'pixels', 'collisions', 'pixels_per_second', 'canvas_hash']
+
+DEFAULT_BENCHMARK = dict(
+    DIMENSIONS = [64, 128],
+    COLOR_BIT_DEPTHS = [6],
+    STRATEGIES = [1, 2, 3],
+    BACKENDS = ['numba', 'numpy', 'opencl', 'rtree'],
+    REPEATS = 3,
+    SEED = 0,
+    # canvas painted once by each configuration before it is timed, so that compilation is not timed
+    WARMUP_DIMENSIONS = [16, 16],
+    # a configuration this much slower than before is reported as a regression
+    REGRESSION_THRESHOLD = 0.1,
+    RESULTS_NAME = "benchmark.csv"
+)
+
+# Arguments
+BENCHMARK_PARSER = argparse.ArgumentParser(
+    description="Paints every combination of the given canvas sizes, color bit depths, strategies and backends with a fixed seed, and records how long each painting took. Two results files can then be compared to find regressions.",
+    allow_abbrev=False
+)
+BENCHMARK_PARSER.add_argument('-d', metavar='dim', nargs='+', help='widths of the square canvases to paint', default=DEFAULT_BENCHMARK['DIMENSIONS'], type=int)
+BENCHMARK_PARSER.add_argument('-c', metavar='dep', nargs='+', help='color space bit depths to paint with', default=DEFAULT_BENCHMARK['COLOR_BIT_DEPTHS'], type=int)
+BENCHMARK_PARSER.add_argument('-q', metavar='strt', nargs='+', choices=[1, 2, 3], help='strategies for choosing best location', default=DEFAULT_BENCHMARK['STRATEGIES'], type=int)
+BENCHMARK_PARSER.add_argument('-b', metavar='backend', nargs='+', choices=list(BACKENDS), help='backends to paint with', default=DEFAULT_BENCHMARK['BACKENDS'], type=str)
+BENCHMARK_PARSER.add_argument('-n', metavar='reps', help='number of timed paintings of each configuration', default=DEFAULT_BENCHMARK['REPEATS'], type=int)
+BENCHMARK_PARSER.add_argument('-seed', metavar='seed', help='seed of the color shuffle of every painting', default=DEFAULT_BENCHMARK['SEED'], type=int)
+BENCHMARK_PARSER.add_argument('-o', metavar='flnm', help='name of the results file to write', default=DEFAULT_BENCHMARK['RESULTS_NAME'], type=str)
+BENCHMARK_PARSER.add_argument('-compare', metavar='flnm', nargs=2, help='compare two results files instead of painting, the second against the first', default=None, type=str)
+BENCHMARK_PARSER.add_argument('-threshold', metavar='frac', help='slowdown reported as a regression by -compare', default=DEFAULT_BENCHMARK['REGRESSION_THRESHOLD'], type=float)
+BENCHMARK_PARSER.add_argument('-worker', metavar='json', help=argparse.SUPPRESS, default=None, type=str)
+
+
+# =============================================================================
+# BENCHMARK
+# =============================================================================
+def main():
+
+    benchmark_args = BENCHMARK_PARSER.parse_args()
+
+    if (benchmark_args.worker):
+        runWorker(json.loads(benchmark_args.worker))
+    elif (benchmark_args.compare):
+        sys.exit(compareResults(benchmark_args.compare[0], benchmark_args.compare[1], benchmark_args.threshold))
+    else:
+        runBenchmark(benchmark_args)
+
+
+# paints every configuration in its own process, and writes every timed painting to the results file
+def runBenchmark(benchmark_args):
+
+    # Setup
+    list_results = []
+
+    for backend_name in benchmark_args.b:
+        for dimension in benchmark_args.d:
+            for color_bit_depth in benchmark_args.c:
+                for mode_selected in benchmark_args.q:
+
+                    configuration = dict(backend=backend_name, d=dimension, c=color_bit_depth, q=mode_selected, seed=benchmark_args.seed, repeats=benchmark_args.n)
+                    print("Benchmarking {backend} -d {d} -c {c} -q {q}...".format(**configuration))
+                    list_configuration_results = runConfiguration(configuration)
+
+                    for result in list_configuration_results:
+                        print("    {:3.3f} seconds, {:3.1f} pixels per second".format(result['seconds'], result['pixels_per_second']))
+                    list_results.extend(list_configuration_results)
+
+    with open(benchmark_args.o, 'w', newline='') as csvfile:
+        results_writer = csv.DictWriter(csvfile, fieldnames=RESULT_FIELDS)
+        results_writer.writeheader()
+        results_writer.writerows(list_results)
+    print("Results written to " + benchmark_args.o)
+
+
+# paints one configuration in a new process, so every configuration starts from the same state
+def runConfiguration(configuration):
+
+    with tempfile.TemporaryDirectory() as working_directory:
+        results_name = os.path.join(working_directory, 'results.json')
+        worker_process = subprocess.run([sys.executable, os.path.abspath(__file__), '-worker', json.dumps(dict(configuration, results_name=results_name))], cwd=working_directory, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+
+        if (worker_process.returncode or not os.path.exists(results_name)):
+            print("    failed: " + worker_process.stderr.strip().split('\n')[-1])
+            return []
+
+        with open(results_name) as results_file:
+            return json.load(results_file)
+
+
+# runs in the process made by runConfiguration: paints the configuration once untimed, then repeats times timed
+def runWorker(configuration):
+
+    # Setup
+    list_results = []
+    list_arguments = BACKENDS[configuration['backend']] + ['-d', str(configuration['d']), str(configuration['d']), '-s', str(configuration['d'] // 2), str(configuration['d'] // 2), '-c', str(configuration['c']), '-q', str(configuration['q']), '-seed', str(configuration['seed']), '-checkpoint', '0']
+    list_warmup_arguments = list_arguments + ['-d'] + [str(dimension) for dimension in DEFAULT_BENCHMARK['WARMUP_DIMENSIONS']] + ['-s', '0', '0']
+
+    # load and compile the backend
+    config.parseArgs(list_warmup_arguments)
+    colorShredder.main()
+
+    for repeat in range(configuration['repeats']):
+        config.parseArgs(list_arguments)
+        benchmark_painter = colorShredder.Painter(config.PARSED_ARGS)
+        time_elapsed = benchmark_painter.run()
+
+        list_results.append(dict(
+            backend = configuration['backend'],
+            d = configuration['d'],
+            c = configuration['c'],
+            q = configuration['q'],
+            seed = configuration['seed'],
+            repeat = repeat,
+            seconds = time_elapsed,
+            pixels = benchmark_painter.count_colors_placed,
+            collisions = benchmark_painter.count_collisions,
+            pixels_per_second = (benchmark_painter.count_colors_placed / time_elapsed),
+            canvas_hash = hashlib.md5(numpy.ascontiguousarray(benchmark_painter.getCanvas()).tobytes()).hexdigest()
+        ))
+
+    with open(configuration['results_name'], 'w') as results_file:
+        json.dump(list_results, results_file)
+
+
+# prints how each configuration in the new results compares to the base results; gives 1 if any configuration regressed
+#   configurations are compared by their median time
+#   a configuration whose paintings differ from before is reported, as the same seed should give the same painting
+def compareResults(base_results_name, new_results_name, regression_threshold):
+
+    # Setup
+    dict_base_results = getResultsByConfiguration(base_results_name)
+    dict_new_results = getResultsByConfiguration(new_results_name)
+    bool_regressed = False
+
+    print("{:<14}{:>6}{:>4}{:>4}{:>12}{:>12}{:>10}  {}".format('backend', 'd', 'c', 'q', 'base (s)', 'new (s)', 'speedup', 'notes'))
+    for configuration_key in sorted(dict_new_results):
+        list_new_results = dict_new_results[configuration_key]
+        seconds_new = statistics.median([float(result['seconds']) for result in list_new_results])
+
+        if (configuration_key not in dict_base_results):
+            print("{:<14}{:>6}{:>4}{:>4}{:>12}{:>12.3f}{:>10}  {}".format(*configuration_key, '-', seconds_new, '-', 'new'))
+            continue
+
+        list_base_results = dict_base_results[configuration_key]
+        seconds_base = statistics.median([float(result['seconds']) for result in list_base_results])
+
+        list_notes = []
+        if (seconds_new > (seconds_base * (1 + regression_threshold))):
+            list_notes.append('REGRESSION')
+            bool_regressed = True
+        if ({result['canvas_hash'] for result in list_base_results} != {result['canvas_hash'] for result in list_new_results}):
+            list_notes.append('painting changed')
+
+        print("{:<14}{:>6}{:>4}{:>4}{:>12.3f}{:>12.3f}{:>10.2f}  {}".format(*configuration_key, seconds_base, seconds_new, (seconds_base / seconds_new), ', '.join(list_notes)))
+
+    return int(bool_regressed)
+
+
+# reads a results file, grouping its rows by backend, canvas size, bit depth and strategy
+def getResultsByConfiguration(results_name):
+
+    dict_results = {}
+    with open(results_name, newline='') as csvfile:
+        for result in csv.DictReader(csvfile):
+            configuration_key = (result['backend'], int(result['d']), int(result['c']), int(result['q']))
+            dict_results.setdefault(configuration_key, []).append(result)
+
+    return dict_results
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,322 @@
+import numpy
+
+# imported by loadNumba the first time a batch query is made
+numba = None
+
+
+# gives a zeroed array, the default way a ColorIndex makes the arrays sized to its capacity
+def makeArray(array_shape, array_dtype, array_name):
+    return numpy.zeros(array_shape, array_dtype)
+
+
+# =============================================================================
+# COLOR INDEX
+# =============================================================================
+# A spatial index over integer [R,G,B] points, used to find the available location whose neighborhood color is
+# nearest to a requested color.
+#   the color cube is divided into uniform cells, each cell owns a contiguous segment of a shared pool of entry IDs
+#   entries are identified by a caller chosen integer ID below the capacity, and can be moved in place
+#   nearest neighbor queries search outward from the requested color one shell of cells at a time
+#   the arrays sized to the capacity are made by make_array(shape, dtype, name), so they can be backed by files
+class ColorIndex:
+
+    def __init__(self, capacity, cells_per_channel=16, channel_range=256, make_array=makeArray):
+
+        # Setup
+        self.cells_per_channel = cells_per_channel
+        self.cell_size = -(-channel_range // cells_per_channel)
+        self.cell_strides = numpy.array([cells_per_channel * cells_per_channel, cells_per_channel, 1], numpy.int64)
+        self.count = 0
+
+        # holds the color, cell and position within that cell of each entry; a cell of -1 means the ID is not tracked
+        self.entry_color = make_array([capacity, 3], numpy.int64, 'colorIndex_entry_color')
+        self.entry_cell = make_array([capacity], numpy.int64, 'colorIndex_entry_cell')
+        self.entry_cell[...] = -1
+        self.entry_slot = make_array([capacity], numpy.int64, 'colorIndex_entry_slot')
+
+        # holds the packed entry IDs of every cell, each cell owns pool_entries[cell_start:cell_start + cell_capacity]
+        self.pool_entries = numpy.zeros([1024], numpy.int64)
+        self.pool_used = 0
+        self.cell_start = numpy.zeros([cells_per_channel**3], numpy.int64)
+        self.cell_capacity = numpy.zeros([cells_per_channel**3], numpy.int64)
+        self.cell_count = numpy.zeros([cells_per_channel**3], numpy.int64)
+
+        # holds the cell offsets at each chebyshev distance from a cell, searched in order by nearest()
+        # the offsets of shell r are shell_offsets[shell_start[r]:shell_start[r + 1]]
+        list_shells = []
+        for radius in range(cells_per_channel):
+            offset_range = numpy.arange(-radius, radius + 1)
+            offsets = numpy.stack(numpy.meshgrid(offset_range, offset_range, offset_range, indexing='ij'), axis=-1).reshape(-1, 3)
+            list_shells.append(offsets[numpy.abs(offsets).max(axis=1) == radius])
+        self.shell_offsets = numpy.concatenate(list_shells).astype(numpy.int64)
+        self.shell_start = numpy.cumsum([0] + [shell.shape[0] for shell in list_shells]).astype(numpy.int64)
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, entry_id):
+        return (self.entry_cell[entry_id] >= 0)
+
+    # gives the position of the cell containing a color along each channel
+    def getCellCoordinate(self, color):
+        return numpy.minimum(numpy.array(color, numpy.int64) // self.cell_size, self.cells_per_channel - 1)
+
+    # gives the entry IDs held by a cell
+    def getCellEntries(self, cell_index):
+        return self.pool_entries[self.cell_start[cell_index]:(self.cell_start[cell_index] + self.cell_count[cell_index])]
+
+    # gives the entry IDs held by each of the given cells, one cell after another
+    def getCellsEntries(self, cell_indices):
+
+        # Setup
+        cell_counts = self.cell_count[cell_indices]
+        cell_ends = numpy.cumsum(cell_counts)
+
+        # the position in the pool of every entry, the start of its cell plus its slot within the cell
+        entry_slots = numpy.arange(cell_ends[-1] if cell_ends.shape[0] else 0) - numpy.repeat((cell_ends - cell_counts), cell_counts)
+        return self.pool_entries[numpy.repeat(self.cell_start[cell_indices], cell_counts) + entry_slots]
+
+    # gives the IDs of every entry cell by cell, in their order within each cell
+    # inserting them in this order into an empty index gives an index that answers every query the same way
+    def getEntries(self):
+        return numpy.concatenate([numpy.zeros([0], numpy.int64)] + [self.getCellEntries(cell_index) for cell_index in numpy.flatnonzero(self.cell_count)])
+
+    # moves a full cell to a new segment twice its size at the end of the pool
+    def growCell(self, cell_index):
+
+        # Setup
+        capacity_new = max(16, (2 * self.cell_capacity[cell_index]))
+
+        # when the pool is out of room, repack it with only the segments that are still in use
+        if ((self.pool_used + capacity_new) > self.pool_entries.shape[0]):
+            capacity_in_use = int(self.cell_capacity.sum()) + capacity_new
+            pool_entries = numpy.zeros([max(self.pool_entries.shape[0], (2 * capacity_in_use))], numpy.int64)
+            pool_used = 0
+            for cell_in_use in numpy.flatnonzero(self.cell_capacity):
+                pool_entries[pool_used:(pool_used + self.cell_count[cell_in_use])] = self.getCellEntries(cell_in_use)
+                self.cell_start[cell_in_use] = pool_used
+                pool_used += self.cell_capacity[cell_in_use]
+            self.pool_entries = pool_entries
+            self.pool_used = pool_used
+
+        # copy the cell into its new segment
+        self.pool_entries[self.pool_used:(self.pool_used + self.cell_count[cell_index])] = self.getCellEntries(cell_index)
+        self.cell_start[cell_index] = self.pool_used
+        self.cell_capacity[cell_index] = capacity_new
+        self.pool_used += capacity_new
+
+    # adds an entry with the given ID at the given color
+    def insert(self, entry_id, color):
+
+        # Setup
+        entry_color = numpy.array(color, numpy.int64)
+        cell_index = int(numpy.dot(self.getCellCoordinate(entry_color), self.cell_strides))
+
+        # grow the cell when it is full
+        if (self.cell_count[cell_index] == self.cell_capacity[cell_index]):
+            self.growCell(cell_index)
+
+        # append the entry to the end of the cell
+        cell_count = self.cell_count[cell_index]
+        self.pool_entries[self.cell_start[cell_index] + cell_count] = entry_id
+        self.cell_count[cell_index] += 1
+        self.entry_color[entry_id] = entry_color
+        self.entry_cell[entry_id] = cell_index
+        self.entry_slot[entry_id] = cell_count
+        self.count += 1
+
+    # removes the entry with the given ID
+    def delete(self, entry_id):
+
+        # Setup
+        cell_index = self.entry_cell[entry_id]
+        cell_start = self.cell_start[cell_index]
+        slot_last = self.cell_count[cell_index] - 1
+
+        # move the last entry of the cell into the vacated slot
+        entry_id_last = self.pool_entries[cell_start + slot_last]
+        self.pool_entries[cell_start + self.entry_slot[entry_id]] = entry_id_last
+        self.entry_slot[entry_id_last] = self.entry_slot[entry_id]
+
+        self.cell_count[cell_index] -= 1
+        self.entry_cell[entry_id] = -1
+        self.count -= 1
+
+    # changes the color of the entry with the given ID, only touching the cells if it crosses into a new one
+    def move(self, entry_id, color):
+
+        # Setup
+        entry_color = numpy.array(color, numpy.int64)
+        cell_index = int(numpy.dot(self.getCellCoordinate(entry_color), self.cell_strides))
+
+        if (cell_index == self.entry_cell[entry_id]):
+            self.entry_color[entry_id] = entry_color
+        else:
+            self.delete(entry_id)
+            self.insert(entry_id, entry_color)
+
+    # gives the IDs of the entries nearest to the given color by squared euclidian distance, nearest first
+    # fewer than count IDs are given if the index holds fewer entries
+    def nearest(self, color, count=1):
+
+        # Setup
+        requested_color = numpy.array(color, numpy.int64)
+        requested_cell = self.getCellCoordinate(requested_color)
+        nearest_ids = numpy.zeros([0], numpy.int64)
+        nearest_distances = numpy.zeros([0], numpy.int64)
+
+        # search outward from the cell containing the requested color one shell at a time
+        for radius in range(self.cells_per_channel):
+
+            # find the non-empty cells of this shell that are inside the color cube
+            shell_cells = requested_cell + self.shell_offsets[self.shell_start[radius]:self.shell_start[radius + 1]]
+            shell_cells = shell_cells[numpy.all((shell_cells >= 0) & (shell_cells < self.cells_per_channel), axis=1)]
+            shell_cells = numpy.dot(shell_cells, self.cell_strides)
+            shell_cells = shell_cells[self.cell_count[shell_cells] > 0]
+
+            # check every entry in those cells, keep the nearest
+            if (shell_cells.shape[0]):
+                candidate_ids = numpy.concatenate([nearest_ids] + [self.getCellEntries(cell_index) for cell_index in shell_cells])
+                candidate_distances = numpy.concatenate([nearest_distances, numpy.square(self.entry_color[candidate_ids[nearest_ids.shape[0]:]] - requested_color).sum(axis=1)])
+                candidate_order = numpy.argsort(candidate_distances, kind='stable')[:count]
+                nearest_ids = candidate_ids[candidate_order]
+                nearest_distances = candidate_distances[candidate_order]
+
+            # every entry outside the searched cells is at least as far as the nearest searched face with cells beyond it
+            searched_low = (requested_cell - radius)
+            searched_high = (requested_cell + radius + 1)
+            face_distances = numpy.concatenate([(requested_color - (searched_low * self.cell_size))[searched_low > 0], ((searched_high * self.cell_size) - requested_color)[searched_high < self.cells_per_channel]])
+            if not (face_distances.shape[0]):
+                break
+            if ((nearest_ids.shape[0] == count) and (nearest_distances[-1] <= (face_distances.min()**2))):
+                break
+
+        return nearest_ids
+
+    # gives the IDs of every entry at the smallest distance from the given color, and that distance; no IDs if the index is empty
+    #   the distance of each of the given entry IDs is given by get_distances, the squared euclidian distance to the entry color by default
+    #   any distance can be used that is never less than the squared euclidian distance from the requested color to the cell holding the entry
+    #   the search only stops once every unsearched entry is further than the smallest distance, so no entry tied with it is left out
+    def nearestTied(self, color, get_distances=None):
+
+        # Setup
+        requested_color = numpy.array(color, numpy.int64)
+        requested_cell = self.getCellCoordinate(requested_color)
+        if (get_distances is None):
+            get_distances = lambda entry_ids: numpy.square(self.entry_color[entry_ids] - requested_color).sum(axis=1)
+        tied_ids = numpy.zeros([0], numpy.int64)
+        distance_minimum = None
+
+        # search outward from the cell containing the requested color one shell at a time
+        for radius in range(self.cells_per_channel):
+
+            # find the non-empty cells of this shell that are inside the color cube
+            shell_cells = requested_cell + self.shell_offsets[self.shell_start[radius]:self.shell_start[radius + 1]]
+            shell_cells = shell_cells[numpy.all((shell_cells >= 0) & (shell_cells < self.cells_per_channel), axis=1)]
+
+            # a cell further than the smallest distance found cannot hold an entry tied with it
+            if (distance_minimum is not None):
+                cell_gaps = numpy.maximum(0, numpy.maximum(((shell_cells * self.cell_size) - requested_color), (requested_color - ((shell_cells + 1) * self.cell_size))))
+                shell_cells = shell_cells[numpy.square(cell_gaps).sum(axis=1) <= distance_minimum]
+
+            shell_cells = numpy.dot(shell_cells, self.cell_strides)
+            shell_cells = shell_cells[self.cell_count[shell_cells] > 0]
+
+            # check every entry in those cells, keep every entry at the smallest distance
+            if (shell_cells.shape[0]):
+                candidate_ids = self.getCellsEntries(shell_cells)
+                candidate_distances = get_distances(candidate_ids)
+                candidate_minimum = candidate_distances.min()
+                if ((distance_minimum is None) or (candidate_minimum < distance_minimum)):
+                    tied_ids = candidate_ids[candidate_distances == candidate_minimum]
+                    distance_minimum = candidate_minimum
+                elif (candidate_minimum == distance_minimum):
+                    tied_ids = numpy.concatenate([tied_ids, candidate_ids[candidate_distances == candidate_minimum]])
+
+            # every entry outside the searched cells is at least as far as the nearest searched face with cells beyond it
+            searched_low = (requested_cell - radius)
+            searched_high = (requested_cell + radius + 1)
+            face_distances = numpy.concatenate([(requested_color - (searched_low * self.cell_size))[searched_low > 0], ((searched_high * self.cell_size) - requested_color)[searched_high < self.cells_per_channel]])
+            if not (face_distances.shape[0]):
+                break
+            if ((distance_minimum is not None) and (distance_minimum < (face_distances.min()**2))):
+                break
+
+        return tied_ids, distance_minimum
+
+    # gives the IDs of the count nearest entries to each of the given colors, nearest first and padded with -1
+    # all of the queries are run in parallel against the current state of the index
+    def nearestBatch(self, colors, count=1):
+        loadNumba()
+        return getNearestForColors_numba(numpy.array(colors, numpy.int64), count, self.entry_color, self.pool_entries, self.cell_start, self.cell_count, self.cells_per_channel, self.cell_size, self.shell_offsets, self.shell_start)
+
+
+# imports numba and compiles getNearestForColors_numba if that has not been done yet
+def loadNumba():
+    # Global Access
+    global numba
+    global getNearestForColors_numba
+
+    if (numba is None):
+        import numba
+        getNearestForColors_numba = numba.njit(parallel=True)(getNearestForColors_numba)
+
+
+# Gives the IDs of the count nearest entries for each requested color; the same search as ColorIndex.nearest()
+# compiled by loadNumba
+def getNearestForColors_numba(requested_colors, count, entry_color, pool_entries, cell_start, cell_count, cells_per_channel, cell_size, shell_offsets, shell_start):
+
+    # Setup
+    nearest_ids = numpy.full((requested_colors.shape[0], count), -1, numpy.int64)
+
+    # every requested color is searched for independently
+    for index in numba.prange(requested_colors.shape[0]):
+
+        # reset minimums
+        nearest_distances = numpy.full(count, numpy.iinfo(numpy.int64).max, numpy.int64)
+        count_found = 0
+        requested_color = requested_colors[index]
+        requested_cell = numpy.minimum(requested_color // cell_size, cells_per_channel - 1)
+
+        # search outward from the cell containing the requested color one shell at a time
+        for radius in range(cells_per_channel):
+            for index_offset in range(shell_start[radius], shell_start[radius + 1]):
+
+                # the cell must be inside the color cube
+                cell_x = requested_cell[0] + shell_offsets[index_offset, 0]
+                cell_y = requested_cell[1] + shell_offsets[index_offset, 1]
+                cell_z = requested_cell[2] + shell_offsets[index_offset, 2]
+                if not ((0 <= cell_x < cells_per_channel) and (0 <= cell_y < cells_per_channel) and (0 <= cell_z < cells_per_channel)):
+                    continue
+                cell_index = (cell_x * cells_per_channel * cells_per_channel) + (cell_y * cells_per_channel) + cell_z
+
+                # check every entry in the cell, keeping the nearest sorted by insertion
+                for index_entry in range(cell_start[cell_index], cell_start[cell_index] + cell_count[cell_index]):
+                    entry_id = pool_entries[index_entry]
+                    distance_found = 0
+                    for channel in range(3):
+                        distance_found += (entry_color[entry_id, channel] - requested_color[channel])**2
+
+                    if (distance_found < nearest_distances[count - 1]):
+                        index_insert = count - 1
+                        while ((index_insert > 0) and (distance_found < nearest_distances[index_insert - 1])):
+                            nearest_distances[index_insert] = nearest_distances[index_insert - 1]
+                            nearest_ids[index, index_insert] = nearest_ids[index, index_insert - 1]
+                            index_insert -= 1
+                        nearest_distances[index_insert] = distance_found
+                        nearest_ids[index, index_insert] = entry_id
+                        count_found = min(count_found + 1, count)
+
+            # every entry outside the searched cells is at least as far as the nearest searched face with cells beyond it
+            face_distance = numpy.iinfo(numpy.int64).max
+            for channel in range(3):
+                if ((requested_cell[channel] - radius) > 0):
+                    face_distance = min(face_distance, requested_color[channel] - ((requested_cell[channel] - radius) * cell_size))
+                if ((requested_cell[channel] + radius + 1) < cells_per_channel):
+                    face_distance = min(face_distance, ((requested_cell[channel] + radius + 1) * cell_size) - requested_color[channel])
+            if (face_distance == numpy.iinfo(numpy.int64).max):
+                break
+            if ((count_found == count) and (nearest_distances[count - 1] <= (face_distance * face_distance))):
+                break
+
+    return nearest_ids
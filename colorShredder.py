@@ -3,18 +3,27 @@
 # =============================================================================
 import png
 import numpy
-import numba
-import rtree
-import pyopencl
-from pyopencl import cltypes
 
 import subprocess
 import os
 import sys
 import concurrent.futures
+import multiprocessing.shared_memory
+import threading
+import queue
 import time
 import csv
-
+import io
+import json
+import copy
+import functools
+import zipfile
+import tempfile
+import shutil
+import cProfile
+import pstats
+
+import colorIndex
 import colorTools
 import config
 
@@ -22,333 +31,701 @@ import config
 # =============================================================================
 # MACROS
 # =============================================================================
-NUMBER_OF_COLORS = ((2**config.PARSED_ARGS.c)**3)
-COLOR_BLACK = numpy.array([0, 0, 0], numpy.uint32)
-COORDINATE_INVALID = numpy.array([-1, -1])
+COLOR_BLACK = numpy.array([0, 0, 0], numpy.uint8)
+COORDINATE_INVALID = numpy.array([-1, -1], numpy.int32)
+# offsets to the 8 neighbors of a location, in the same order as the 3x3 neighborhood loops
+NEIGHBOR_OFFSETS = numpy.array([[i - 1, j - 1] for i in range(3) for j in range(3) if not (i == 1 and j == 1)], numpy.int32)
+# offsets to every location of the 3x3 neighborhood, including the location itself
+NEIGHBORHOOD_OFFSETS = numpy.array([[i - 1, j - 1] for i in range(3) for j in range(3)], numpy.int32)
+# rows of a canvas written at once to the finished painting and to checkpoints, so a canvas backed by files is never copied into memory whole
+ROWS_PER_BAND = 256
+# layout of the placement journal: a header giving the canvas dimensions, then one record per placement in the order they were painted
+JOURNAL_MAGIC = b'CSJ1'
+JOURNAL_HEADER = numpy.dtype([('magic', 'S4'), ('width', '<u4'), ('height', '<u4')])
+JOURNAL_RECORD = numpy.dtype([('order', '<u4'), ('x', '<u4'), ('y', '<u4'), ('color', 'u1', (3,))])
+# the directory of animation frames and the latest snapshot are named after the painting, so paintings in the same directory keep their own
+FRAMES_DIRECTORY_SUFFIX = '_frames'
+SNAPSHOT_SUFFIX = '_temp.png'
+# phases of the painting timed with -timers, in the order of their stats CSV columns
+#   select: taking the next colors, search: finding their best locations, ipc: sending work to the processes or the device
+#   paint: coloring the canvas and its neighborhood sums, frontier: tracking available locations, index: maintaining the color index
+#   output: printing progress and handing snapshots to the snapshot writer
+PHASE_NAMES = ['select', 'search', 'ipc', 'paint', 'frontier', 'index', 'output']
 
 
 # =============================================================================
 # GLOBALS
 # =============================================================================
-# process_pool executor
-mutliprocessing_painter_manager = concurrent.futures.ProcessPoolExecutor()
-# list of all colors to be placed
-list_all_colors = numpy.zeros([NUMBER_OF_COLORS, 3], numpy.uint32)
-index_all_colors = 0
-# empty list of all colors to be placed and an index for tracking position in the list
-list_collided_colors = []
-index_collided_colors = 0
-# writes data arrays as PNG image files
-png_painter = png.Writer(config.PARSED_ARGS.d[0], config.PARSED_ARGS.d[1], greyscale=False)
-# used for ongoing speed calculation
-time_last_print = time.time()
-# number of workers
-number_of_workers = 1
-# counters
-count_collisions = 0
-count_colors_placed = 0
-count_available = 0
-count_id = 0
-count_print = 0
-count_placed_at_last_print = 0
+# names of the backends that have been loaded by loadBackend for the whole process, and the lock held while one is loaded
+list_loaded_backends = []
+backend_loader_lock = threading.Lock()
+# the shared memory blocks attached to by a worker process of -multi, and the painting arrays it reads from them, set by attachSharedMemory_multiprocessing
+worker_shared_memory_blocks = []
+worker_painting_arrays = None
+
+# =============================================================================
+# NUMBA
+# =============================================================================
+# imported by loadBackend_numba
+numba = None
+# fewest locations in each run of the numba search, a shorter run costs more to hand to a thread than to search
+NUMBA_MIN_RUN_LENGTH = 256
+# most colors placed by one call to the native paint loop, progress is printed between calls
+NUMBA_PLACEMENTS_PER_CALL = 1024
 
 # =============================================================================
 # PYOPENCL
 # =============================================================================
-os.environ['PYOPENCL_CTX'] = "0"
-os.environ['PYOPENCL_COMPILER_OUTPUT'] = "1"
-# this line would create a context
-opencl_context = pyopencl.create_some_context()
-# now create a command queue in the context
-opencl_queue = pyopencl.CommandQueue(opencl_context)
-# compile opencl kernel
-opencl_kernel = pyopencl.Program(opencl_context, open('kernel.ocl').read()).build()
+# imported, created and compiled by loadBackend_openCL
+pyopencl = None
+opencl_context = None
+opencl_queue = None
+opencl_kernel = None
+opencl_kernels = None
 
 
 # =============================================================================
 # DATA-STRUCTURES
 # =============================================================================
-# R-Tree data structure testing for lookup of available locations
-rTree_neighborhood_colors = rtree.index.Index(properties=config.index_properties)
-# holds boolean availability for each canvas location
-canvas_availability = numpy.zeros([config.PARSED_ARGS.d[0], config.PARSED_ARGS.d[1]], numpy.bool)
-list_availabilty = []
-# holds the ID/index (for the spatial index) of each canvas location
-canvas_id = numpy.zeros([config.PARSED_ARGS.d[0], config.PARSED_ARGS.d[1]], numpy.uint32)
-# holds the current state of the painting
-canvas_actual_color = numpy.zeros([config.PARSED_ARGS.d[0], config.PARSED_ARGS.d[1], 3], numpy.uint32)
-# holds the average color around each canvas location
-canvas_neighborhood_color = numpy.zeros([config.PARSED_ARGS.d[0], config.PARSED_ARGS.d[1], 3], numpy.uint32)
+# sets up the state of a new painting on its Painter: its counters, its writers, and the data-structures sized to its canvas
+#   every function painting it is given the Painter, so paintings on other threads, or painted in turns, never share any of it
+def setupCanvas(painting):
+
+    # name of the backend painting with, and when the painting started
+    painting.backend_selected = None
+    painting.time_painting_started = 0
+    # number of colors placed once the current step is done, backends that place many colors at once stop there
+    painting.count_placements_target = 0
+    # list of all colors to be placed
+    painting.list_all_colors = None
+    # the same colors as the searches compare them: their OKLab bytes with -oklab, otherwise list_all_colors itself
+    painting.list_compared_colors = None
+    painting.index_all_colors = 0
+    # numpy random state from before the colors were generated, kept for checkpoints so the same colors can be generated again
+    painting.random_state_colors = None
+    # empty list of all colors to be placed and an index for tracking position in the list
+    painting.list_collided_colors = []
+    painting.index_collided_colors = 0
+    # number of workers
+    painting.number_of_workers = 1
+    # counters
+    painting.count_collisions = 0
+    painting.count_colors_placed = 0
+    painting.count_available = 0
+    painting.count_print = 0
+    painting.count_placed_at_last_print = 0
+
+    # whether the phases are timed, and the seconds spent in and number of times through each phase since the last stats row
+    painting.bool_time_phases = painting.painting_args.timers
+    painting.dict_phase_seconds = dict.fromkeys(PHASE_NAMES, 0.0)
+    painting.dict_phase_counts = dict.fromkeys(PHASE_NAMES, 0)
+    # profiles the placements in the -profile window
+    painting.painting_profiler = None
+    # draws the locations scored by the approximate search with -approx
+    painting.approximate_generator = None
+    # number of searches of a sample, and of those measured against the exact search: their total excess distance and total exact distance
+    painting.count_approximate_searches = 0
+    painting.count_quality_samples = 0
+    painting.distance_excess_total = 0.0
+    painting.distance_exact_total = 0.0
+
+    # names of the backends that have been loaded by loadBackend for this painting
+    painting.list_painting_backends = []
+    # process_pool executor, created by loadBackend_multiprocessing
+    painting.mutliprocessing_painter_manager = None
+    # shared memory blocks holding the arrays read by the process_pool painters, created by loadBackend_multiprocessing
+    painting.list_shared_memory_blocks = []
+    # what the painters need to attach to each of those arrays, in the order they were shared
+    painting.list_shared_array_layouts = []
+    # device copies of the painting, kept for the whole run
+    painting.opencl_buffers = {}
+    # locations painted and rows of list_availabilty changed since the device copies were last updated
+    painting.list_opencl_painted_coordinates = []
+    painting.list_opencl_changed_rows = []
+
+    # writes data arrays as PNG image files
+    painting.png_painter = png.Writer(painting.painting_args.d[0], painting.painting_args.d[1], greyscale=False)
+    # background thread that encodes and writes snapshots, the bounded queue of snapshots waiting for it, and the errors it has had
+    painting.snapshot_writer_thread = None
+    painting.snapshot_writer_queue = None
+    painting.snapshot_writer_errors = []
+    # ffmpeg process that the snapshot writer streams the animation frames to, with -stream
+    painting.animation_encoder = None
+    # placement journal file, the block of records waiting to be written to it, and the number of records in that block
+    painting.journal_file = None
+    painting.journal_block = None
+    painting.index_journal_block = 0
+    # used for ongoing speed calculation
+    painting.time_last_print = time.time()
+    # background thread writing the latest checkpoint, and when that checkpoint was taken
+    painting.checkpoint_writer_thread = None
+    painting.time_last_checkpoint = time.time()
+
+    # directory of the files backing the arrays of the painting with -memmap
+    #   each painting backs its arrays with files in a directory of its own, so paintings sharing a -memmap directory do not overwrite each other
+    painting.memmap_directory = None
+    if (painting.painting_args.memmap):
+        painting.memmap_directory = tempfile.mkdtemp(prefix=(os.path.basename(painting.painting_args.f) + '_'), dir=painting.painting_args.memmap)
+
+    # color space spatial index for lookup of available locations by neighborhood color
+    #   the color index is only needed, and its arrays only made, when painting with the spatial index
+    painting.colorIndex_neighborhood_colors = None
+    if (painting.painting_args.rtree):
+        painting.colorIndex_neighborhood_colors = colorIndex.ColorIndex((painting.painting_args.d[0] * painting.painting_args.d[1]), config.DEFAULT_INDEX['CELLS_PER_CHANNEL'], make_array=functools.partial(getCanvasArray, painting))
+    # holds boolean availability for each canvas location
+    painting.canvas_availability = getCanvasArray(painting, [painting.painting_args.d[0], painting.painting_args.d[1]], numpy.bool, 'canvas_availability')
+    # holds the coordinates of every available location, densely packed into the first count_available rows
+    painting.list_availabilty = getCanvasArray(painting, [painting.painting_args.d[0] * painting.painting_args.d[1], 2], numpy.int32, 'list_availabilty')
+    # holds the row of list_availabilty that each available canvas location is stored in
+    painting.canvas_availability_index = getCanvasArray(painting, [painting.painting_args.d[0], painting.painting_args.d[1]], numpy.int32, 'canvas_availability_index')
+    # holds the current state of the painting
+    painting.canvas_actual_color = getCanvasArray(painting, [painting.painting_args.d[0], painting.painting_args.d[1], 3], numpy.uint8, 'canvas_actual_color')
+    # holds the painting as the searches compare it: the OKLab bytes of each color with -oklab, otherwise canvas_actual_color itself
+    #   the neighborhood sums are sums of these colors
+    painting.canvas_compared_color = painting.canvas_actual_color
+    if (painting.painting_args.oklab):
+        painting.canvas_compared_color = getCanvasArray(painting, [painting.painting_args.d[0], painting.painting_args.d[1], 3], numpy.uint8, 'canvas_compared_color')
+    # holds the running sum of the colored neighbors around each canvas location
+    painting.canvas_neighborhood_sum = getCanvasArray(painting, [painting.painting_args.d[0], painting.painting_args.d[1], 3], numpy.uint32, 'canvas_neighborhood_sum')
+    # holds the running sum of the squared magnitudes of the colored neighbors around each canvas location
+    painting.canvas_neighborhood_sum_squared = getCanvasArray(painting, [painting.painting_args.d[0], painting.painting_args.d[1]], numpy.uint32, 'canvas_neighborhood_sum_squared')
+    # holds the number of colored neighbors around each canvas location
+    painting.canvas_neighborhood_count = getCanvasArray(painting, [painting.painting_args.d[0], painting.painting_args.d[1]], numpy.uint32, 'canvas_neighborhood_count')
+
+
+# gives a zeroed array for the canvas sized data-structures
+#   with -memmap the array is backed by a file of the given name in the directory of the painting, so only the parts in use need to be in memory
+#   the files are created sparse, pages that are never written take no space
+#   a plain array view of the memmap is given, indexing a memmap directly is much slower; the memmap is kept as its base
+def getCanvasArray(painting, array_shape, array_dtype, array_name):
+
+    if (painting.memmap_directory):
+        return numpy.memmap(os.path.join(painting.memmap_directory, (array_name + '.dat')), array_dtype, 'w+', shape=tuple(array_shape)).view(numpy.ndarray)
+
+    return numpy.zeros(array_shape, array_dtype)
+
+
+# removes the file backing an array made by getCanvasArray once the array is no longer used
+def removeCanvasArray(canvas_array):
+
+    if (isinstance(canvas_array.base, numpy.memmap)):
+        os.remove(canvas_array.base.filename)
+
+
+# gives a canvas to save in a checkpoint, copied so the painting can continue while the checkpoint writer saves it
+#   with -memmap the canvas is given as it is, the painting thread writes the checkpoint from the files a band of rows at a time
+def getCheckpointCanvas(painting, canvas_array, array_dtype):
+
+    if (painting.memmap_directory):
+        return canvas_array
+
+    return numpy.array(canvas_array, array_dtype)
+
+
+# =============================================================================
+# PAINTER
+# =============================================================================
+# A painting with its own configuration, painted a number of placements at a time with step() or to the end with run().
+#   the Painter holds the whole state of its painting, set up by setupCanvas, and is given to every function that paints it
+#   any number of paintings can be made in one process, painted in turns or each on a thread of its own
+#   loaded backends, such as compiled numba functions and OpenCL kernels, are kept for the paintings that follow
+#   the configuration is the parsed command line arguments, or is made from the given options by config.makeArgs
+#   the backend is named as registered with registerBackend, by default the one selected by the configuration
+#   a built in backend sets its argument in the configuration, raising ValueError if it cannot be used with the other arguments
+#   each painting with -multi has its own process pool, stopped when the painting is finished
+#   the colors can be given, if they are the colors colorTools.generateColors gives for the configuration and its seed
+class Painter:
+
+    def __init__(self, painting_args=None, backend_name=None, list_colors=None, **options):
+
+        # Setup
+        if (painting_args is None):
+            painting_args = config.makeArgs(**options)
+        if (backend_name is None):
+            backend_name = getBackendName(painting_args)
+        if (backend_name not in BACKEND_WORK):
+            raise ValueError("Unknown backend " + backend_name)
+        painting_args = getBackendArgs(painting_args, backend_name)
+
+        self.painting_args = painting_args
+        self.time_elapsed = None
+
+        startPaintingRun(self, backend_name, list_colors)
+
+    # paints until count_placements more colors have been placed; gives False once nothing is left to paint
+    def step(self, count_placements=1):
+        return paintPlacements(self, count_placements)
+
+    # paints until nothing is left to paint, then finishes the painting; gives the seconds it took
+    def run(self):
+
+        while (self.step(self.painting_args.d[0] * self.painting_args.d[1])):
+            pass
+        return self.finish()
+
+    # writes the finished painting and stops its writers and process pool; gives the seconds it took
+    def finish(self):
+
+        if (self.time_elapsed is None):
+            self.time_elapsed = finishPaintingRun(self)
+        return self.time_elapsed
+
+    # gives the canvas of this painting
+    def getCanvas(self):
+        return self.canvas_actual_color
 
 
 # =============================================================================
 # COMMON
 # =============================================================================
+# paints the painting configured by the command line
 def main():
-    # Global Access
-    global list_all_colors
-    global mutliprocessing_painter_manager
+    return Painter(config.PARSED_ARGS).run()
+
 
-    txt_file = open(str(config.PARSED_ARGS.f + '.txt'), 'w') 
-    print(config.PARSED_ARGS, file = txt_file) 
+# sets up a new painting with the active configuration, and draws its first color
+def startPaintingRun(painting, backend_name, list_colors):
+    txt_file = open(str(painting.painting_args.f + '.txt'), 'w') 
+    print(painting.painting_args, file = txt_file) 
     txt_file.close() 
 
     # Setup
-    subprocess.call(['rm', '-r', 'painting'])
-    subprocess.call(['mkdir', 'painting'])
+    # when resuming, the frames painted so far are kept, a painting resumed in another directory starts its frames there
+    #   streamed frames are not written to the frames directory at all, and -memmap paintings have no frames
+    if not (painting.painting_args.stream or painting.painting_args.memmap):
+        if not (painting.painting_args.resume):
+            shutil.rmtree(str(painting.painting_args.f + FRAMES_DIRECTORY_SUFFIX), ignore_errors=True)
+        os.makedirs(str(painting.painting_args.f + FRAMES_DIRECTORY_SUFFIX), exist_ok=True)
+
+    setupCanvas(painting)
+    startSnapshotWriter(painting)
+    painting.backend_selected = backend_name
+    # its own generator, so the samples do not change the colors; a resumed painting restores its state from the checkpoint
+    painting.approximate_generator = numpy.random.default_rng(painting.painting_args.seed)
+
+    if (painting.painting_args.resume):
+        loadCheckpoint(painting)
+    else:
+        random_state = numpy.random.RandomState(painting.painting_args.seed)
+        painting.random_state_colors = random_state.get_state()
+        if (list_colors is None):
+            list_colors = colorTools.generateColors(painting.painting_args, random_state)
+        painting.list_all_colors = list_colors
+
+    # each color is converted once, so the searches compare perceptual colors as quickly as [R,G,B] ones
+    painting.list_compared_colors = painting.list_all_colors
+    if (painting.painting_args.oklab):
+        painting.list_compared_colors = colorTools.getPerceptualColors(painting.list_all_colors, colorTools.getPerceptualBitDepth(painting.painting_args))
+
+    if (painting.painting_args.journal):
+        startJournal(painting)
+    print("Painting Canvas...")
+    painting.time_painting_started = time.time()
 
-    with open(str(config.PARSED_ARGS.f + '.csv'), 'w', newline='') as csvfile:
-        stats_writer = csv.writer(csvfile, delimiter=',')
-        stats_writer.writerow(['PixelsColored', 'PixelsAvailable', 'PercentComplete', 'TotalCollisions', 'Rate', 'WorkerCount', 'RatePerWorker'])
+    # draw the first color at the starting pixel
+    if not (painting.painting_args.resume):
+        startPainting(painting)
 
 
-    list_all_colors = colorTools.generateColors()
-    print("Painting Canvas...")
-    time_started = time.time()
+# paints until count_placements more colors have been placed, or nothing is left to paint; gives whether anything is left
+def paintPlacements(painting, count_placements):
+    # Setup
+    painting.count_placements_target = (painting.count_colors_placed + count_placements)
 
-    # draw the first color at the starting pixel
-    startPainting()
+    while (painting.count_colors_placed < painting.count_placements_target):
 
-    # Work
-    if (config.PARSED_ARGS.rtree):
-        while(rTree_neighborhood_colors.count([0, 0, 0, 256, 256, 256]) and (index_all_colors < list_all_colors.shape[0])):
-            continuePainting()
-    else:
         # while more un-colored boundry locations exist and there are more colors to be placed, continue painting
-        while(count_available and (index_all_colors < list_all_colors.shape[0])):
-            continuePainting()
+        if (painting.painting_args.rtree and (painting.painting_args.q == 3)):
+            bool_painting = (len(painting.colorIndex_neighborhood_colors) and (painting.index_all_colors < painting.list_all_colors.shape[0]))
+        else:
+            bool_painting = (painting.count_available and (painting.index_all_colors < painting.list_all_colors.shape[0]))
+
+        if (bool_painting):
+            continuePainting(painting)
+
+        # while more un-colored boundry locations exist and there are more collision colors to be placed, continue painting
+        elif (painting.count_available and (painting.index_collided_colors < len(painting.list_collided_colors))):
+            print("Finishing with collided colors...")
+            finishPainting(painting)
+
+        else:
+            return False
+
+        checkpointPainting(painting)
+        profilePainting(painting)
+
+    return True
 
-    # while more un-colored boundry locations exist and there are more collision colors to be placed, continue painting
-    while(count_available and (index_collided_colors < len(list_collided_colors))):
-        print("Finishing with collided colors...")
-        finishPainting()
+
+# writes the finished painting and waits for its writers, then stops the process pool; gives the seconds the painting took
+def finishPaintingRun(painting):
 
     # Final Print Authoring
-    time_elapsed = time.time() - time_started
-    printCurrentCanvas(True)
+    time_elapsed = time.time() - painting.time_painting_started
+    profilePainting(painting, True)
+    printCurrentCanvas(painting, True)
     print("Painting Completed in " + "{:3.4f}".format(time_elapsed / 60) + " minutes!")
-    txt_file = open(str(config.PARSED_ARGS.f + '.txt'), 'a') 
+    txt_file = open(str(painting.painting_args.f + '.txt'), 'a') 
     print(("CompletedTime:"), file = txt_file)
     print(("{:3.4f}".format(time_elapsed / 60)), file = txt_file) 
     print(("minutes"), file = txt_file)
+    if (painting.painting_args.approx < 1.0):
+        print(getApproximationReport(painting))
+        print(getApproximationReport(painting), file = txt_file)
     txt_file.close() 
 
+    # wait for the last snapshots and checkpoint to be written
+    stopSnapshotWriter(painting)
+    if (painting.journal_file):
+        stopJournal(painting)
+    if (painting.checkpoint_writer_thread):
+        painting.checkpoint_writer_thread.join()
+
     # teardown the process pool
-    mutliprocessing_painter_manager.shutdown()
+    if (painting.mutliprocessing_painter_manager):
+        unloadBackend_multiprocessing(painting)
 
-# start the painting, by placing the first target color
-def startPainting():
+    # without snapshots the finished painting is written here from the files, which are then removed
+    if (painting.memmap_directory):
+        writeCanvasPng(painting, painting.canvas_actual_color, str(painting.painting_args.f + '.png'))
+        shutil.rmtree(painting.memmap_directory)
 
-    # Global Access
-    global index_all_colors
+    return time_elapsed
+
+# start the painting, by placing the first target color
+def startPainting(painting):
 
     # Setup
-    color_selected = list_all_colors[index_all_colors]
-    coordinate_start_point = numpy.array([config.PARSED_ARGS.s[0], config.PARSED_ARGS.s[1]])
-    index_all_colors += 1
+    color_selected = painting.list_all_colors[painting.index_all_colors]
+    coordinate_start_point = numpy.array([painting.painting_args.s[0], painting.painting_args.s[1]])
+    painting.index_all_colors += 1
 
     # draw the first color at the starting pixel
-    paintToCanvas(color_selected, coordinate_start_point)
+    paintToCanvas(painting, color_selected, coordinate_start_point)
 
-    if (config.PARSED_ARGS.rtree):
+    time_phase = startPhase(painting)
+    if (painting.painting_args.rtree and (painting.painting_args.q == 3)):
         # add its neigbors to uncolored Boundary Region
-        trackNewBoundyNeighbors_rTree(coordinate_start_point)
+        trackNewBoundyNeighbors_colorIndex(painting, coordinate_start_point)
+        endPhase(painting, 'index', time_phase)
     else:
         # for the 8 neighboring locations check that they are in the canvas and uncolored (black), then account for their availabity
-        trackNewBoundyNeighbors_bruteForce(coordinate_start_point)
+        trackNewBoundyNeighbors_bruteForce(painting, coordinate_start_point)
+        time_phase = endPhase(painting, 'frontier', time_phase)
+        if (painting.painting_args.rtree):
+            indexNeighborhood_colorIndex(painting, coordinate_start_point)
+            endPhase(painting, 'index', time_phase)
 
 
 # continue the painting, manages multiple painters or a single painter dynamically
-def continuePainting():
-
-    # Global Access
-    global index_all_colors
-    global mutliprocessing_painter_manager
-    global number_of_workers
+def continuePainting(painting):
 
     # if more than MIN_MULTI_WORKLOAD locations are available, allow multiprocessing, also check for config flag
-    bool_use_parallelization = ((count_available > config.DEFAULT_PAINTER['MIN_MULTI_WORKLOAD']) and config.PARSED_ARGS.multi)
+    sequential_work, parallel_work = BACKEND_WORK[painting.backend_selected]
+    bool_use_parallelization = ((painting.count_available > config.DEFAULT_PAINTER['MIN_MULTI_WORKLOAD']) and painting.painting_args.multi)
     if (bool_use_parallelization):
-        if (config.PARSED_ARGS.opencl):
-            parallelWork_openCL()
+        if (painting.painting_args.partition):
+            partitionedWork_python(painting)
         else:
-            parallelWork_python()
+            parallel_work(painting)
 
     # otherwise, use only the main process
     # This is because the overhead of multithreading makes singlethreading better for small problems
     else:
-        number_of_workers = 1
-        if (config.PARSED_ARGS.rtree):
-            sequentialWork_rTree()
-
-        elif(config.PARSED_ARGS.opencl):
-            sequentialWork_openCL()
+        painting.number_of_workers = 1
+        sequential_work(painting)
 
-        elif(config.PARSED_ARGS.numba):
-            sequentialWork_numba()
-
-        else:
-            sequentialWork_python()
 
+# finish the painting with the search of the selected backend, on the list of all colors that were not placed due to collisions
+def finishPainting(painting):
 
-# finish the painting using numba brute force on the list of all colors that were not placed due to collisions
-def finishPainting():
-    global index_collided_colors
-    global count_collisions
-    global number_of_workers
-
-    number_of_workers = 1
+    painting.number_of_workers = 1
 
     # get the color to be placed
-    color_selected = list_collided_colors[index_collided_colors]
-    index_collided_colors += 1
+    time_phase = startPhase(painting)
+    color_selected = painting.list_collided_colors[painting.index_collided_colors]
+    painting.index_collided_colors += 1
+    time_phase = endPhase(painting, 'select', time_phase)
 
     # find the best location for that color
-    coordinate_selected = getBestPositionForColor_numba(numpy.array(color_selected), numpy.array(list_availabilty), canvas_actual_color, config.PARSED_ARGS.q)[1]
+    coordinate_selected = getBestPositionForCollidedColor(painting, numpy.array(getComparedColor(painting, color_selected)))
+    endPhase(painting, 'search', time_phase)
 
     # attempt to paint the color at the corresponding location
-    paintToCanvas(color_selected, coordinate_selected)
-    count_collisions -= 1
+    paintToCanvas(painting, color_selected, coordinate_selected)
+    painting.count_collisions -= 1
 
 
-# attempts to paint the requested color at the requested location; checks for collisions
-def paintToCanvas(requested_color, requested_coord, knn_querry_result=False):
+# gives the best location for a color that collided, searched for by the backend painting
+#   the OpenCL kernel only searches for the colors on the device, its colors are searched for by the numpy search that gives the same locations
+#   a registered backend has no search of its own that can be called here, its colors are searched for by the python search
+def getBestPositionForCollidedColor(painting, color_compared):
 
-    # Global Access
-    global count_collisions
-    global count_colors_placed
-    global canvas_actual_color
+    if (painting.backend_selected == 'rtree'):
+        return getBestPositionForColor_colorIndex(painting, color_compared)
+    if (painting.backend_selected == 'numba'):
+        loadBackend(painting, 'numba')
+        return getBestPositionForColor_numba(color_compared, painting.list_availabilty[:painting.count_available], painting.canvas_compared_color, painting.canvas_neighborhood_sum, painting.canvas_neighborhood_sum_squared, painting.canvas_neighborhood_count, painting.painting_args.q, numba.get_num_threads())[1]
+    if (painting.backend_selected in ('numpy', 'opencl')):
+        return getBestPositionForColor_numpy(color_compared, painting.list_availabilty[:painting.count_available], painting.canvas_compared_color, painting.canvas_neighborhood_sum, painting.canvas_neighborhood_sum_squared, painting.canvas_neighborhood_count, painting.painting_args.q)[1]
+    return getBestPositionForColor_python(color_compared, painting.list_availabilty[:painting.count_available], painting.canvas_compared_color, painting.canvas_neighborhood_sum, painting.canvas_neighborhood_sum_squared, painting.canvas_neighborhood_count, painting.painting_args.q)[1]
+
+
+# gives a color as the searches compare it, its OKLab bytes with -oklab
+def getComparedColor(painting, requested_color):
+
+    if (painting.painting_args.oklab):
+        return colorTools.getPerceptualColors(requested_color, colorTools.getPerceptualBitDepth(painting.painting_args))
+    return requested_color
+
+
+# attempts to paint the requested color at the requested location; checks for collisions
+def paintToCanvas(painting, requested_color, requested_coord):
 
     # double check the the pixel is available
-    if (numpy.array_equal(canvas_actual_color[requested_coord[0], requested_coord[1]], COLOR_BLACK)):
+    time_phase = startPhase(painting)
+    if (numpy.array_equal(painting.canvas_actual_color[requested_coord[0], requested_coord[1]], COLOR_BLACK)):
 
         # the best position for rgb_requested_color has been found color it
-        canvas_actual_color[requested_coord[0], requested_coord[1]] = requested_color
-        count_colors_placed += 1
-
-        if (knn_querry_result):
-            # remove neighbor from rTree
-            unTrackCoordinate_rTree(knn_querry_result)
+        painting.canvas_actual_color[requested_coord[0], requested_coord[1]] = requested_color
+        painting.count_colors_placed += 1
+
+        # the 8 neighboring locations now have one more colored neighbor, as the searches compare it
+        #   painting black leaves the location looking uncolored, so it is no neighbor of them and is painted again later
+        if not (numpy.array_equal(requested_color, COLOR_BLACK)):
+            color_compared = getComparedColor(painting, requested_color)
+            if (painting.painting_args.oklab):
+                painting.canvas_compared_color[requested_coord[0], requested_coord[1]] = color_compared
+            trackNeighborhoodColor(painting, requested_coord, color_compared)
+
+        # remember the location so the device copy of the canvas can be updated
+        if (painting.painting_args.opencl):
+            painting.list_opencl_painted_coordinates.append((int(requested_coord[0]), int(requested_coord[1])))
+
+        # record the placement
+        if (painting.journal_file):
+            journalPlacement(painting, requested_coord, requested_color)
+        time_phase = endPhase(painting, 'paint', time_phase)
+
+        if (painting.painting_args.rtree and (painting.painting_args.q == 3)):
+            # remove neighbor from the color index
+            unTrackCoordinate_colorIndex(painting, requested_coord)
             # each valid neighbor position should be added to uncolored Boundary Region
-            trackNewBoundyNeighbors_rTree(requested_coord)
+            trackNewBoundyNeighbors_colorIndex(painting, requested_coord)
+            time_phase = endPhase(painting, 'index', time_phase)
 
         else:
             # remove neigbor from availibility canvas
-            unTrackCoordinate_bruteForce(requested_coord)
+            unTrackCoordinate_bruteForce(painting, requested_coord)
             # for the 8 neighboring locations check that they are in the canvas and uncolored (black), then account for their availabity
-            trackNewBoundyNeighbors_bruteForce(requested_coord)
+            trackNewBoundyNeighbors_bruteForce(painting, requested_coord)
+            time_phase = endPhase(painting, 'frontier', time_phase)
+
+            # the color index of the other strategies is kept beside the packed frontier, whose order breaks ties
+            if (painting.painting_args.rtree):
+                indexNeighborhood_colorIndex(painting, requested_coord)
+                time_phase = endPhase(painting, 'index', time_phase)
 
         # print progress
-        printCurrentCanvas()
+        printCurrentCanvas(painting)
+        endPhase(painting, 'output', time_phase)
 
     # collision
     else:
-        list_collided_colors.append(requested_color)
-        count_collisions += 1
+        painting.list_collided_colors.append(requested_color)
+        painting.count_collisions += 1
+        endPhase(painting, 'paint', time_phase)
+
 
+# writes the canvas to a png a band of rows at a time, so a canvas backed by files is never copied into memory whole
+def writeCanvasPng(painting, canvas_painting, output_name):
 
-# converts a canvas into raw data for writing to a png
-def getRawOutput():
+    with open(output_name, 'wb') as output_file:
+        painting.png_painter.write(output_file, (row for index_row in range(0, canvas_painting.shape[1], ROWS_PER_BAND) for row in getRawOutput(canvas_painting[:, index_row:(index_row + ROWS_PER_BAND)])))
+
+
+# converts a uint8 copy of the canvas into raw data for writing to a png
+def getRawOutput(canvas_snapshot):
 
     # converts the given canvas into a format that the PNG module can use to write a png
-    canvas_8bit = numpy.array(canvas_actual_color, numpy.uint8)
-    canvas_transposed = numpy.transpose(canvas_8bit, (1, 0, 2))
+    canvas_transposed = numpy.transpose(canvas_snapshot, (1, 0, 2))
     canvas_flipped = numpy.flip(canvas_transposed, 2)
-    return numpy.reshape(canvas_flipped, (canvas_actual_color.shape[1], canvas_actual_color.shape[0] * 3))
+    return numpy.reshape(canvas_flipped, (canvas_snapshot.shape[1], canvas_snapshot.shape[0] * 3))
 
 
 # prints the current state of canvas_actual_color as well as progress stats
-def printCurrentCanvas(finalize=False):
+def printCurrentCanvas(painting, finalize=False):
 
-    if (config.PARSED_ARGS.r == 0) and not (finalize):
+    if (painting.painting_args.r == 0) and not (finalize):
         return
 
-    # Global Access
-    global time_last_print
-
-    fps = 6
+    fps = config.DEFAULT_PAINTER['FRAME_RATE']
 
     # get time_elapsed time
     time_current = time.time()
-    time_elapsed = time_current - time_last_print
+    time_elapsed = time_current - painting.time_last_print
     
     if(time_elapsed >= 1.0):
         # write common files
-        writeFiles(time_current, time_elapsed)
+        writeFiles(painting, time_current, time_elapsed)
         
 
     elif (finalize):
         # write common files #fps number of times so that the gif ends with a full second of the completed image
         for _ in range(fps):
-            writeFiles(time_current, time_elapsed)
+            writeFiles(painting, time_current, time_elapsed)
         print("")
-        # make GIF
-        subprocess.call(['ffmpeg', '-nostats', '-hide_banner', '-loglevel', 'panic', '-y', '-r', str(fps), '-i', 'painting/%06d.png', str(config.PARSED_ARGS.f + '.gif')])
+        # make GIF, once every frame has been written; a streamed GIF is finished by stopSnapshotWriter instead, and -memmap has no frames
+        if not (painting.painting_args.stream or painting.painting_args.memmap):
+            painting.snapshot_writer_queue.join()
+            subprocess.call(['ffmpeg', '-nostats', '-hide_banner', '-loglevel', 'panic', '-y', '-r', str(fps), '-i', os.path.join(str(painting.painting_args.f + FRAMES_DIRECTORY_SUFFIX), '%06d.png'), str(painting.painting_args.f + '.gif')])
 
     # if debug flag set, slow down the painting process
-    if (config.PARSED_ARGS.debug):
+    if (painting.painting_args.debug):
         time.sleep(config.DEFAULT_PAINTER['DEBUG_WAIT_TIME'])
 
 
-def writeFiles(time_current, time_elapsed):
-    # Global Access
-    global time_last_print
-    global count_placed_at_last_print
-    global png_painter
-    global count_print
-
-    # name the output files
-    painting_output_name = (config.PARSED_ARGS.f + '.png')
-    gif_output_name = ("painting/" + "{:06d}".format(count_print) + '.png')
-    debug_outputname = ("temp.png")
-    
-    # open output files
-    painting_output_file = open(painting_output_name, 'wb')
-    gif_output_file = open(gif_output_name, 'wb')
-    debug_output_file = open(debug_outputname, 'wb')
-
-    # write PNGs
-    png_painter.write(painting_output_file, getRawOutput())
-    png_painter.write(gif_output_file, getRawOutput())
-    png_painter.write(debug_output_file, getRawOutput())
-    
-    # close PNGs
-    painting_output_file.close()
-    gif_output_file.close()
-    debug_output_file.close()
+# takes a snapshot of the painting and its stats, and hands it to the snapshot writer
+def writeFiles(painting, time_current, time_elapsed):
+    # raise any error from the snapshot writer on the painting thread
+    if (painting.snapshot_writer_errors):
+        raise painting.snapshot_writer_errors[0]
+
+    # name the frame, streamed frames have no file
+    #   with -memmap the canvas is not copied for snapshots, only the stats are written until the painting is finished
+    canvas_snapshot = None
+    gif_output_name = None
+    if not (painting.painting_args.memmap):
+        canvas_snapshot = numpy.array(painting.canvas_actual_color, numpy.uint8)
+        if not (painting.painting_args.stream):
+            gif_output_name = os.path.join(str(painting.painting_args.f + FRAMES_DIRECTORY_SUFFIX), ("{:06d}".format(painting.count_print) + '.png'))
 
     # Get Info
-    percent_complete = int(count_colors_placed * 100 / config.PARSED_ARGS.d[0] // config.PARSED_ARGS.d[1])
-    colors_placed_since_last_print = (count_colors_placed - count_placed_at_last_print)
+    percent_complete = int(painting.count_colors_placed * 100 / painting.painting_args.d[0] // painting.painting_args.d[1])
+    colors_placed_since_last_print = (painting.count_colors_placed - painting.count_placed_at_last_print)
     painting_rate = (colors_placed_since_last_print/time_elapsed)
-    rate_per_worker = (painting_rate/number_of_workers)
+    rate_per_worker = (painting_rate/painting.number_of_workers)
     info_print = "PixelsColored: {}. PixelsAvailable: {}. PercentComplete: {}. TotalCollisions: {}. Rate: {:3.2f}. WorkerCount: {}. RatePerWorker: {:3.2f}."
     
     # print to console
     print('\33[2K', end='\r')
-    print(info_print.format(count_colors_placed, count_available, percent_complete, count_collisions, painting_rate, number_of_workers, rate_per_worker), end='\r')
-    count_print += 1
+    print(info_print.format(painting.count_colors_placed, painting.count_available, percent_complete, painting.count_collisions, painting_rate, painting.number_of_workers, rate_per_worker), end='\r')
+    painting.count_print += 1
+
+    # queue the snapshot, waits if the writer has fallen too far behind
+    list_stats = [painting.count_colors_placed, painting.count_available, percent_complete, painting.count_collisions, float("{:3.2f}".format(painting_rate)), painting.number_of_workers, float("{:3.2f}".format(rate_per_worker))]
+    if (painting.bool_time_phases):
+        list_stats.extend(getPhaseStats(painting))
+    painting.snapshot_writer_queue.put((canvas_snapshot, painting.count_colors_placed, gif_output_name, list_stats))
+
+    painting.time_last_print = time_current
+    painting.count_placed_at_last_print = painting.count_colors_placed
+
+
+# starts the snapshot writer thread, and writes the header of the stats CSV that it keeps open
+#   with -stream, also starts the ffmpeg process that encodes the GIF from raw frames as the writer is given them
+#   a resumed painting streams to a new GIF, so its animation starts from where the painting was resumed
+#   the thread is given everything it uses rather than the Painter, so it never reads the state that the painting thread changes
+def startSnapshotWriter(painting):
+    # a resumed painting adds to the stats it already has
+    if (painting.painting_args.resume):
+        csv_file = open(str(painting.painting_args.f + '.csv'), 'a', newline='')
+        stats_writer = csv.writer(csv_file, delimiter=',')
+    else:
+        csv_file = open(str(painting.painting_args.f + '.csv'), 'w', newline='')
+        stats_writer = csv.writer(csv_file, delimiter=',')
+        list_stats_names = ['PixelsColored', 'PixelsAvailable', 'PercentComplete', 'TotalCollisions', 'Rate', 'WorkerCount', 'RatePerWorker']
+        if (painting.painting_args.timers):
+            list_stats_names.extend([(phase_name.capitalize() + stat_name) for phase_name in PHASE_NAMES for stat_name in ('Seconds', 'Count')] + ['WriteSeconds'])
+        stats_writer.writerow(list_stats_names)
 
-    # add to CSV
-    with open(str((config.PARSED_ARGS.f + '.csv')), 'a', newline='') as csvfile:
-        stats_writer = csv.writer(csvfile, delimiter=',')
-        stats_writer.writerow([count_colors_placed, count_available, percent_complete, count_collisions, float("{:3.2f}".format(painting_rate)), number_of_workers, float("{:3.2f}".format(rate_per_worker))])
+    painting.animation_encoder = None
+    if (painting.painting_args.stream):
+        painting.animation_encoder = subprocess.Popen(['ffmpeg', '-nostats', '-hide_banner', '-loglevel', 'panic', '-y', '-f', 'rawvideo', '-pix_fmt', 'rgb24', '-s', (str(painting.painting_args.d[0]) + 'x' + str(painting.painting_args.d[1])), '-r', str(config.DEFAULT_PAINTER['FRAME_RATE']), '-i', '-', str(painting.painting_args.f + '.gif')], stdin=subprocess.PIPE)
 
-    time_last_print = time_current
-    count_placed_at_last_print = count_colors_placed
+    painting.snapshot_writer_queue = queue.Queue(config.DEFAULT_PAINTER['MAX_QUEUED_SNAPSHOTS'])
+    painting.snapshot_writer_errors = []
+    painting.snapshot_writer_thread = threading.Thread(target=writeSnapshots, args=(painting.snapshot_writer_queue, painting.snapshot_writer_errors, painting.png_painter, painting.animation_encoder, csv_file, stats_writer, (painting.painting_args.f + '.png'), (painting.painting_args.f + SNAPSHOT_SUFFIX), painting.painting_args.timers), daemon=True)
+    painting.snapshot_writer_thread.start()
 
-def getColorBoundingBox(color):
-    return(color[0], color[1], color[2], color[0], color[1], color[2])
 
+# waits for every queued snapshot to be written, then stops the snapshot writer thread
+#   a streamed GIF is finished once ffmpeg has been given every frame
+def stopSnapshotWriter(painting):
+
+    painting.snapshot_writer_queue.put(None)
+    painting.snapshot_writer_thread.join()
+
+    if (painting.animation_encoder):
+        painting.animation_encoder.stdin.close()
+        painting.animation_encoder.wait()
+
+    if (painting.snapshot_writer_errors):
+        raise painting.snapshot_writer_errors[0]
+
+
+# runs on the snapshot writer thread, writing each queued snapshot until it is given None
+#   each snapshot is encoded once and the same PNG is written to every output file
+#   a snapshot of an unchanged painting reuses the previous encoding
+#   with -stream, the raw frame is given to the animation encoder instead of being written as a PNG of its own
+def writeSnapshots(snapshot_queue, list_errors, png_writer, animation_process, csv_file, stats_writer, painting_output_name, debug_outputname, bool_time_writes):
+
+    # Setup
+    png_encoded = None
+    raw_encoded = None
+    count_colors_encoded = -1
+
+    while True:
+        snapshot = snapshot_queue.get()
+        if (snapshot is None):
+            snapshot_queue.task_done()
+            break
+
+        try:
+            time_write_started = time.perf_counter()
+            canvas_snapshot, count_colors_snapshot, gif_output_name, list_stats = snapshot
+
+            # a snapshot without a canvas only has stats
+            if (canvas_snapshot is not None):
+
+                # encode the PNG
+                if (count_colors_snapshot != count_colors_encoded):
+                    raw_encoded = numpy.ascontiguousarray(getRawOutput(canvas_snapshot))
+                    png_buffer = io.BytesIO()
+                    png_writer.write(png_buffer, raw_encoded)
+                    png_encoded = png_buffer.getvalue()
+                    count_colors_encoded = count_colors_snapshot
+
+                # write PNGs
+                for output_name in (painting_output_name, gif_output_name, debug_outputname):
+                    if (output_name):
+                        with open(output_name, 'wb') as output_file:
+                            output_file.write(png_encoded)
+
+                # stream the frame
+                if (animation_process):
+                    animation_process.stdin.write(raw_encoded.tobytes())
+
+            # add to CSV, with the time this thread took to write the snapshot when the phases are timed
+            if (bool_time_writes):
+                list_stats = list_stats + [float("{:3.6f}".format(time.perf_counter() - time_write_started))]
+            stats_writer.writerow(list_stats)
+            csv_file.flush()
+
+        except Exception as error:
+            list_errors.append(error)
+
+        finally:
+            snapshot_queue.task_done()
+
+    csv_file.close()
+
+# adds a newly placed color to the neighborhood sums and counts of the 8 locations around it
+def trackNeighborhoodColor(painting, coordinate_requested, color_requested):
 
-# get the average color of a given location
-def getAverageColor(coordinate_requested):
     # Setup
-    index_of_neighbor = 0
-    rgb_color_sum = COLOR_BLACK
+    color_magnitude_squared = (int(color_requested[0]) * int(color_requested[0])) + (int(color_requested[1]) * int(color_requested[1])) + (int(color_requested[2]) * int(color_requested[2]))
 
-    # Get list_of_neighbors
-    # Don't consider BLACK pixels
     # Get all 8 neighbors, Loop over the 3x3 grid surrounding the location being considered
     for i in range(3):
         for j in range(3):
@@ -362,83 +739,544 @@ def getAverageColor(coordinate_requested):
             coordinate_neighbor = ((coordinate_requested[0] - 1 + i), (coordinate_requested[1] - 1 + j))
 
             # neighbor must be in the canvas
-            bool_neighbor_in_canvas = ((0 <= coordinate_neighbor[0] < canvas_actual_color.shape[0]) and (0 <= coordinate_neighbor[1] < canvas_actual_color.shape[1]))
+            bool_neighbor_in_canvas = ((0 <= coordinate_neighbor[0] < painting.canvas_actual_color.shape[0]) and (0 <= coordinate_neighbor[1] < painting.canvas_actual_color.shape[1]))
             if (bool_neighbor_in_canvas):
+                painting.canvas_neighborhood_sum[coordinate_neighbor[0], coordinate_neighbor[1]] += numpy.array(color_requested, numpy.uint32)
+                painting.canvas_neighborhood_sum_squared[coordinate_neighbor[0], coordinate_neighbor[1]] += color_magnitude_squared
+                painting.canvas_neighborhood_count[coordinate_neighbor[0], coordinate_neighbor[1]] += 1
 
-                # neighbor must also be black (not already colored)
-                bool_neighbor_is_black = numpy.array_equal(canvas_actual_color[coordinate_neighbor[0], coordinate_neighbor[1]], COLOR_BLACK)
-                if not (bool_neighbor_is_black):
 
-                    rgb_color_sum = numpy.add(canvas_actual_color[coordinate_neighbor[0], coordinate_neighbor[1]], rgb_color_sum)
-                    index_of_neighbor += 1
+# get the average color of a given location
+def getAverageColor(painting, coordinate_requested):
+    # Setup
+    index_of_neighbor = painting.canvas_neighborhood_count[coordinate_requested[0], coordinate_requested[1]]
 
     # check if the considered pixel has at least one valid coordinate_of_neighbor
     if (index_of_neighbor):
 
-        # divide through by the index_of_neighbor to average the color
-        rgb_divisor_array = numpy.array([index_of_neighbor, index_of_neighbor, index_of_neighbor], numpy.uint32)
-        rgb_average_color = numpy.divide(rgb_color_sum, rgb_divisor_array)
-        rgb_average_color_rounded = numpy.array(rgb_average_color, numpy.uint32)
-
-        return rgb_average_color_rounded
+        # divide the running neighborhood sum through by the number of neighbors to average the color
+        return numpy.floor_divide(painting.canvas_neighborhood_sum[coordinate_requested[0], coordinate_requested[1]], index_of_neighbor)
     else:
         return COLOR_BLACK
 
 
 # =============================================================================
-# BRUTE_FORCE
+# CHECKPOINTS
 # =============================================================================
-def sequentialWork_python():
-    # Global Access
-    global index_all_colors
+# takes a checkpoint and writes it on a background thread, once every checkpoint interval
+# a checkpoint is skipped if the last one is still being written, so the painting never waits on it
+def checkpointPainting(painting):
+    if not (painting.painting_args.checkpoint):
+        return
+
+    time_current = time.time()
+    if ((time_current - painting.time_last_checkpoint) < painting.painting_args.checkpoint):
+        return
+    if (painting.checkpoint_writer_thread and painting.checkpoint_writer_thread.is_alive()):
+        return
+
+    # the journal is never behind a checkpoint, so resuming can cut it back to the checkpoint
+    if (painting.journal_file):
+        flushJournal(painting)
+
+    painting.time_last_checkpoint = time_current
+    checkpoint_name = str(painting.painting_args.f + '.checkpoint.npz')
+    # with -memmap the canvases are not copied, so the checkpoint is written before the painting continues
+    if (painting.memmap_directory):
+        writeCheckpoint(getCheckpoint(painting), checkpoint_name)
+    else:
+        painting.checkpoint_writer_thread = threading.Thread(target=writeCheckpoint, args=(getCheckpoint(painting), checkpoint_name))
+        painting.checkpoint_writer_thread.start()
+
+
+# gives copies of everything needed to continue the painting
+#   the colors are not saved, they are generated again from the random state they were first generated with
+#   the neighborhood sums and counts and the frontier are rebuilt from the painting, the frontier in its saved order so ties are broken the same way
+def getCheckpoint(painting):
 
+    # the frontier of the spatial index is saved in the order of its entries within each cell
+    if (painting.painting_args.rtree and (painting.painting_args.q == 3)):
+        list_frontier = getLocationCoordinates(painting, painting.colorIndex_neighborhood_colors.getEntries())
+    else:
+        list_frontier = painting.list_availabilty[:painting.count_available].copy()
+
+    checkpoint = dict(
+        arguments = numpy.array(json.dumps(vars(painting.painting_args))),
+        canvas = getCheckpointCanvas(painting, painting.canvas_actual_color, numpy.uint8),
+        frontier = list_frontier,
+        collided_colors = numpy.array(painting.list_collided_colors, numpy.uint8).reshape(-1, 3),
+        counters = numpy.array([painting.index_all_colors, painting.index_collided_colors, painting.count_collisions, painting.count_colors_placed, painting.count_print], numpy.int64),
+        random_state_keys = painting.random_state_colors[1],
+        random_state_values = numpy.array([painting.random_state_colors[2], painting.random_state_colors[3], painting.random_state_colors[4]], numpy.float64)
+    )
+
+    # the compared canvas is saved, rather than looking up the OKLab bytes of the whole painting again
+    if (painting.painting_args.oklab):
+        checkpoint['compared_canvas'] = getCheckpointCanvas(painting, painting.canvas_compared_color, numpy.uint8)
+
+    # the approximate search continues drawing the same samples, and measuring its quality from where it was
+    if (painting.painting_args.approx < 1.0):
+        checkpoint['approximate_state'] = numpy.array(json.dumps(painting.approximate_generator.bit_generator.state))
+        checkpoint['approximate_quality'] = numpy.array([painting.count_approximate_searches, painting.count_quality_samples, painting.distance_excess_total, painting.distance_exact_total], numpy.float64)
+
+    return checkpoint
+
+
+# runs on the checkpoint writer thread, replaces the last checkpoint only once the new one is complete
+#   writes the same compressed .npz as numpy.savez_compressed, but each array a band of rows at a time, so a canvas backed by files is not read into memory whole
+def writeCheckpoint(checkpoint, checkpoint_name):
+
+    with zipfile.ZipFile(checkpoint_name + '.tmp', 'w', zipfile.ZIP_DEFLATED, allowZip64=True) as checkpoint_file:
+        for array_name, array_saved in checkpoint.items():
+            with checkpoint_file.open(array_name + '.npy', 'w', force_zip64=True) as array_file:
+                numpy.lib.format.write_array_header_2_0(array_file, dict(descr=numpy.lib.format.dtype_to_descr(array_saved.dtype), fortran_order=False, shape=array_saved.shape))
+                # a single value is written as one row
+                array_rows = (array_saved.reshape(-1) if (array_saved.ndim == 0) else array_saved)
+                for index_row in range(0, array_rows.shape[0], ROWS_PER_BAND):
+                    array_file.write(numpy.ascontiguousarray(array_rows[index_row:(index_row + ROWS_PER_BAND)]).tobytes())
+    os.replace(checkpoint_name + '.tmp', checkpoint_name)
+
+
+# restores the painting saved by getCheckpoint onto the empty canvas made by setupCanvas
+def loadCheckpoint(painting):
+    with numpy.load(painting.painting_args.resume) as checkpoint:
+
+        # generate the same colors again
+        random_state_values = checkpoint['random_state_values']
+        painting.random_state_colors = ('MT19937', checkpoint['random_state_keys'], int(random_state_values[0]), int(random_state_values[1]), float(random_state_values[2]))
+        random_state = numpy.random.RandomState()
+        random_state.set_state(painting.random_state_colors)
+        painting.list_all_colors = colorTools.generateColors(painting.painting_args, random_state)
+
+        # restore the painting and the counters
+        painting.canvas_actual_color[...] = checkpoint['canvas']
+        if (painting.painting_args.oklab):
+            painting.canvas_compared_color[...] = checkpoint['compared_canvas']
+        if (painting.painting_args.approx < 1.0):
+            painting.approximate_generator.bit_generator.state = json.loads(str(checkpoint['approximate_state']))
+            painting.count_approximate_searches, painting.count_quality_samples = [int(counter) for counter in checkpoint['approximate_quality'][:2]]
+            painting.distance_excess_total, painting.distance_exact_total = [float(total) for total in checkpoint['approximate_quality'][2:]]
+        painting.list_collided_colors = list(checkpoint['collided_colors'])
+        painting.index_all_colors, painting.index_collided_colors, painting.count_collisions, painting.count_colors_placed, painting.count_print = [int(counter) for counter in checkpoint['counters']]
+        painting.count_placed_at_last_print = painting.count_colors_placed
+        list_frontier = checkpoint['frontier']
+
+    # rebuild the neighborhood sums and counts, every colored location adds its compared color to each of its 8 neighbors
+    #   a location painted black looks uncolored, its compared color is black and it is not counted
+    color_magnitude_squared = getCanvasArray(painting, painting.canvas_neighborhood_sum_squared.shape, numpy.uint32, 'color_magnitude_squared')
+    numpy.einsum('xyc,xyc->xy', painting.canvas_compared_color, painting.canvas_compared_color, out=color_magnitude_squared, dtype=numpy.uint32)
+    canvas_colored = getCanvasArray(painting, painting.canvas_neighborhood_count.shape, numpy.bool, 'canvas_colored')
+    numpy.any(painting.canvas_actual_color, axis=2, out=canvas_colored)
+    for offset in NEIGHBOR_OFFSETS:
+        slice_neighbors = tuple(slice(max(0, offset[axis]), (painting.canvas_compared_color.shape[axis] + min(0, offset[axis]))) for axis in range(2))
+        slice_locations = tuple(slice(max(0, -offset[axis]), (painting.canvas_compared_color.shape[axis] - max(0, offset[axis]))) for axis in range(2))
+        painting.canvas_neighborhood_sum[slice_neighbors] += painting.canvas_compared_color[slice_locations]
+        painting.canvas_neighborhood_sum_squared[slice_neighbors] += color_magnitude_squared[slice_locations]
+        painting.canvas_neighborhood_count[slice_neighbors] += canvas_colored[slice_locations]
+    removeCanvasArray(color_magnitude_squared)
+    removeCanvasArray(canvas_colored)
+
+    # rebuild the frontier
+    for coordinate_available in list_frontier:
+        if (painting.painting_args.rtree and (painting.painting_args.q == 3)):
+            trackCoordinate_colorIndex(painting, coordinate_available)
+        else:
+            trackCoordinate_bruteForce(painting, coordinate_available)
+
+    # then the color index of the other strategies, from the frontier and the painting
+    if (painting.painting_args.rtree and not (painting.painting_args.q == 3)):
+        indexCanvas_colorIndex(painting)
+
+
+# =============================================================================
+# JOURNAL
+# =============================================================================
+# opens the placement journal, writing its header
+#   a resumed painting cuts its journal back to the placements in the checkpoint, and records the placements after them
+def startJournal(painting):
+    journal_name = str(painting.painting_args.f + '.journal')
+    if (painting.painting_args.resume):
+        painting.journal_file = open(journal_name, 'r+b')
+        painting.journal_file.truncate(JOURNAL_HEADER.itemsize + (painting.count_colors_placed * JOURNAL_RECORD.itemsize))
+        painting.journal_file.seek(0, os.SEEK_END)
+    else:
+        painting.journal_file = open(journal_name, 'wb')
+        painting.journal_file.write(numpy.array([(JOURNAL_MAGIC, painting.painting_args.d[0], painting.painting_args.d[1])], JOURNAL_HEADER).tobytes())
+
+    painting.journal_block = numpy.zeros(config.DEFAULT_PAINTER['JOURNAL_BLOCK_SIZE'], JOURNAL_RECORD)
+    painting.index_journal_block = 0
+
+
+# adds a placement to the journal, writing the block of records once it is full
+def journalPlacement(painting, coordinate_requested, color_requested):
+    journal_record = painting.journal_block[painting.index_journal_block]
+    journal_record['order'] = painting.count_colors_placed - 1
+    journal_record['x'] = coordinate_requested[0]
+    journal_record['y'] = coordinate_requested[1]
+    journal_record['color'] = color_requested
+    painting.index_journal_block += 1
+
+    if (painting.index_journal_block == painting.journal_block.shape[0]):
+        flushJournal(painting)
+
+
+# adds placements painted together to the journal, the last of them being the latest placement
+def journalPlacements(painting, list_coordinates, list_colors):
+    index_record = 0
+    while (index_record < list_coordinates.shape[0]):
+
+        # fill as much of the block as the placements or the room left allow
+        count_records = min((list_coordinates.shape[0] - index_record), (painting.journal_block.shape[0] - painting.index_journal_block))
+        journal_records = painting.journal_block[painting.index_journal_block:(painting.index_journal_block + count_records)]
+        journal_records['order'] = numpy.arange(count_records) + (painting.count_colors_placed - list_coordinates.shape[0] + index_record)
+        journal_records['x'] = list_coordinates[index_record:(index_record + count_records), 0]
+        journal_records['y'] = list_coordinates[index_record:(index_record + count_records), 1]
+        journal_records['color'] = list_colors[index_record:(index_record + count_records)]
+        painting.index_journal_block += count_records
+        index_record += count_records
+
+        if (painting.index_journal_block == painting.journal_block.shape[0]):
+            flushJournal(painting)
+
+
+# writes the records waiting in the block to the journal
+def flushJournal(painting):
+    painting.journal_file.write(painting.journal_block[:painting.index_journal_block].tobytes())
+    painting.journal_file.flush()
+    painting.index_journal_block = 0
+
+
+# writes the last records and closes the journal
+def stopJournal(painting):
+    flushJournal(painting)
+    painting.journal_file.close()
+    painting.journal_file = None
+
+
+# =============================================================================
+# TIMERS
+# =============================================================================
+# gives the time a phase of the painting starts at, only read when the phases are timed
+def startPhase(painting):
+
+    if (painting.bool_time_phases):
+        return time.perf_counter()
+    return 0
+
+
+# adds the time since time_phase_started to the given phase; gives the time it ended so that the next phase can start from it
+def endPhase(painting, phase_name, time_phase_started):
+
+    if not (painting.bool_time_phases):
+        return 0
+
+    time_current = time.perf_counter()
+    painting.dict_phase_seconds[phase_name] += (time_current - time_phase_started)
+    painting.dict_phase_counts[phase_name] += 1
+    return time_current
+
+
+# gives the seconds spent in and number of times through each phase since the last stats row, then starts counting again
+def getPhaseStats(painting):
+
+    list_phase_stats = []
+    for phase_name in PHASE_NAMES:
+        list_phase_stats.extend([float("{:3.6f}".format(painting.dict_phase_seconds[phase_name])), painting.dict_phase_counts[phase_name]])
+        painting.dict_phase_seconds[phase_name] = 0.0
+        painting.dict_phase_counts[phase_name] = 0
+
+    return list_phase_stats
+
+
+# profiles the main process from when the first -profile count colors are placed until the next -profile count colors are
+#   the stats are written to a .prof file and the functions that took the most time are printed
+#   the profile is also written if the painting is finalized before the window ends
+def profilePainting(painting, finalize=False):
+    if not (painting.painting_args.profile):
+        return
+
+    count_profile_start = painting.painting_args.profile[0]
+    count_profile_end = (painting.painting_args.profile[0] + painting.painting_args.profile[1])
+
+    if (painting.painting_profiler is None):
+        if ((count_profile_start <= painting.count_colors_placed < count_profile_end) and not (finalize)):
+            painting.painting_profiler = cProfile.Profile()
+            painting.painting_profiler.enable()
+
+    elif (painting.painting_profiler and ((painting.count_colors_placed >= count_profile_end) or finalize)):
+        painting.painting_profiler.disable()
+        painting.painting_profiler.dump_stats(str(painting.painting_args.f + '.prof'))
+        print('\33[2K', end='\r')
+        print("Profiled placements " + str(count_profile_start) + " to " + str(painting.count_colors_placed) + ", written to " + painting.painting_args.f + ".prof")
+        pstats.Stats(painting.painting_profiler).sort_stats('tottime').print_stats(20)
+        # the window has been profiled, do not profile again
+        painting.painting_profiler = False
+
+
+# gives how many colors can be placed before the next edge of the -profile window, so a backend placing many colors at once stops on it
+def getPlacementsToProfileEdge(painting):
+
+    if (painting.painting_args.profile and (painting.painting_profiler is not False)):
+        for count_profile_edge in (painting.painting_args.profile[0], (painting.painting_args.profile[0] + painting.painting_args.profile[1])):
+            if (painting.count_colors_placed < count_profile_edge):
+                return (count_profile_edge - painting.count_colors_placed)
+
+    return sys.maxsize
+
+
+# =============================================================================
+# APPROXIMATE
+# =============================================================================
+# gives the available locations to score for the next color: all of them, or with -approx a random sample of about that fraction of them
+#   the sample has no location twice; a frontier of no more than MIN_SAMPLED_LOCATIONS is always searched whole
+def getSearchedCoordinates(painting):
+
+    count_sampled = max(config.DEFAULT_APPROX['MIN_SAMPLED_LOCATIONS'], int(painting.count_available * painting.painting_args.approx))
+    if (count_sampled >= painting.count_available):
+        return painting.list_availabilty[:painting.count_available]
+
+    return painting.list_availabilty[painting.approximate_generator.choice(painting.count_available, count_sampled, replace=False)]
+
+
+# with -approx, once every QUALITY_SAMPLE_RATE searches of a sample also scores the whole frontier, adding up how much further the selected location was than the best one
+#   searches of the whole frontier are exact, and are not counted
+#   distances are scored by the backend painting, as the search compared them
+def measureApproximation(painting, color_selected, coordinate_selected, list_searched_coordinates):
+    if (list_searched_coordinates.shape[0] >= painting.count_available) or (coordinate_selected[0] < 0):
+        return
+
+    painting.count_approximate_searches += 1
+    if (painting.count_approximate_searches % config.DEFAULT_APPROX['QUALITY_SAMPLE_RATE']):
+        return
+
+    # the selected location is still available, so its row of the frontier holds its distance
+    list_distances = getDistancesForLocations_selected(painting, color_selected, painting.list_availabilty[:painting.count_available])
+    distance_exact = float(list_distances.min())
+    distance_selected = float(list_distances[painting.canvas_availability_index[coordinate_selected[0], coordinate_selected[1]]])
+
+    painting.count_quality_samples += 1
+    painting.distance_excess_total += (distance_selected - distance_exact)
+    painting.distance_exact_total += distance_exact
+
+
+# gives the distance of the requested color from each of the given locations, scored by the distance function of the backend painting
+def getDistancesForLocations_selected(painting, color_selected, list_available_coordinates):
+
+    if (painting.backend_selected == 'numpy'):
+        return getDistancesForLocations_numpy(color_selected, list_available_coordinates, painting.canvas_compared_color, painting.canvas_neighborhood_sum, painting.canvas_neighborhood_sum_squared, painting.canvas_neighborhood_count, painting.painting_args.q)
+
+    getDistanceForLocation = (getDistanceForLocation_numba if (painting.backend_selected == 'numba') else getDistanceForLocation_python)
+    return numpy.array([getDistanceForLocation(color_selected, coordinate_available[0], coordinate_available[1], painting.canvas_compared_color, painting.canvas_neighborhood_sum, painting.canvas_neighborhood_sum_squared, painting.canvas_neighborhood_count, painting.painting_args.q) for coordinate_available in list_available_coordinates], numpy.float64)
+
+
+# gives the quality lost to the approximate search, as the mean excess and mean exact distance of the measured searches
+def getApproximationReport(painting):
+
+    if not (painting.count_quality_samples):
+        return "ApproximateSearches: {}. None measured.".format(painting.count_approximate_searches)
+
+    return "ApproximateSearches: {}. Measured: {}. MeanExcessDistance: {:3.2f}. MeanExactDistance: {:3.2f}.".format(painting.count_approximate_searches, painting.count_quality_samples, (painting.distance_excess_total / painting.count_quality_samples), (painting.distance_exact_total / painting.count_quality_samples))
+
+
+# =============================================================================
+# BRUTE_FORCE
+# =============================================================================
+def sequentialWork_python(painting):
     # get the color to be placed
-    color_selected = list_all_colors[index_all_colors]
-    index_all_colors += 1
+    time_phase = startPhase(painting)
+    color_selected = painting.list_all_colors[painting.index_all_colors]
+    color_compared = painting.list_compared_colors[painting.index_all_colors]
+    painting.index_all_colors += 1
+    time_phase = endPhase(painting, 'select', time_phase)
 
     # find the best location for that color
-    coordinate_selected = getBestPositionForColor_python(color_selected, numpy.array(list_availabilty), canvas_actual_color, config.PARSED_ARGS.q)[1]
+    list_searched_coordinates = getSearchedCoordinates(painting)
+    coordinate_selected = getBestPositionForColor_python(color_compared, list_searched_coordinates, painting.canvas_compared_color, painting.canvas_neighborhood_sum, painting.canvas_neighborhood_sum_squared, painting.canvas_neighborhood_count, painting.painting_args.q)[1]
+    measureApproximation(painting, color_compared, coordinate_selected, list_searched_coordinates)
+    endPhase(painting, 'search', time_phase)
     # attempt to paint the color at the corresponding location
-    paintToCanvas(color_selected, coordinate_selected)
+    paintToCanvas(painting, color_selected, coordinate_selected)
 
 
-def parallelWork_python():
-    # Global Access
-    global index_all_colors
-    global mutliprocessing_painter_manager
-    global number_of_workers
+def parallelWork_python(painting):
+    loadBackend(painting, 'multiprocessing')
 
     # cap the number of workers so that there are at least LOCATIONS_PER_PAINTER free locations per worker
     # this keeps the number of collisions down
     # limit the total possible workers to MAX_PAINTERS_GPU (twice the CPU count) to not add unnecessary overhead
     # loop over each one
+    list_colors_selected = []
     list_painter_work_queue = []
-    number_of_workers = (min(((count_available//config.DEFAULT_PAINTER['LOCATIONS_PER_PAINTER']), config.DEFAULT_PAINTER['MAX_PAINTERS_CPU'], (NUMBER_OF_COLORS - index_all_colors))))
-    for _ in range(number_of_workers):
+    painting.number_of_workers = (min(((painting.count_available//config.DEFAULT_PAINTER['LOCATIONS_PER_PAINTER']), config.DEFAULT_PAINTER['MAX_PAINTERS_CPU'], (painting.list_all_colors.shape[0] - painting.index_all_colors))))
+    time_phase = startPhase(painting)
+    for _ in range(painting.number_of_workers):
 
         # check that more colors are available
-        if (index_all_colors < len(list_all_colors)):
+        if (painting.index_all_colors < len(painting.list_all_colors)):
 
             # get the color to be placed
-            color_selected = list_all_colors[index_all_colors]
-            index_all_colors += 1
+            list_colors_selected.append(painting.list_all_colors[painting.index_all_colors])
+            color_compared = painting.list_compared_colors[painting.index_all_colors]
+            painting.index_all_colors += 1
 
             # schedule a worker to find the best location for that color
-            list_painter_work_queue.append(mutliprocessing_painter_manager.submit(getBestPositionForColor_python, color_selected, numpy.array(list_availabilty), canvas_actual_color, config.PARSED_ARGS.q))
+            # the painting is shared with the workers, so only the color and the size of the frontier are sent
+            list_painter_work_queue.append(painting.mutliprocessing_painter_manager.submit(getBestPositionForColor_multiprocessing, color_compared, 0, painting.count_available, painting.painting_args.q, painting.painting_args.numpy))
+    time_phase = endPhase(painting, 'ipc', time_phase)
 
-    # as each worker completes
-    for painter_worker in concurrent.futures.as_completed(list_painter_work_queue):
+    # wait for every worker before painting, the workers read the painting while they search
+    list_painter_results = [painter_worker.result() for painter_worker in list_painter_work_queue]
+    endPhase(painting, 'search', time_phase)
 
-        # collect the best location for that color
-        worker_color_selected = painter_worker.result()[0]
-        worker_corrdinate_selected = painter_worker.result()[1]
+    # attempt to paint each color at its corresponding location
+    for worker_color_selected, (_, worker_corrdinate_selected) in zip(list_colors_selected, list_painter_results):
+        paintToCanvas(painting, worker_color_selected, worker_corrdinate_selected)
 
-        # attempt to paint the color at the corresponding location
-        paintToCanvas(worker_color_selected, worker_corrdinate_selected)
+
+# places one color using every worker, each one searching a slice of the available locations
+# the best location of each slice is then compared again in slice order, so the first best location is chosen just like a single process would
+def partitionedWork_python(painting):
+    # Setup
+    if (painting.painting_args.numpy):
+        getBestPositionForColor_selected = getBestPositionForColor_numpy
+    else:
+        getBestPositionForColor_selected = getBestPositionForColor_python
+
+    # get the color to be placed
+    time_phase = startPhase(painting)
+    color_selected = painting.list_all_colors[painting.index_all_colors]
+    color_compared = painting.list_compared_colors[painting.index_all_colors]
+    painting.index_all_colors += 1
+    time_phase = endPhase(painting, 'select', time_phase)
+
+    # keep at least MIN_PARTITION_SIZE locations per worker, a smaller slice costs more to schedule than to search
+    painting.number_of_workers = max(1, min((painting.count_available // config.DEFAULT_PAINTER['MIN_PARTITION_SIZE']), (os.cpu_count() or 1)))
+    list_partition_bounds = numpy.linspace(0, painting.count_available, (painting.number_of_workers + 1)).astype(numpy.int64)
+
+    # a frontier too small to split is searched here, a single slice would only add the cost of sending it to a worker
+    if (painting.number_of_workers == 1):
+        coordinate_selected = getBestPositionForColor_selected(color_compared, painting.list_availabilty[:painting.count_available], painting.canvas_compared_color, painting.canvas_neighborhood_sum, painting.canvas_neighborhood_sum_squared, painting.canvas_neighborhood_count, painting.painting_args.q)[1]
+        endPhase(painting, 'search', time_phase)
+        paintToCanvas(painting, color_selected, coordinate_selected)
+        return
+
+    # schedule a worker to find the best location in each slice
+    loadBackend(painting, 'multiprocessing')
+    list_painter_work_queue = [painting.mutliprocessing_painter_manager.submit(getBestPositionForColor_multiprocessing, color_compared, int(list_partition_bounds[index]), int(list_partition_bounds[index + 1]), painting.painting_args.q, painting.painting_args.numpy) for index in range(painting.number_of_workers)]
+    time_phase = endPhase(painting, 'ipc', time_phase)
+    list_partition_coordinates = numpy.array([painter_worker.result()[1] for painter_worker in list_painter_work_queue], numpy.int32)
+
+    # choose between the best location of each slice
+    list_partition_coordinates = list_partition_coordinates[list_partition_coordinates[:, 0] >= 0]
+    coordinate_selected = getBestPositionForColor_selected(color_compared, list_partition_coordinates, painting.canvas_compared_color, painting.canvas_neighborhood_sum, painting.canvas_neighborhood_sum_squared, painting.canvas_neighborhood_count, painting.painting_args.q)[1]
+    endPhase(painting, 'search', time_phase)
+
+    # attempt to paint the color at the corresponding location
+    paintToCanvas(painting, color_selected, coordinate_selected)
+
+
+# starts the pool of processes used by parallelWork_python, and moves the arrays that they read into shared memory
+def loadBackend_multiprocessing(painting):
+    # Setup
+    # the workers only read the canvas they compare, which is canvas_actual_color itself unless -oklab
+    bool_canvas_compared_shared = (painting.canvas_compared_color is painting.canvas_actual_color)
+    painting.list_availabilty = getSharedArray_multiprocessing(painting, painting.list_availabilty)
+    painting.canvas_compared_color = getSharedArray_multiprocessing(painting, painting.canvas_compared_color)
+    if (bool_canvas_compared_shared):
+        painting.canvas_actual_color = painting.canvas_compared_color
+    painting.canvas_neighborhood_sum = getSharedArray_multiprocessing(painting, painting.canvas_neighborhood_sum)
+    painting.canvas_neighborhood_sum_squared = getSharedArray_multiprocessing(painting, painting.canvas_neighborhood_sum_squared)
+    painting.canvas_neighborhood_count = getSharedArray_multiprocessing(painting, painting.canvas_neighborhood_count)
+
+    # once the numba search has started its threads, a forked worker inherits them and never exits; start the workers fresh instead
+    painter_context = None
+    if ('numba' in list_loaded_backends):
+        painter_context = multiprocessing.get_context('spawn')
+
+    # each worker attaches to the shared memory once when it starts
+    painting.mutliprocessing_painter_manager = concurrent.futures.ProcessPoolExecutor(mp_context=painter_context, initializer=attachSharedMemory_multiprocessing, initargs=(painting.list_shared_array_layouts,))
+
+
+# stops the pool of processes, and moves the shared arrays back into private memory so the shared memory can be freed
+def unloadBackend_multiprocessing(painting):
+    painting.mutliprocessing_painter_manager.shutdown()
+    painting.mutliprocessing_painter_manager = None
+    painting.list_painting_backends.remove('multiprocessing')
+
+    bool_canvas_compared_shared = (painting.canvas_compared_color is painting.canvas_actual_color)
+    painting.list_availabilty = getPrivateArray_multiprocessing(painting.list_availabilty)
+    painting.canvas_compared_color = getPrivateArray_multiprocessing(painting.canvas_compared_color)
+    if (bool_canvas_compared_shared):
+        painting.canvas_actual_color = painting.canvas_compared_color
+    painting.canvas_neighborhood_sum = getPrivateArray_multiprocessing(painting.canvas_neighborhood_sum)
+    painting.canvas_neighborhood_sum_squared = getPrivateArray_multiprocessing(painting.canvas_neighborhood_sum_squared)
+    painting.canvas_neighborhood_count = getPrivateArray_multiprocessing(painting.canvas_neighborhood_count)
+
+    for shared_memory_block in painting.list_shared_memory_blocks:
+        shared_memory_block.close()
+        shared_memory_block.unlink()
+    painting.list_shared_memory_blocks = []
+    painting.list_shared_array_layouts = []
+
+
+# gives a copy of the array that is held in a new shared memory block, and records how the workers can attach to it
+# an array backed by a file is already shared through that file, and is given as is
+def getSharedArray_multiprocessing(painting, array_private):
+
+    if (isinstance(array_private.base, numpy.memmap)):
+        painting.list_shared_array_layouts.append((array_private.base.filename, None, array_private.shape, array_private.dtype.str))
+        return array_private
+
+    shared_memory_block = multiprocessing.shared_memory.SharedMemory(create=True, size=max(1, array_private.nbytes))
+    painting.list_shared_memory_blocks.append(shared_memory_block)
+    painting.list_shared_array_layouts.append((None, shared_memory_block.name, array_private.shape, array_private.dtype.str))
+
+    array_shared = numpy.ndarray(array_private.shape, array_private.dtype, buffer=shared_memory_block.buf)
+    array_shared[...] = array_private
+    return array_shared
+
+
+# gives a copy of a shared array in private memory, an array backed by a file is given as is
+def getPrivateArray_multiprocessing(array_shared):
+
+    if (isinstance(array_shared.base, numpy.memmap)):
+        return array_shared
+
+    return numpy.array(array_shared)
+
+
+# runs once in each worker process, pointing its painting arrays at the files and shared memory blocks made by the main process
+#   the arrays are list_availabilty, canvas_compared_color, canvas_neighborhood_sum, canvas_neighborhood_sum_squared and canvas_neighborhood_count, in that order
+def attachSharedMemory_multiprocessing(list_shared_array_layouts):
+    # Global Access
+    global worker_shared_memory_blocks
+    global worker_painting_arrays
+
+    worker_shared_memory_blocks = []
+    list_shared_arrays = []
+    for file_name, block_name, array_shape, array_dtype in list_shared_array_layouts:
+        if (file_name):
+            list_shared_arrays.append(numpy.memmap(file_name, numpy.dtype(array_dtype), 'r+', shape=array_shape).view(numpy.ndarray))
+        else:
+            worker_shared_memory_blocks.append(multiprocessing.shared_memory.SharedMemory(name=block_name))
+            list_shared_arrays.append(numpy.ndarray(array_shape, numpy.dtype(array_dtype), buffer=worker_shared_memory_blocks[-1].buf))
+    worker_painting_arrays = tuple(list_shared_arrays)
+
+
+# runs in a worker process, gives the best location for the requested color among the available locations in rows index_start to index_end of the shared painting; Also returns the color itself
+def getBestPositionForColor_multiprocessing(color_selected, index_start, index_end, mode_selected, use_numpy):
+
+    # Setup
+    list_availabilty, canvas_compared_color, canvas_neighborhood_sum, canvas_neighborhood_sum_squared, canvas_neighborhood_count = worker_painting_arrays
+
+    if (use_numpy):
+        return getBestPositionForColor_numpy(color_selected, list_availabilty[index_start:index_end], canvas_compared_color, canvas_neighborhood_sum, canvas_neighborhood_sum_squared, canvas_neighborhood_count, mode_selected)
+    else:
+        return getBestPositionForColor_python(color_selected, list_availabilty[index_start:index_end], canvas_compared_color, canvas_neighborhood_sum, canvas_neighborhood_sum_squared, canvas_neighborhood_count, mode_selected)
 
 
 # Gives the best location among all avilable for the requested color; Also returns the color itself
-def getBestPositionForColor_python(color_selected, list_available_coordinates, canvas_painting, mode_selected):
+def getBestPositionForColor_python(color_selected, list_available_coordinates, canvas_painting, canvas_sum, canvas_sum_squared, canvas_count, mode_selected):
 
     # reset minimums
     coordinate_minumum = COORDINATE_INVALID
@@ -447,12 +1285,36 @@ def getBestPositionForColor_python(color_selected, list_available_coordinates, c
     # for every coordinate_available position in the boundry, perform the check, keep the best position:
     for index in range(list_available_coordinates.shape[0]):
 
-        index_neighbor_diffs = 0
-        list_neighbor_diffs = [0, 0, 0, 0, 0, 0, 0, 0]
-        color_difference = [0, 0, 0]
-        color_difference_squared = [0, 0, 0]
-        neigborColor = [0, 0, 0]
-        color_neighborhood_average = [0, 0, 0]
+        coordinate_available = list_available_coordinates[index]
+        distance_found = getDistanceForLocation_python(color_selected, coordinate_available[0], coordinate_available[1], canvas_painting, canvas_sum, canvas_sum_squared, canvas_count, mode_selected)
+
+        # if it is the best so far save the value and its location
+        if (distance_found < distance_minumum):
+            distance_minumum = distance_found
+            coordinate_minumum = coordinate_available
+
+    # copy the coordinate out so it is not changed when the location is un-tracked
+    return (color_selected, coordinate_minumum.copy())
+
+
+# Gives how far the requested color is from the neighborhood of an available location; sys.maxsize for a location with no colored neighbors
+def getDistanceForLocation_python(color_selected, coordinate_x, coordinate_y, canvas_painting, canvas_sum, canvas_sum_squared, canvas_count, mode_selected):
+
+    color_difference = [0, 0, 0]
+    color_neighborhood_average = [0, 0, 0]
+
+    # the number of colored neighbors is kept current by paintToCanvas
+    count_neighbors = int(canvas_count[coordinate_x, coordinate_y])
+
+    # if it has no valid neighbors, maximise its colorDiff
+    if not (count_neighbors):
+        return sys.maxsize
+
+    # check operational mode and find the resulting distance
+    if (mode_selected == 1):
+
+        # return the minimum difference of all the neighbors
+        distance_found = sys.maxsize
 
         # Get all 8 neighbors, Loop over the 3x3 grid surrounding the location being considered
         for i in range(3):
@@ -464,7 +1326,7 @@ def getBestPositionForColor_python(color_selected, list_available_coordinates, c
                     continue
 
                 # calculate the neigbor's coordinates
-                coordinate_neighbor = ((list_available_coordinates[index][0] - 1 + i), (list_available_coordinates[index][1] - 1 + j))
+                coordinate_neighbor = ((coordinate_x - 1 + i), (coordinate_y - 1 + j))
 
                 # neighbor must be in the canvas
                 if not ((0 <= coordinate_neighbor[0] < canvas_painting.shape[0]) and (0 <= coordinate_neighbor[1] < canvas_painting.shape[1])):
@@ -477,87 +1339,42 @@ def getBestPositionForColor_python(color_selected, list_available_coordinates, c
                 if ((neigborColor[0] == COLOR_BLACK[0]) and (neigborColor[1] == COLOR_BLACK[1]) and (neigborColor[2] == COLOR_BLACK[2])):
                     continue
 
-                # add neighbor color to running sum
-                color_neighborhood_average[0] += neigborColor[0]
-                color_neighborhood_average[1] += neigborColor[1]
-                color_neighborhood_average[2] += neigborColor[2]
-
                 # use the euclidian distance formula over [R,G,B] instead of [X,Y,Z]
                 color_difference[0] = int(color_selected[0]) - int(neigborColor[0])
                 color_difference[1] = int(color_selected[1]) - int(neigborColor[1])
                 color_difference[2] = int(color_selected[2]) - int(neigborColor[2])
 
-                color_difference_squared[0] = color_difference[0] * color_difference[0]
-                color_difference_squared[1] = color_difference[1] * color_difference[1]
-                color_difference_squared[2] = color_difference[2] * color_difference[2]
-
-                distance_euclidian_aproximation = color_difference_squared[0] + color_difference_squared[1] + color_difference_squared[2]
-
-                list_neighbor_diffs[index_neighbor_diffs] = distance_euclidian_aproximation
-                index_neighbor_diffs += 1
+                distance_euclidian_aproximation = (color_difference[0] * color_difference[0]) + (color_difference[1] * color_difference[1]) + (color_difference[2] * color_difference[2])
 
-        # check operational mode and find the resulting distance
-        if (mode_selected == 1):
-            # check if the considered pixel has at least one valid neighbor
-            if (index_neighbor_diffs):
+                if (distance_euclidian_aproximation < distance_found):
+                    distance_found = distance_euclidian_aproximation
 
-                # return the minimum difference of all the neighbors
-                distance_found = sys.maxsize
-                for i in range(index_neighbor_diffs):
-                    if (list_neighbor_diffs[i] < distance_found):
-                        distance_found = list_neighbor_diffs[i]
+        return distance_found
 
-            # if it has no valid neighbors, maximise its colorDiff
-            else:
-                distance_found = sys.maxsize
+    elif (mode_selected == 2):
 
-        elif (mode_selected == 2):
-            # check if the considered pixel has at least one valid neighbor
-            if (index_neighbor_diffs):
+        # return the average difference of all the neighbors
+        # sum((color - neighbor)^2) expands to (count * color^2) - (2 * color . neighborhood_sum) + neighborhood_sum_squared
+        color_magnitude_squared = (int(color_selected[0]) * int(color_selected[0])) + (int(color_selected[1]) * int(color_selected[1])) + (int(color_selected[2]) * int(color_selected[2]))
+        color_dot_neighborhood_sum = (int(color_selected[0]) * int(canvas_sum[coordinate_x, coordinate_y][0])) + (int(color_selected[1]) * int(canvas_sum[coordinate_x, coordinate_y][1])) + (int(color_selected[2]) * int(canvas_sum[coordinate_x, coordinate_y][2]))
+        distance_found = ((count_neighbors * color_magnitude_squared) - (2 * color_dot_neighborhood_sum) + int(canvas_sum_squared[coordinate_x, coordinate_y]))
+        return (distance_found / count_neighbors)
 
-                # return the average difference of all the neighbors
-                distance_found = 0
-                for i in range(index_neighbor_diffs):
-                    distance_found += list_neighbor_diffs[i]
-                distance_found = (distance_found / index_neighbor_diffs)
+    # finilize neighborhood color calculation, rounded down like every other backend
+    color_neighborhood_average[0] = int(canvas_sum[coordinate_x, coordinate_y][0]) // count_neighbors
+    color_neighborhood_average[1] = int(canvas_sum[coordinate_x, coordinate_y][1]) // count_neighbors
+    color_neighborhood_average[2] = int(canvas_sum[coordinate_x, coordinate_y][2]) // count_neighbors
 
-            # if it has no valid neighbors, maximise its colorDiff
-            else:
-                distance_found = sys.maxsize
+    # use the euclidian distance formula over [R,G,B] instead of [X,Y,Z]
+    color_difference[0] = int(color_selected[0]) - color_neighborhood_average[0]
+    color_difference[1] = int(color_selected[1]) - color_neighborhood_average[1]
+    color_difference[2] = int(color_selected[2]) - color_neighborhood_average[2]
 
-        elif (mode_selected == 3):
-            # check if the considered pixel has at least one valid neighbor
-            if (index_neighbor_diffs):
-
-                # finilize neighborhood color calculation
-                color_neighborhood_average[0] = color_neighborhood_average[0]/index_neighbor_diffs
-                color_neighborhood_average[1] = color_neighborhood_average[1]/index_neighbor_diffs
-                color_neighborhood_average[2] = color_neighborhood_average[2]/index_neighbor_diffs
-
-                # use the euclidian distance formula over [R,G,B] instead of [X,Y,Z]
-                color_difference[0] = color_selected[0] - color_neighborhood_average[0]
-                color_difference[1] = color_selected[1] - color_neighborhood_average[1]
-                color_difference[2] = color_selected[2] - color_neighborhood_average[2]
-                color_difference_squared[0] = color_difference[0] * color_difference[0]
-                color_difference_squared[1] = color_difference[1] * color_difference[1]
-                color_difference_squared[2] = color_difference[2] * color_difference[2]
-
-                distance_found = color_difference_squared[0] + color_difference_squared[1] + color_difference_squared[2]
-
-            # if it has no valid neighbors, maximise its colorDiff
-            else:
-                distance_found = sys.maxsize
-
-        # if it is the best so far save the value and its location
-        if (distance_found < distance_minumum):
-            distance_minumum = distance_found
-            coordinate_minumum = list_available_coordinates[index]
-
-    return (color_selected, coordinate_minumum)
+    return (color_difference[0] * color_difference[0]) + (color_difference[1] * color_difference[1]) + (color_difference[2] * color_difference[2])
 
 
 # tracks a neighborhood around a coordinate in the two availabilty data structures
-def trackNewBoundyNeighbors_bruteForce(coordinate_requested):
+def trackNewBoundyNeighbors_bruteForce(painting, coordinate_requested):
 
     # Get all 8 neighbors, Loop over the 3x3 grid surrounding the location being considered
     for i in range(3):
@@ -572,67 +1389,233 @@ def trackNewBoundyNeighbors_bruteForce(coordinate_requested):
             coordinate_neighbor = ((coordinate_requested[0] - 1 + i), (coordinate_requested[1] - 1 + j))
 
             # neighbor must be in the canvas
-            bool_neighbor_in_canvas = ((0 <= coordinate_neighbor[0] < canvas_actual_color.shape[0]) and (0 <= coordinate_neighbor[1] < canvas_actual_color.shape[1]))
+            bool_neighbor_in_canvas = ((0 <= coordinate_neighbor[0] < painting.canvas_actual_color.shape[0]) and (0 <= coordinate_neighbor[1] < painting.canvas_actual_color.shape[1]))
             if (bool_neighbor_in_canvas):
 
                 # neighbor must also be black (not already colored)
-                bool_neighbor_is_black = numpy.array_equal(canvas_actual_color[coordinate_neighbor[0], coordinate_neighbor[1]], COLOR_BLACK)
+                bool_neighbor_is_black = numpy.array_equal(painting.canvas_actual_color[coordinate_neighbor[0], coordinate_neighbor[1]], COLOR_BLACK)
                 if (bool_neighbor_is_black):
-                    trackCoordinate_bruteForce(coordinate_neighbor)
+                    trackCoordinate_bruteForce(painting, coordinate_neighbor)
 
 
 # tracks a coordinate in the two availabilty data structures
-def trackCoordinate_bruteForce(coordinate_requested):
-
-    # Global Access
-    global count_available
-    global list_availabilty
-    global canvas_availability
+def trackCoordinate_bruteForce(painting, coordinate_requested):
 
     # Check the coordinate is not already being tracked
-    if (not canvas_availability[coordinate_requested[0], coordinate_requested[1]]):
-        list_availabilty.append(coordinate_requested)
-        canvas_availability[coordinate_requested[0], coordinate_requested[1]] = True
-        count_available += 1
+    if (not painting.canvas_availability[coordinate_requested[0], coordinate_requested[1]]):
 
+        # append the coordinate to the end of the packed list
+        painting.list_availabilty[painting.count_available] = coordinate_requested
+        painting.canvas_availability_index[coordinate_requested[0], coordinate_requested[1]] = painting.count_available
+        painting.canvas_availability[coordinate_requested[0], coordinate_requested[1]] = True
+        if (painting.painting_args.opencl):
+            painting.list_opencl_changed_rows.append(painting.count_available)
+        painting.count_available += 1
 
-# un-tracks a coordinate in the two availabilty data structures
-def unTrackCoordinate_bruteForce(coordinate_requested):
 
-    # Global Access
-    global count_available
-    global list_availabilty
-    global canvas_availability
+# un-tracks a coordinate in the two availabilty data structures
+def unTrackCoordinate_bruteForce(painting, coordinate_requested):
 
     # Check the coordinate is already being tracked
-    if (canvas_availability[coordinate_requested[0], coordinate_requested[1]]):
-        list_availabilty.remove((coordinate_requested[0], coordinate_requested[1]))
-        canvas_availability[coordinate_requested[0], coordinate_requested[1]] = False
-        count_available -= 1
+    if (painting.canvas_availability[coordinate_requested[0], coordinate_requested[1]]):
+
+        # move the last coordinate in the packed list into the vacated row
+        index_removed = painting.canvas_availability_index[coordinate_requested[0], coordinate_requested[1]]
+        coordinate_last = painting.list_availabilty[painting.count_available - 1]
+        painting.list_availabilty[index_removed] = coordinate_last
+        painting.canvas_availability_index[coordinate_last[0], coordinate_last[1]] = index_removed
+        if (painting.painting_args.opencl):
+            painting.list_opencl_changed_rows.append(index_removed)
+
+        painting.canvas_availability[coordinate_requested[0], coordinate_requested[1]] = False
+        painting.count_available -= 1
 
 
 # =============================================================================
-# RTREE
+# COLOR INDEX
 # =============================================================================
-def sequentialWork_rTree():
-    # Global Access
-    global index_all_colors
-
+def sequentialWork_colorIndex(painting):
     # get the color to be placed
-    color_selected = list_all_colors[index_all_colors]
-    index_all_colors += 1
+    time_phase = startPhase(painting)
+    color_selected = painting.list_all_colors[painting.index_all_colors]
+    color_compared = painting.list_compared_colors[painting.index_all_colors]
+    painting.index_all_colors += 1
+    time_phase = endPhase(painting, 'select', time_phase)
 
     # find the best location for that color
-    coordinate_best_position = getBestPositionForColor_rTree(color_selected)
+    coordinate_selected = getBestPositionForColor_colorIndex(painting, color_compared)
+    endPhase(painting, 'search', time_phase)
     # attempt to paint the color at the corresponding location
-    paintToCanvas(color_selected, coordinate_best_position[0].object, coordinate_best_position[0])
+    paintToCanvas(painting, color_selected, coordinate_selected)
+
+
+def parallelWork_colorIndex(painting):
+    # the batched query only answers the quick strategy, the others search for one color at a time
+    if not (painting.painting_args.q == 3):
+        painting.number_of_workers = 1
+        sequentialWork_colorIndex(painting)
+        return
+
+    # cap the number of workers so that there are at least LOCATIONS_PER_PAINTER free locations per worker
+    # this keeps the number of conflicts down
+    painting.number_of_workers = min(((painting.count_available//config.DEFAULT_PAINTER['LOCATIONS_PER_PAINTER']), config.DEFAULT_PAINTER['MAX_PAINTERS_CPU'], (painting.list_all_colors.shape[0] - painting.index_all_colors)))
+
+    # get the colors to be placed
+    time_phase = startPhase(painting)
+    list_colors_selected = painting.list_all_colors[painting.index_all_colors:(painting.index_all_colors + painting.number_of_workers)]
+    list_colors_compared = painting.list_compared_colors[painting.index_all_colors:(painting.index_all_colors + painting.number_of_workers)]
+    painting.index_all_colors += list_colors_selected.shape[0]
+    time_phase = endPhase(painting, 'select', time_phase)
+
+    # find the nearest few locations for every color at once, all against the same state of the index
+    list_candidate_ids = painting.colorIndex_neighborhood_colors.nearestBatch(list_colors_compared, config.DEFAULT_INDEX['CANDIDATES_PER_COLOR'])
+    endPhase(painting, 'search', time_phase)
+
+    for color_selected, color_compared, candidate_ids in zip(list_colors_selected, list_colors_compared, list_candidate_ids):
+
+        # take the nearest candidate that has not been painted by an earlier color of this batch
+        time_phase = startPhase(painting)
+        coordinate_selected = None
+        for candidate_id in candidate_ids:
+            if ((candidate_id >= 0) and (candidate_id in painting.colorIndex_neighborhood_colors)):
+                coordinate_selected = getLocationCoordinate(painting, candidate_id)
+                break
+
+        # if every candidate was taken, ask the index again now that the earlier colors are painted
+        if (coordinate_selected is None):
+            if not (len(painting.colorIndex_neighborhood_colors)):
+                painting.list_collided_colors.append(color_selected)
+                endPhase(painting, 'search', time_phase)
+                continue
+            coordinate_selected = getBestPositionForColor_colorIndex(painting, color_compared)
+        endPhase(painting, 'search', time_phase)
+
+        # paint the color at the corresponding location
+        paintToCanvas(painting, color_selected, coordinate_selected)
+
+
+# Gives the available location with the nearest neighborhood color to the requested color
+#   the minimum and average strategies give the same location as the brute force search, ties going to the location first in the packed frontier
+def getBestPositionForColor_colorIndex(painting, rgb_requested_color):
+
+    # the quick strategy indexes the average color around every available location, the nearest is the best location
+    if (painting.painting_args.q == 3):
+        return getLocationCoordinate(painting, painting.colorIndex_neighborhood_colors.nearest(rgb_requested_color)[0])
+
+    # the minimum strategy indexes every colored location next to an available one, the best locations are next to the nearest colored ones
+    if (painting.painting_args.q == 1):
+        list_tied_ids = painting.colorIndex_neighborhood_colors.nearestTied(rgb_requested_color)[0]
+        list_tied_coordinates = getLocationCoordinates(painting, list_tied_ids)
+        list_tied_coordinates = (list_tied_coordinates[:, numpy.newaxis, :] + NEIGHBOR_OFFSETS).reshape(-1, 2)
+        list_tied_coordinates = list_tied_coordinates[numpy.all((list_tied_coordinates >= 0) & (list_tied_coordinates < painting.canvas_actual_color.shape[:2]), axis=1)]
+        list_tied_coordinates = list_tied_coordinates[painting.canvas_availability[list_tied_coordinates[:, 0], list_tied_coordinates[:, 1]]]
+
+    # the average strategy indexes every available location by its average neighborhood color
+    # its distance is the distance to that average plus the spread of the neighborhood, so only locations with a near average are scored
+    else:
+        list_tied_ids = painting.colorIndex_neighborhood_colors.nearestTied(rgb_requested_color, lambda list_location_ids: getAverageDistances_colorIndex(painting, rgb_requested_color, list_location_ids))[0]
+        list_tied_coordinates = getLocationCoordinates(painting, list_tied_ids)
+
+    if not (list_tied_coordinates.shape[0]):
+        return COORDINATE_INVALID.copy()
+    return list_tied_coordinates[numpy.argmin(painting.canvas_availability_index[list_tied_coordinates[:, 0], list_tied_coordinates[:, 1]])]
+
+
+# gives the distance of the average strategy between the requested color and the neighborhoods of the given locations
+#   the same distance as the brute force search, from the same integer sums
+def getAverageDistances_colorIndex(painting, rgb_requested_color, list_location_ids):
+
+    # Setup
+    list_coordinates = getLocationCoordinates(painting, list_location_ids)
+    color_requested = numpy.array(rgb_requested_color, numpy.int64)
+    list_counts = painting.canvas_neighborhood_count[list_coordinates[:, 0], list_coordinates[:, 1]].astype(numpy.int64)
+    list_sums = painting.canvas_neighborhood_sum[list_coordinates[:, 0], list_coordinates[:, 1]].astype(numpy.int64)
+    list_sums_squared = painting.canvas_neighborhood_sum_squared[list_coordinates[:, 0], list_coordinates[:, 1]].astype(numpy.int64)
+
+    # sum((color - neighbor)^2) expands to (count * color^2) - (2 * color . neighborhood_sum) + neighborhood_sum_squared
+    return (((list_counts * numpy.dot(color_requested, color_requested)) - (2 * numpy.dot(list_sums, color_requested)) + list_sums_squared) / list_counts)
+
+
+# keeps the color index of the minimum and average strategies current once a location is painted and the packed frontier updated
+#   the minimum strategy indexes colored locations by their color, while they are next to an available location
+#   the average strategy indexes available locations by their average neighborhood color
+def indexNeighborhood_colorIndex(painting, coordinate_requested):
+
+    if (painting.painting_args.q == 2):
+
+        # the painted location is no longer available
+        location_id = getLocationID(painting, coordinate_requested)
+        if (location_id in painting.colorIndex_neighborhood_colors):
+            painting.colorIndex_neighborhood_colors.delete(location_id)
+
+        # the available neighbors have a new neighborhood
+        for coordinate_neighbor in (coordinate_requested + NEIGHBOR_OFFSETS):
+            if not ((0 <= coordinate_neighbor[0] < painting.canvas_actual_color.shape[0]) and (0 <= coordinate_neighbor[1] < painting.canvas_actual_color.shape[1])):
+                continue
+            if (painting.canvas_availability[coordinate_neighbor[0], coordinate_neighbor[1]]):
+                location_id = getLocationID(painting, coordinate_neighbor)
+                if (location_id in painting.colorIndex_neighborhood_colors):
+                    painting.colorIndex_neighborhood_colors.move(location_id, getAverageColor(painting, coordinate_neighbor))
+                else:
+                    painting.colorIndex_neighborhood_colors.insert(location_id, getAverageColor(painting, coordinate_neighbor))
+
+    else:
+
+        # the painted location, and its neighbors, became unavailable or available; so the colored locations within two of it may have changed
+        for offset_x in range(-2, 3):
+            for offset_y in range(-2, 3):
+                coordinate_colored = ((coordinate_requested[0] + offset_x), (coordinate_requested[1] + offset_y))
+                if not ((0 <= coordinate_colored[0] < painting.canvas_actual_color.shape[0]) and (0 <= coordinate_colored[1] < painting.canvas_actual_color.shape[1])):
+                    continue
+
+                # painting black leaves a location looking uncolored, the brute force search does not count it as a neighbor
+                location_id = getLocationID(painting, coordinate_colored)
+                bool_indexed = (location_id in painting.colorIndex_neighborhood_colors)
+                bool_colored = not (numpy.array_equal(painting.canvas_compared_color[coordinate_colored[0], coordinate_colored[1]], COLOR_BLACK))
+                bool_bordering = (bool_colored and painting.canvas_availability[max(0, (coordinate_colored[0] - 1)):(coordinate_colored[0] + 2), max(0, (coordinate_colored[1] - 1)):(coordinate_colored[1] + 2)].any())
+
+                if (bool_bordering and not bool_indexed):
+                    painting.colorIndex_neighborhood_colors.insert(location_id, painting.canvas_compared_color[coordinate_colored[0], coordinate_colored[1]])
+                elif (bool_indexed and not bool_bordering):
+                    painting.colorIndex_neighborhood_colors.delete(location_id)
+
+
+# builds the color index of the minimum and average strategies from the packed frontier and the painting, when resuming
+def indexCanvas_colorIndex(painting):
+
+    if (painting.painting_args.q == 2):
+        for coordinate_available in painting.list_availabilty[:painting.count_available]:
+            painting.colorIndex_neighborhood_colors.insert(getLocationID(painting, coordinate_available), getAverageColor(painting, coordinate_available))
+        return
+
+    # find the colored locations with an available neighbor
+    canvas_bordering = numpy.zeros(painting.canvas_availability.shape, numpy.bool)
+    for offset in NEIGHBOR_OFFSETS:
+        slice_neighbors = tuple(slice(max(0, offset[axis]), (painting.canvas_availability.shape[axis] + min(0, offset[axis]))) for axis in range(2))
+        slice_locations = tuple(slice(max(0, -offset[axis]), (painting.canvas_availability.shape[axis] - max(0, offset[axis]))) for axis in range(2))
+        canvas_bordering[slice_locations] |= painting.canvas_availability[slice_neighbors]
+    canvas_bordering &= painting.canvas_compared_color.any(axis=2)
+
+    for coordinate_colored in numpy.argwhere(canvas_bordering):
+        painting.colorIndex_neighborhood_colors.insert(getLocationID(painting, coordinate_colored), painting.canvas_compared_color[coordinate_colored[0], coordinate_colored[1]])
 
 
-def getBestPositionForColor_rTree(rgb_requested_color):
-    return list(rTree_neighborhood_colors.nearest(getColorBoundingBox(rgb_requested_color), 1, objects='RAW'))
+# gives the ID of a location in the color index
+def getLocationID(painting, coordinate_requested):
+    return ((int(coordinate_requested[0]) * painting.canvas_actual_color.shape[1]) + int(coordinate_requested[1]))
 
 
-def trackNewBoundyNeighbors_rTree(coordinate_requested):
+# gives the location of an ID in the color index
+def getLocationCoordinate(painting, location_id):
+    return numpy.array(divmod(int(location_id), painting.canvas_actual_color.shape[1]), numpy.int32)
+
+
+# gives the locations of an array of IDs in the color index, one row per ID
+def getLocationCoordinates(painting, list_location_ids):
+    return numpy.stack(divmod(numpy.asarray(list_location_ids, numpy.int64), painting.canvas_actual_color.shape[1]), axis=1).astype(numpy.int32)
+
+
+def trackNewBoundyNeighbors_colorIndex(painting, coordinate_requested):
     # Get all 8 neighbors, Loop over the 3x3 grid surrounding the coordinate_requested being considered
     for i in range(3):
         for j in range(3):
@@ -646,111 +1629,166 @@ def trackNewBoundyNeighbors_rTree(coordinate_requested):
             coordinate_neighbor = ((coordinate_requested[0] - 1 + i), (coordinate_requested[1] - 1 + j))
 
             # neighbor must be in the canvas
-            bool_neighbor_in_canvas = ((0 <= coordinate_neighbor[0] < canvas_actual_color.shape[0]) and (0 <= coordinate_neighbor[1] < canvas_actual_color.shape[1]))
+            bool_neighbor_in_canvas = ((0 <= coordinate_neighbor[0] < painting.canvas_actual_color.shape[0]) and (0 <= coordinate_neighbor[1] < painting.canvas_actual_color.shape[1]))
             if (bool_neighbor_in_canvas):
 
                 # neighbor must also not be black
-                bool_neighbor_is_black = numpy.array_equal(canvas_actual_color[coordinate_neighbor[0], coordinate_neighbor[1]], COLOR_BLACK)
+                bool_neighbor_is_black = numpy.array_equal(painting.canvas_actual_color[coordinate_neighbor[0], coordinate_neighbor[1]], COLOR_BLACK)
                 if (bool_neighbor_is_black):
-                    trackCoordinate_rTree(coordinate_neighbor)
+                    trackCoordinate_colorIndex(painting, coordinate_neighbor)
 
 
 # Track the given neighbor as available
-#   if the location is already tracked, un-track it first, then re-track it.
+#   if the location is already tracked, it is moved to its newest neighborhood color in place.
 #   this prevents duplicate availble locations, and updates the neighborhood color
 # Tracking consists of:
-#   inserting a new nearest_neighbor into the rTree_neighborhood_colors,
+#   inserting or moving the location in the colorIndex_neighborhood_colors,
 #   and flagging the associated location in the availabilityIndex
-def trackCoordinate_rTree(coordinate_requested):
-
-    # Globals
-    global rTree_neighborhood_colors
-    global canvas_id
-    global canvas_availability
-    global canvas_neighborhood_color
-    global count_available
-    global count_id
-
-    # if the neighbor is already in the rTree_neighborhood_colors, then it needs to be deleted
-    # otherwise there will be duplicate avialability with outdated neighborhood colors.
-    if (canvas_availability[coordinate_requested[0], coordinate_requested[1]]):
-        neighborID = canvas_id[coordinate_requested[0], coordinate_requested[1]]
-        rgb_neighborhood_color = canvas_neighborhood_color[coordinate_requested[0], coordinate_requested[1]]
-        rTree_neighborhood_colors.delete(neighborID, getColorBoundingBox(rgb_neighborhood_color))
-
-        # flag the coordinate_requested as no longer being available
-        canvas_availability[coordinate_requested[0], coordinate_requested[1]] = False
-        count_available -= 1
+def trackCoordinate_colorIndex(painting, coordinate_requested):
 
     # get the newest neighborhood color
-    rgb_neighborhood_color = getAverageColor(coordinate_requested)
+    rgb_neighborhood_color = getAverageColor(painting, coordinate_requested)
 
-    # update the coordinate_requested in the availability index
-    canvas_availability[coordinate_requested[0]][coordinate_requested[1]] = True
-    count_available += 1
-    canvas_id[coordinate_requested[0]][coordinate_requested[1]] = count_id
-    canvas_neighborhood_color[coordinate_requested[0]][coordinate_requested[1]] = rgb_neighborhood_color
+    # if the neighbor is already in the colorIndex_neighborhood_colors, then only its color needs to be updated
+    if (painting.canvas_availability[coordinate_requested[0], coordinate_requested[1]]):
+        painting.colorIndex_neighborhood_colors.move(getLocationID(painting, coordinate_requested), rgb_neighborhood_color)
 
-    # add the coordinate_requested to the rTree_neighborhood_colors
-    rTree_neighborhood_colors.insert(count_id, getColorBoundingBox(rgb_neighborhood_color), coordinate_requested)
-    count_id += 1
+    # otherwise add the coordinate_requested to the colorIndex_neighborhood_colors, and to the availability index
+    else:
+        painting.colorIndex_neighborhood_colors.insert(getLocationID(painting, coordinate_requested), rgb_neighborhood_color)
+        painting.canvas_availability[coordinate_requested[0], coordinate_requested[1]] = True
+        painting.count_available += 1
 
 
-# Un-Track the given nearest_neighbor
+# Un-Track the given location
 # Un-Tracking Consists of:
-#   removing the given nearest_neighbor from the rTree_neighborhood_colors,
+#   removing the given location from the colorIndex_neighborhood_colors,
 #   and Un-Flagging the associated location in the availabilityIndex
-def unTrackCoordinate_rTree(nearest_neighbor):
+def unTrackCoordinate_colorIndex(painting, coordinate_requested):
 
-    global count_available
-    global count_id
+    # Check the coordinate is already being tracked
+    if (painting.canvas_availability[coordinate_requested[0], coordinate_requested[1]]):
 
-    locationID = nearest_neighbor.id
-    coordinate_nearest_neighbor = nearest_neighbor.object
-    bbox_neighborhood_color = nearest_neighbor.bbox
+        # remove the location from the colorIndex_neighborhood_colors
+        painting.colorIndex_neighborhood_colors.delete(getLocationID(painting, coordinate_requested))
 
-    # remove object from the rTree_neighborhood_colors
-    rTree_neighborhood_colors.delete(locationID, bbox_neighborhood_color)
+        # flag the location as no longer being available
+        painting.canvas_availability[coordinate_requested[0], coordinate_requested[1]] = False
+        painting.count_available -= 1
 
-    # flag the location as no longer being available
-    canvas_availability[coordinate_nearest_neighbor[0], coordinate_nearest_neighbor[1]] = False
-    count_available -= 1
-    
 
 # =============================================================================
 # NUMBA
 # =============================================================================
-def sequentialWork_numba():
-    # Global Access
-    global index_all_colors
+def sequentialWork_numba(painting):
+    loadBackend(painting, 'numba')
+
+    # the samples of the approximate search are drawn in python, so with -approx every color is painted below instead
+    if (painting.painting_args.approx >= 1.0):
+        # paint colors in native code until the step is done, and at most NUMBA_PLACEMENTS_PER_CALL at once so progress can be printed
+        # stop on the edges of the -profile window, and with -multi, once there are enough available locations for the workers
+        count_placements = min(NUMBA_PLACEMENTS_PER_CALL, max(1, (painting.count_placements_target - painting.count_colors_placed)), getPlacementsToProfileEdge(painting))
+        count_available_limit = (config.DEFAULT_PAINTER['MIN_MULTI_WORKLOAD'] if (painting.painting_args.multi) else painting.list_availabilty.shape[0])
+        list_placed_coordinates = numpy.empty([count_placements, 2], numpy.int32)
+
+        time_phase = startPhase(painting)
+        count_placed, painting.count_available = paintColors_numba(painting.list_all_colors, painting.list_compared_colors, painting.index_all_colors, count_placements, count_available_limit, list_placed_coordinates, painting.list_availabilty, painting.count_available, painting.canvas_availability, painting.canvas_availability_index, painting.canvas_actual_color, painting.canvas_compared_color, painting.canvas_neighborhood_sum, painting.canvas_neighborhood_sum_squared, painting.canvas_neighborhood_count, painting.painting_args.q, numba.get_num_threads())
+        time_phase = endPhase(painting, 'search', time_phase)
+
+        if (count_placed):
+            painting.index_all_colors += count_placed
+            painting.count_colors_placed += count_placed
+            if (painting.journal_file):
+                journalPlacements(painting, list_placed_coordinates[:count_placed], painting.list_all_colors[(painting.index_all_colors - count_placed):painting.index_all_colors])
+
+            # print progress
+            printCurrentCanvas(painting)
+            endPhase(painting, 'output', time_phase)
+
+        # the native loop leaves placements it does not paint to paintToCanvas, paint the next color here if it stopped at one
+        if ((count_placed == count_placements) or not (painting.count_available and (painting.count_available <= count_available_limit) and (painting.index_all_colors < painting.list_all_colors.shape[0]))):
+            return
 
     # get the color to be placed
-    color_selected = list_all_colors[index_all_colors]
-    index_all_colors += 1
+    time_phase = startPhase(painting)
+    color_selected = painting.list_all_colors[painting.index_all_colors]
+    color_compared = painting.list_compared_colors[painting.index_all_colors]
+    painting.index_all_colors += 1
+    time_phase = endPhase(painting, 'select', time_phase)
 
     # find the best location for that color
-    coordinate_selected = getBestPositionForColor_numba(color_selected, numpy.array(list_availabilty), canvas_actual_color, config.PARSED_ARGS.q)[1]
+    list_searched_coordinates = getSearchedCoordinates(painting)
+    coordinate_selected = getBestPositionForColor_numba(color_compared, list_searched_coordinates, painting.canvas_compared_color, painting.canvas_neighborhood_sum, painting.canvas_neighborhood_sum_squared, painting.canvas_neighborhood_count, painting.painting_args.q, numba.get_num_threads())[1]
+    measureApproximation(painting, color_compared, coordinate_selected, list_searched_coordinates)
+    endPhase(painting, 'search', time_phase)
     # attempt to paint the color at the corresponding location
-    paintToCanvas(color_selected, coordinate_selected)
+    paintToCanvas(painting, color_selected, coordinate_selected)
 
 
 # Gives the best location among all avilable for the requested color; Also returns the color itself
-@numba.njit
-def getBestPositionForColor_numba(color_selected, list_available_coordinates, canvas_painting, mode_selected):
+# compiled by loadBackend_numba
+#   the available locations are split into a run for each of the count_threads threads, each run's first best location is found by one thread
+#   a frontier too small to give every thread NUMBA_MIN_RUN_LENGTH locations is split into fewer runs
+#   the best locations of the runs are then compared in run order, so the first best location is chosen just like with one thread
+#   the callers give numba.get_num_threads(), read in python so the compiled function does not depend on it and can be cached
+def getBestPositionForColor_numba(color_selected, list_available_coordinates, canvas_painting, canvas_sum, canvas_sum_squared, canvas_count, mode_selected, count_threads):
 
-    # reset minimums
-    coordinate_minumum = COORDINATE_INVALID
-    distance_minumum = sys.maxsize
+    # Setup
+    count_locations = list_available_coordinates.shape[0]
+    count_runs = max(1, min(count_threads, (count_locations // NUMBA_MIN_RUN_LENGTH)))
+    list_run_distances = numpy.empty(count_runs, numpy.float64)
+    list_run_indexes = numpy.empty(count_runs, numpy.int64)
 
-    # for every coordinate_available position in the boundry, perform the check, keep the best position:
-    for index in range(list_available_coordinates.shape[0]):
+    # for every coordinate_available position in the boundry, perform the check, keep the best position of each run:
+    for run_index in numba.prange(count_runs):
+
+        # reset minimums
+        distance_minumum = numpy.inf
+        index_minumum = -1
+
+        for index in range(((run_index * count_locations) // count_runs), (((run_index + 1) * count_locations) // count_runs)):
+            distance_found = getDistanceForLocation_numba(color_selected, list_available_coordinates[index, 0], list_available_coordinates[index, 1], canvas_painting, canvas_sum, canvas_sum_squared, canvas_count, mode_selected)
+
+            # if it is the best so far save the value and its location
+            if (distance_found < distance_minumum):
+                distance_minumum = distance_found
+                index_minumum = index
+
+        list_run_distances[run_index] = distance_minumum
+        list_run_indexes[run_index] = index_minumum
+
+    # keep the first run with the best position
+    distance_minumum = numpy.inf
+    index_minumum = -1
+    for run_index in range(count_runs):
+        if (list_run_distances[run_index] < distance_minumum):
+            distance_minumum = list_run_distances[run_index]
+            index_minumum = list_run_indexes[run_index]
+
+    # if no location has a colored neighbor there is no best position
+    if (index_minumum < 0):
+        return (color_selected, COORDINATE_INVALID.copy())
+
+    # copy the coordinate out so it is not changed when the location is un-tracked
+    return (color_selected, list_available_coordinates[index_minumum].copy())
+
+
+# Gives how far the requested color is from the neighborhood of an available location; infinite for a location with no colored neighbors
+# compiled by loadBackend_numba, the color differences are kept in scalars so nothing is allocated per location
+def getDistanceForLocation_numba(color_selected, coordinate_x, coordinate_y, canvas_painting, canvas_sum, canvas_sum_squared, canvas_count, mode_selected):
 
-        index_neighbor_diffs = 0
-        list_neighbor_diffs = [0, 0, 0, 0, 0, 0, 0, 0]
-        color_difference = [0, 0, 0]
-        color_difference_squared = [0, 0, 0]
-        neigborColor = [0, 0, 0]
-        color_neighborhood_average = [0, 0, 0]
+    # the number of colored neighbors is kept current by paintToCanvas
+    count_neighbors = int(canvas_count[coordinate_x, coordinate_y])
+
+    # if it has no valid neighbors, maximise its colorDiff
+    if not (count_neighbors):
+        return numpy.inf
+
+    # check operational mode and find the resulting distance
+    if (mode_selected == 1):
+
+        # return the minimum difference of all the neighbors
+        distance_found = numpy.inf
 
         # Get all 8 neighbors, Loop over the 3x3 grid surrounding the location being considered
         for i in range(3):
@@ -762,215 +1800,438 @@ def getBestPositionForColor_numba(color_selected, list_available_coordinates, ca
                     continue
 
                 # calculate the neigbor's coordinates
-                coordinate_neighbor = ((list_available_coordinates[index][0] - 1 + i), (list_available_coordinates[index][1] - 1 + j))
+                neighbor_x = (coordinate_x - 1 + i)
+                neighbor_y = (coordinate_y - 1 + j)
 
                 # neighbor must be in the canvas
-                if not ((0 <= coordinate_neighbor[0] < canvas_painting.shape[0]) and (0 <= coordinate_neighbor[1] < canvas_painting.shape[1])):
+                if not ((0 <= neighbor_x < canvas_painting.shape[0]) and (0 <= neighbor_y < canvas_painting.shape[1])):
                     continue
 
                 # get the neighbor color
-                neigborColor = canvas_painting[coordinate_neighbor[0], coordinate_neighbor[1]]
+                neigborColor = canvas_painting[neighbor_x, neighbor_y]
 
                 # neighbor must not be black
                 if ((neigborColor[0] == COLOR_BLACK[0]) and (neigborColor[1] == COLOR_BLACK[1]) and (neigborColor[2] == COLOR_BLACK[2])):
                     continue
 
-                # add neighbor color to running sum
-                color_neighborhood_average[0] += neigborColor[0]
-                color_neighborhood_average[1] += neigborColor[1]
-                color_neighborhood_average[2] += neigborColor[2]
-
                 # use the euclidian distance formula over [R,G,B] instead of [X,Y,Z]
-                color_difference[0] = int(color_selected[0]) - int(neigborColor[0])
-                color_difference[1] = int(color_selected[1]) - int(neigborColor[1])
-                color_difference[2] = int(color_selected[2]) - int(neigborColor[2])
+                difference_red = int(color_selected[0]) - int(neigborColor[0])
+                difference_green = int(color_selected[1]) - int(neigborColor[1])
+                difference_blue = int(color_selected[2]) - int(neigborColor[2])
 
-                color_difference_squared[0] = color_difference[0] * color_difference[0]
-                color_difference_squared[1] = color_difference[1] * color_difference[1]
-                color_difference_squared[2] = color_difference[2] * color_difference[2]
+                distance_euclidian_aproximation = (difference_red * difference_red) + (difference_green * difference_green) + (difference_blue * difference_blue)
 
-                distance_euclidian_aproximation = color_difference_squared[0] + color_difference_squared[1] + color_difference_squared[2]
+                if (distance_euclidian_aproximation < distance_found):
+                    distance_found = distance_euclidian_aproximation
 
-                list_neighbor_diffs[index_neighbor_diffs] = distance_euclidian_aproximation
-                index_neighbor_diffs += 1
+        return distance_found
 
-        # check operational mode and find the resulting distance
-        if (mode_selected == 1):
-            # check if the considered pixel has at least one valid neighbor
-            if (index_neighbor_diffs):
+    elif (mode_selected == 2):
 
-                # return the minimum difference of all the neighbors
-                distance_found = sys.maxsize
-                for i in range(index_neighbor_diffs):
-                    if (list_neighbor_diffs[i] < distance_found):
-                        distance_found = list_neighbor_diffs[i]
+        # return the average difference of all the neighbors
+        # sum((color - neighbor)^2) expands to (count * color^2) - (2 * color . neighborhood_sum) + neighborhood_sum_squared
+        color_magnitude_squared = (int(color_selected[0]) * int(color_selected[0])) + (int(color_selected[1]) * int(color_selected[1])) + (int(color_selected[2]) * int(color_selected[2]))
+        color_dot_neighborhood_sum = (int(color_selected[0]) * int(canvas_sum[coordinate_x, coordinate_y, 0])) + (int(color_selected[1]) * int(canvas_sum[coordinate_x, coordinate_y, 1])) + (int(color_selected[2]) * int(canvas_sum[coordinate_x, coordinate_y, 2]))
+        distance_found = ((count_neighbors * color_magnitude_squared) - (2 * color_dot_neighborhood_sum) + int(canvas_sum_squared[coordinate_x, coordinate_y]))
+        return (distance_found / count_neighbors)
 
-            # if it has no valid neighbors, maximise its colorDiff
-            else:
-                distance_found = sys.maxsize
+    # finilize neighborhood color calculation, and use the euclidian distance formula over [R,G,B] instead of [X,Y,Z]
+    difference_red = int(color_selected[0]) - (int(canvas_sum[coordinate_x, coordinate_y, 0]) // count_neighbors)
+    difference_green = int(color_selected[1]) - (int(canvas_sum[coordinate_x, coordinate_y, 1]) // count_neighbors)
+    difference_blue = int(color_selected[2]) - (int(canvas_sum[coordinate_x, coordinate_y, 2]) // count_neighbors)
 
-        elif (mode_selected == 2):
-            # check if the considered pixel has at least one valid neighbor
-            if (index_neighbor_diffs):
+    return float((difference_red * difference_red) + (difference_green * difference_green) + (difference_blue * difference_blue))
 
-                # return the average difference of all the neighbors
-                distance_found = 0
-                for i in range(index_neighbor_diffs):
-                    distance_found += list_neighbor_diffs[i]
-                distance_found = (distance_found / index_neighbor_diffs)
 
-            # if it has no valid neighbors, maximise its colorDiff
-            else:
-                distance_found = sys.maxsize
+# Places up to count_placements colors, from index_all_colors on, without returning to python; gives how many were placed and the new number of available locations
+# compiled by loadBackend_numba
+#   each color is searched for, painted and its neighbors tracked exactly as sequentialWork_numba, paintToCanvas and the bruteForce trackers would
+#   the coordinates painted are written to list_placed_coordinates, every color taken is placed
+#   it stops before a color it leaves to paintToCanvas: when there is no best location, or the best location is already colored
+#   it also stops once there are more than count_available_limit available locations
+#   the colors are searched for and summed as list_compared_colors on canvas_compared, which are the painted colors and canvas unless -oklab
+def paintColors_numba(list_all_colors, list_compared_colors, index_all_colors, count_placements, count_available_limit, list_placed_coordinates, list_available_coordinates, count_available, canvas_availability, canvas_availability_index, canvas_painting, canvas_compared, canvas_sum, canvas_sum_squared, canvas_count, mode_selected, count_threads):
+
+    # Setup
+    count_placed = 0
+
+    while ((count_placed < count_placements) and (0 < count_available <= count_available_limit) and ((index_all_colors + count_placed) < list_all_colors.shape[0])):
+
+        # find the best location for the next color
+        color_selected = list_all_colors[index_all_colors + count_placed]
+        color_compared = list_compared_colors[index_all_colors + count_placed]
+        coordinate_selected = getBestPositionForColor_numba(color_compared, list_available_coordinates[:count_available], canvas_compared, canvas_sum, canvas_sum_squared, canvas_count, mode_selected, count_threads)[1]
+        coordinate_x = coordinate_selected[0]
+        coordinate_y = coordinate_selected[1]
+
+        # double check the the pixel is available
+        if (coordinate_x < 0):
+            break
+        if not ((canvas_painting[coordinate_x, coordinate_y, 0] == COLOR_BLACK[0]) and (canvas_painting[coordinate_x, coordinate_y, 1] == COLOR_BLACK[1]) and (canvas_painting[coordinate_x, coordinate_y, 2] == COLOR_BLACK[2])):
+            break
+
+        # color it
+        canvas_painting[coordinate_x, coordinate_y, 0] = color_selected[0]
+        canvas_painting[coordinate_x, coordinate_y, 1] = color_selected[1]
+        canvas_painting[coordinate_x, coordinate_y, 2] = color_selected[2]
+        list_placed_coordinates[count_placed, 0] = coordinate_x
+        list_placed_coordinates[count_placed, 1] = coordinate_y
+        count_placed += 1
+
+        # the 8 neighboring locations now have one more colored neighbor, unless it was painted black and still looks uncolored
+        if not ((color_selected[0] == COLOR_BLACK[0]) and (color_selected[1] == COLOR_BLACK[1]) and (color_selected[2] == COLOR_BLACK[2])):
+            canvas_compared[coordinate_x, coordinate_y, 0] = color_compared[0]
+            canvas_compared[coordinate_x, coordinate_y, 1] = color_compared[1]
+            canvas_compared[coordinate_x, coordinate_y, 2] = color_compared[2]
+            color_magnitude_squared = (int(color_compared[0]) * int(color_compared[0])) + (int(color_compared[1]) * int(color_compared[1])) + (int(color_compared[2]) * int(color_compared[2]))
+            for i in range(3):
+                for j in range(3):
+                    neighbor_x = (coordinate_x - 1 + i)
+                    neighbor_y = (coordinate_y - 1 + j)
+                    if ((i == 1 and j == 1) or not ((0 <= neighbor_x < canvas_painting.shape[0]) and (0 <= neighbor_y < canvas_painting.shape[1]))):
+                        continue
+                    canvas_sum[neighbor_x, neighbor_y, 0] += color_compared[0]
+                    canvas_sum[neighbor_x, neighbor_y, 1] += color_compared[1]
+                    canvas_sum[neighbor_x, neighbor_y, 2] += color_compared[2]
+                    canvas_sum_squared[neighbor_x, neighbor_y] += color_magnitude_squared
+                    canvas_count[neighbor_x, neighbor_y] += 1
+
+        # remove the location from the packed list, moving the last location into its row
+        if (canvas_availability[coordinate_x, coordinate_y]):
+            index_removed = canvas_availability_index[coordinate_x, coordinate_y]
+            list_available_coordinates[index_removed, 0] = list_available_coordinates[count_available - 1, 0]
+            list_available_coordinates[index_removed, 1] = list_available_coordinates[count_available - 1, 1]
+            canvas_availability_index[list_available_coordinates[index_removed, 0], list_available_coordinates[index_removed, 1]] = index_removed
+            canvas_availability[coordinate_x, coordinate_y] = False
+            count_available -= 1
+
+        # track the uncolored neighbors that are not yet available
+        for i in range(3):
+            for j in range(3):
+                neighbor_x = (coordinate_x - 1 + i)
+                neighbor_y = (coordinate_y - 1 + j)
+                if ((i == 1 and j == 1) or not ((0 <= neighbor_x < canvas_painting.shape[0]) and (0 <= neighbor_y < canvas_painting.shape[1]))):
+                    continue
+                if not ((canvas_painting[neighbor_x, neighbor_y, 0] == COLOR_BLACK[0]) and (canvas_painting[neighbor_x, neighbor_y, 1] == COLOR_BLACK[1]) and (canvas_painting[neighbor_x, neighbor_y, 2] == COLOR_BLACK[2])):
+                    continue
+                if not (canvas_availability[neighbor_x, neighbor_y]):
+                    list_available_coordinates[count_available, 0] = neighbor_x
+                    list_available_coordinates[count_available, 1] = neighbor_y
+                    canvas_availability_index[neighbor_x, neighbor_y] = count_available
+                    canvas_availability[neighbor_x, neighbor_y] = True
+                    count_available += 1
 
-        elif (mode_selected == 3):
-            # check if the considered pixel has at least one valid neighbor
-            if (index_neighbor_diffs):
+    return count_placed, count_available
 
-                # finilize neighborhood color calculation
-                color_neighborhood_average[0] = color_neighborhood_average[0]/index_neighbor_diffs
-                color_neighborhood_average[1] = color_neighborhood_average[1]/index_neighbor_diffs
-                color_neighborhood_average[2] = color_neighborhood_average[2]/index_neighbor_diffs
 
-                # use the euclidian distance formula over [R,G,B] instead of [X,Y,Z]
-                color_difference[0] = color_selected[0] - color_neighborhood_average[0]
-                color_difference[1] = color_selected[1] - color_neighborhood_average[1]
-                color_difference[2] = color_selected[2] - color_neighborhood_average[2]
-                color_difference_squared[0] = color_difference[0] * color_difference[0]
-                color_difference_squared[1] = color_difference[1] * color_difference[1]
-                color_difference_squared[2] = color_difference[2] * color_difference[2]
+# imports numba and compiles the numba painter
+#   the compiled functions are cached on disk, so later processes load them instead of compiling them again
+def loadBackend_numba():
+    # Global Access
+    global numba
+    global getDistanceForLocation_numba
+    global getBestPositionForColor_numba
+    global paintColors_numba
 
-                distance_found = color_difference_squared[0] + color_difference_squared[1] + color_difference_squared[2]
+    import numba
+    getDistanceForLocation_numba = numba.njit(getDistanceForLocation_numba, cache=True)
+    getBestPositionForColor_numba = numba.njit(getBestPositionForColor_numba, cache=True, parallel=True)
+    paintColors_numba = numba.njit(paintColors_numba, cache=True)
 
-            # if it has no valid neighbors, maximise its colorDiff
-            else:
-                distance_found = sys.maxsize
 
-        # if it is the best so far save the value and its location
-        if (distance_found < distance_minumum):
-            distance_minumum = distance_found
-            coordinate_minumum = list_available_coordinates[index]
+# =============================================================================
+# NUMPY
+# =============================================================================
+def sequentialWork_numpy(painting):
+    # get the color to be placed
+    time_phase = startPhase(painting)
+    color_selected = painting.list_all_colors[painting.index_all_colors]
+    color_compared = painting.list_compared_colors[painting.index_all_colors]
+    painting.index_all_colors += 1
+    time_phase = endPhase(painting, 'select', time_phase)
+
+    # find the best location for that color
+    list_searched_coordinates = getSearchedCoordinates(painting)
+    coordinate_selected = getBestPositionForColor_numpy(color_compared, list_searched_coordinates, painting.canvas_compared_color, painting.canvas_neighborhood_sum, painting.canvas_neighborhood_sum_squared, painting.canvas_neighborhood_count, painting.painting_args.q)[1]
+    measureApproximation(painting, color_compared, coordinate_selected, list_searched_coordinates)
+    endPhase(painting, 'search', time_phase)
+    # attempt to paint the color at the corresponding location
+    paintToCanvas(painting, color_selected, coordinate_selected)
+
+
+# Gives the best location among all avilable for the requested color; Also returns the color itself
+# scores every available location at once with array operations instead of looping over them
+def getBestPositionForColor_numpy(color_selected, list_available_coordinates, canvas_painting, canvas_sum, canvas_sum_squared, canvas_count, mode_selected):
+
+    # there are no locations to choose from
+    if not (list_available_coordinates.shape[0]):
+        return (color_selected, COORDINATE_INVALID.copy())
+
+    list_distances = getDistancesForLocations_numpy(color_selected, list_available_coordinates, canvas_painting, canvas_sum, canvas_sum_squared, canvas_count, mode_selected)
+
+    # keep the best position, the first one found on ties like the other painters
+    return (color_selected, list_available_coordinates[numpy.argmin(list_distances)].copy())
+
+
+# gives the distance of the requested color from each of the given locations, as scored by the selected strategy
+def getDistancesForLocations_numpy(color_selected, list_available_coordinates, canvas_painting, canvas_sum, canvas_sum_squared, canvas_count, mode_selected):
+
+    # Setup
+    color_selected_signed = numpy.array(color_selected, numpy.int64)
+    count_neighbors = canvas_count[list_available_coordinates[:, 0], list_available_coordinates[:, 1]].astype(numpy.int64)
+
+    # check operational mode and find the resulting distance of every location
+    if (mode_selected == 1):
+
+        # gather the coordinates of all 8 neighbors of every location, and mask the ones outside of the canvas
+        coordinate_neighbors = (list_available_coordinates[:, numpy.newaxis, :] + NEIGHBOR_OFFSETS[numpy.newaxis, :, :])
+        bool_neighbors_in_canvas = ((coordinate_neighbors[:, :, 0] >= 0) & (coordinate_neighbors[:, :, 0] < canvas_painting.shape[0]) & (coordinate_neighbors[:, :, 1] >= 0) & (coordinate_neighbors[:, :, 1] < canvas_painting.shape[1]))
+        coordinate_neighbors[:, :, 0].clip(0, canvas_painting.shape[0] - 1, out=coordinate_neighbors[:, :, 0])
+        coordinate_neighbors[:, :, 1].clip(0, canvas_painting.shape[1] - 1, out=coordinate_neighbors[:, :, 1])
+
+        # gather the neighbor colors, and mask the ones that are black
+        neighbor_colors = canvas_painting[coordinate_neighbors[:, :, 0], coordinate_neighbors[:, :, 1]].astype(numpy.int64)
+        bool_neighbors_valid = (bool_neighbors_in_canvas & neighbor_colors.any(axis=2))
+
+        # use the euclidian distance formula over [R,G,B] instead of [X,Y,Z], then take the minimum over the valid neighbors
+        neighbor_distances = numpy.square(neighbor_colors - color_selected_signed).sum(axis=2)
+        neighbor_distances[~bool_neighbors_valid] = sys.maxsize
+        list_distances = neighbor_distances.min(axis=1)
+
+    elif (mode_selected == 2):
+
+        # sum((color - neighbor)^2) expands to (count * color^2) - (2 * color . neighborhood_sum) + neighborhood_sum_squared
+        neighborhood_sum = canvas_sum[list_available_coordinates[:, 0], list_available_coordinates[:, 1]].astype(numpy.int64)
+        neighborhood_sum_squared = canvas_sum_squared[list_available_coordinates[:, 0], list_available_coordinates[:, 1]].astype(numpy.int64)
+        list_distances = ((count_neighbors * numpy.dot(color_selected_signed, color_selected_signed)) - (2 * numpy.dot(neighborhood_sum, color_selected_signed)) + neighborhood_sum_squared)
+        list_distances = (list_distances / numpy.maximum(count_neighbors, 1))
+
+    else:
+
+        # finilize neighborhood color calculation
+        neighborhood_sum = canvas_sum[list_available_coordinates[:, 0], list_available_coordinates[:, 1]].astype(numpy.int64)
+        color_neighborhood_average = numpy.floor_divide(neighborhood_sum, numpy.maximum(count_neighbors, 1)[:, numpy.newaxis])
+        list_distances = numpy.square(color_neighborhood_average - color_selected_signed).sum(axis=1)
 
-    return (color_selected, coordinate_minumum)
+    # if a location has no valid neighbors, maximise its colorDiff
+    return numpy.where((count_neighbors > 0), list_distances, sys.maxsize)
 
 
 # =============================================================================
 # OPENCL
 # =============================================================================
-def sequentialWork_openCL():
-    # Global Access
-    global index_all_colors
+def sequentialWork_openCL(painting):
+    # find the best location for the next color and paint it
+    painting.number_of_workers = 1
+    paintBestPositionsForColors_openCL(painting)
+
+
+def parallelWork_openCL(painting):
+    # find the best locations for the next number_of_workers colors and paint them
+    painting.number_of_workers = min(((painting.count_available//config.DEFAULT_PAINTER['LOCATIONS_PER_PAINTER']), config.DEFAULT_PAINTER['MAX_PAINTERS_GPU'], (painting.list_all_colors.shape[0] - painting.index_all_colors)))
+    paintBestPositionsForColors_openCL(painting)
 
-    color_to_paint = [0,0,0]
+
+# runs a kernel worker for each of the next number_of_workers colors, then attempts to paint each color at its best location
+def paintBestPositionsForColors_openCL(painting):
     coordinate_to_paint = [0,0]
 
-    # get the color to be placed
-    color_selected = list_all_colors[index_all_colors]
-    index_all_colors += 1
+    loadBackend(painting, 'opencl')
 
-    # find the best location for that color
-    host_result = numpy.array([0, 0, 0, 0, 0], dtype=numpy.uint32)
-    host_color = numpy.array(color_selected, dtype=numpy.uint32)
-    host_avail_coords = numpy.array(list_availabilty, dtype=numpy.uint32).flatten()
-    host_canvas = canvas_actual_color.flatten(order='C')
-    host_x_dim = numpy.array([canvas_actual_color.shape[0]], dtype=numpy.uint32)
-    host_y_dim = numpy.array([canvas_actual_color.shape[1]], dtype=numpy.uint32)
-    host_avail_count = numpy.array([count_available], dtype=numpy.uint32)
-    host_mode = numpy.array([config.PARSED_ARGS.q], dtype=numpy.uint32)
-
-    dev_result = pyopencl.Buffer(opencl_context, pyopencl.mem_flags.WRITE_ONLY, host_result.nbytes)
-    dev_color = pyopencl.Buffer(opencl_context, pyopencl.mem_flags.READ_ONLY | pyopencl.mem_flags.COPY_HOST_PTR, hostbuf=host_color)
-    dev_avail_coords = pyopencl.Buffer(opencl_context, pyopencl.mem_flags.READ_ONLY | pyopencl.mem_flags.COPY_HOST_PTR, hostbuf=host_avail_coords)
-    dev_canvas = pyopencl.Buffer(opencl_context, pyopencl.mem_flags.READ_ONLY | pyopencl.mem_flags.COPY_HOST_PTR, hostbuf=host_canvas)
-    dev_x_dim = pyopencl.Buffer(opencl_context, pyopencl.mem_flags.READ_ONLY | pyopencl.mem_flags.COPY_HOST_PTR, hostbuf=host_x_dim)
-    dev_y_dim = pyopencl.Buffer(opencl_context, pyopencl.mem_flags.READ_ONLY | pyopencl.mem_flags.COPY_HOST_PTR, hostbuf=host_y_dim)
-    dev_avail_count = pyopencl.Buffer(opencl_context, pyopencl.mem_flags.READ_ONLY | pyopencl.mem_flags.COPY_HOST_PTR, hostbuf=host_avail_count)
-    dev_mode = pyopencl.Buffer(opencl_context, pyopencl.mem_flags.READ_ONLY | pyopencl.mem_flags.COPY_HOST_PTR, hostbuf=host_mode)
-
-    # launch the kernel
-    opencl_event = opencl_kernel.getBestPositionForColor_openCL(opencl_queue, (1,), None, dev_result, dev_color, dev_avail_coords, dev_canvas, dev_x_dim, dev_y_dim, dev_avail_count, dev_mode)
-    opencl_event.wait()
+    # bring the device copies of the painting up to date
+    time_phase = startPhase(painting)
+    if not (painting.opencl_buffers):
+        setupDevice_openCL(painting)
+    else:
+        updateDevice_openCL(painting)
+    time_phase = endPhase(painting, 'ipc', time_phase)
+
+    # launch the kernel, each worker takes the next color from the device copy of list_all_colors
+    index_first_color = painting.index_all_colors
+    opencl_event = opencl_kernels['getBestPositionForColor_openCL'](opencl_queue, (painting.number_of_workers,), None, painting.opencl_buffers['result'], painting.opencl_buffers['colors'], numpy.uint32(painting.index_all_colors), painting.opencl_buffers['avail_coords'], painting.opencl_buffers['canvas'], painting.opencl_buffers['neighborhood_sum'], painting.opencl_buffers['neighborhood_sum_squared'], painting.opencl_buffers['neighborhood_count'], numpy.uint32(painting.canvas_actual_color.shape[0]), numpy.uint32(painting.canvas_actual_color.shape[1]), numpy.uint32(painting.count_available), numpy.uint32(painting.painting_args.q))
+    painting.index_all_colors += painting.number_of_workers
 
     # copy the output from the context to the Python process
-    pyopencl.enqueue_copy(opencl_queue, host_result, dev_result)
+    host_result = numpy.zeros((painting.number_of_workers * 5), dtype=numpy.uint32)
+    pyopencl.enqueue_copy(opencl_queue, host_result, painting.opencl_buffers['result'], wait_for=[opencl_event])
+    endPhase(painting, 'search', time_phase)
 
-    # attempt to paint the color at the corresponding location
-    # // record selected color
-    color_to_paint[0] = host_result[0]
-    color_to_paint[1] = host_result[1]
-    color_to_paint[2] = host_result[2]
+    for worker_index in range(painting.number_of_workers):
 
-    # // record best position
-    coordinate_to_paint[0] = host_result[3]
-    coordinate_to_paint[1] = host_result[4]
+        # // record selected color, the device compares list_compared_colors so the painted color is taken from list_all_colors
+        color_to_paint = painting.list_all_colors[index_first_color + worker_index]
 
-    # attempt to paint the color at the corresponding location
-    paintToCanvas(color_to_paint, coordinate_to_paint)
+        # // record best position
+        coordinate_to_paint[0] = int(host_result[worker_index * 5 + 3])
+        coordinate_to_paint[1] = int(host_result[worker_index * 5 + 4])
+
+        # attempt to paint the color at the corresponding location
+        paintToCanvas(painting, color_to_paint, coordinate_to_paint)
 
 
-def parallelWork_openCL():
+# imports pyopencl, creates a context and command queue, and compiles the kernels
+def loadBackend_openCL():
     # Global Access
-    global index_all_colors
-    global number_of_workers
+    global pyopencl
+    global opencl_context
+    global opencl_queue
+    global opencl_kernel
+    global opencl_kernels
+
+    import pyopencl
+
+    os.environ['PYOPENCL_CTX'] = "0"
+    os.environ['PYOPENCL_COMPILER_OUTPUT'] = "1"
+    # this line would create a context
+    opencl_context = pyopencl.create_some_context()
+    # now create a command queue in the context
+    opencl_queue = pyopencl.CommandQueue(opencl_context)
+    # compile opencl kernel
+    opencl_kernel = pyopencl.Program(opencl_context, open(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'kernel.ocl')).read()).build()
+    # keep one instance of each kernel, getting them from the program by name creates a new one every time
+    opencl_kernels = dict((kernel.function_name, kernel) for kernel in opencl_kernel.all_kernels())
+
+
+# copies the painting to the device once, the copies are then kept up to date by updateDevice_openCL
+def setupDevice_openCL(painting):
+    read_only_copy = pyopencl.mem_flags.READ_ONLY | pyopencl.mem_flags.COPY_HOST_PTR
+    read_write_copy = pyopencl.mem_flags.READ_WRITE | pyopencl.mem_flags.COPY_HOST_PTR
+
+    painting.opencl_buffers['result'] = pyopencl.Buffer(opencl_context, pyopencl.mem_flags.WRITE_ONLY, (config.DEFAULT_PAINTER['MAX_PAINTERS_GPU'] * 5 * numpy.dtype(numpy.uint32).itemsize))
+    painting.opencl_buffers['colors'] = pyopencl.Buffer(opencl_context, read_only_copy, hostbuf=numpy.ascontiguousarray(painting.list_compared_colors, dtype=numpy.uint8))
+    painting.opencl_buffers['avail_coords'] = pyopencl.Buffer(opencl_context, read_write_copy, hostbuf=painting.list_availabilty)
+    painting.opencl_buffers['canvas'] = pyopencl.Buffer(opencl_context, read_write_copy, hostbuf=numpy.ascontiguousarray(painting.canvas_compared_color))
+    painting.opencl_buffers['neighborhood_sum'] = pyopencl.Buffer(opencl_context, read_write_copy, hostbuf=painting.canvas_neighborhood_sum)
+    painting.opencl_buffers['neighborhood_sum_squared'] = pyopencl.Buffer(opencl_context, read_write_copy, hostbuf=painting.canvas_neighborhood_sum_squared)
+    painting.opencl_buffers['neighborhood_count'] = pyopencl.Buffer(opencl_context, read_write_copy, hostbuf=painting.canvas_neighborhood_count)
+
+    # the device copies now match the painting
+    painting.list_opencl_painted_coordinates.clear()
+    painting.list_opencl_changed_rows.clear()
+
+
+# pushes only the locations painted and the rows of list_availabilty changed since the last update to the device
+def updateDevice_openCL(painting):
+
+    # every painted location changes its own color and the neighborhood of the 8 locations around it
+    if (painting.list_opencl_painted_coordinates):
+        coordinate_neighbors = (numpy.array(painting.list_opencl_painted_coordinates, numpy.int64)[:, numpy.newaxis, :] + NEIGHBORHOOD_OFFSETS[numpy.newaxis, :, :]).reshape(-1, 2)
+        coordinate_neighbors = coordinate_neighbors[(coordinate_neighbors[:, 0] >= 0) & (coordinate_neighbors[:, 0] < painting.canvas_actual_color.shape[0]) & (coordinate_neighbors[:, 1] >= 0) & (coordinate_neighbors[:, 1] < painting.canvas_actual_color.shape[1])]
+        location_indices = numpy.unique((coordinate_neighbors[:, 0] * painting.canvas_actual_color.shape[1]) + coordinate_neighbors[:, 1])
+        location_xs, location_ys = numpy.divmod(location_indices, painting.canvas_actual_color.shape[1])
+
+        # pack [location, color, neighborhood sum, neighborhood sum squared, neighborhood count] for each location
+        host_updates = numpy.column_stack([location_indices, painting.canvas_compared_color[location_xs, location_ys], painting.canvas_neighborhood_sum[location_xs, location_ys], painting.canvas_neighborhood_sum_squared[location_xs, location_ys], painting.canvas_neighborhood_count[location_xs, location_ys]]).astype(numpy.uint32)
+        opencl_event = pyopencl.enqueue_copy(opencl_queue, getStagingBuffer_openCL(painting, 'canvas_updates', host_updates.nbytes), host_updates, is_blocking=False)
+        opencl_kernels['updateCanvas_openCL'](opencl_queue, (host_updates.shape[0],), None, painting.opencl_buffers['canvas_updates'], painting.opencl_buffers['canvas'], painting.opencl_buffers['neighborhood_sum'], painting.opencl_buffers['neighborhood_sum_squared'], painting.opencl_buffers['neighborhood_count'], wait_for=[opencl_event])
+        painting.list_opencl_painted_coordinates.clear()
+
+    # pack [row, x, y] for each changed row of list_availabilty that is still in use
+    if (painting.list_opencl_changed_rows):
+        row_indices = numpy.unique(numpy.array(painting.list_opencl_changed_rows, numpy.int64))
+        row_indices = row_indices[row_indices < painting.count_available]
+        if (row_indices.shape[0]):
+            host_updates = numpy.column_stack([row_indices, painting.list_availabilty[row_indices]]).astype(numpy.uint32)
+            opencl_event = pyopencl.enqueue_copy(opencl_queue, getStagingBuffer_openCL(painting, 'avail_updates', host_updates.nbytes), host_updates, is_blocking=False)
+            opencl_kernels['updateAvailability_openCL'](opencl_queue, (host_updates.shape[0],), None, painting.opencl_buffers['avail_updates'], painting.opencl_buffers['avail_coords'], wait_for=[opencl_event])
+        painting.list_opencl_changed_rows.clear()
+
+
+# gives a reusable device buffer of at least the requested size, only re-allocating it when it is too small
+def getStagingBuffer_openCL(painting, buffer_name, buffer_size):
+    if ((buffer_name not in painting.opencl_buffers) or (painting.opencl_buffers[buffer_name].size < buffer_size)):
+        painting.opencl_buffers[buffer_name] = pyopencl.Buffer(opencl_context, pyopencl.mem_flags.READ_ONLY, max(buffer_size, 4096))
+    return painting.opencl_buffers[buffer_name]
 
-    color_to_paint = [0,0,0]
-    coordinate_to_paint = [0,0]
 
-    number_of_workers = min(((count_available//config.DEFAULT_PAINTER['LOCATIONS_PER_PAINTER']), config.DEFAULT_PAINTER['MAX_PAINTERS_GPU'], (NUMBER_OF_COLORS - index_all_colors)))
+# =============================================================================
+# BACKENDS
+# =============================================================================
+# each backend is only imported and initialized by its loader the first time it is needed
+BACKEND_LOADERS = dict(
+    multiprocessing = loadBackend_multiprocessing,
+    numba = loadBackend_numba,
+    opencl = loadBackend_openCL
+)
+
+
+# the work done by each backend to continue the painting, placing one color with the main process or many with the workers of -multi
+BACKEND_WORK = dict(
+    python = (sequentialWork_python, parallelWork_python),
+    numba = (sequentialWork_numba, parallelWork_python),
+    numpy = (sequentialWork_numpy, parallelWork_python),
+    opencl = (sequentialWork_openCL, parallelWork_openCL),
+    rtree = (sequentialWork_colorIndex, parallelWork_colorIndex)
+)
+
+
+# backends that each painting loads for itself, given its Painter; the others are loaded once by the process
+PAINTING_BACKENDS = ['multiprocessing']
+
+
+# arguments that select each of the built in backends
+BACKEND_ARGUMENTS = dict(
+    python = None,
+    numba = 'numba',
+    numpy = 'numpy',
+    opencl = 'opencl',
+    rtree = 'rtree'
+)
+
+
+# loads the requested backend if it has not been loaded yet, for the given painting or for the whole process
+#   paintings on other threads may need a backend of the process at the same time, only the first of them loads it
+def loadBackend(painting, backend_name):
+
+    if (backend_name in PAINTING_BACKENDS):
+        if (backend_name not in painting.list_painting_backends):
+            BACKEND_LOADERS[backend_name](painting)
+            painting.list_painting_backends.append(backend_name)
+        return
 
-    host_colors = numpy.zeros((number_of_workers * 3), dtype=numpy.uint32)
+    with backend_loader_lock:
+        if (backend_name not in list_loaded_backends):
+            BACKEND_LOADERS[backend_name]()
+            list_loaded_backends.append(backend_name)
 
-    for worker_index in range(number_of_workers):
-        # get the color to be placed
-        color_selected = list_all_colors[index_all_colors]
-        index_all_colors += 1
 
-        host_colors[(worker_index * 3) + 0] = color_selected[0]
-        host_colors[(worker_index * 3) + 1] = color_selected[1]
-        host_colors[(worker_index * 3) + 2] = color_selected[2]
+# adds a backend that a Painter can be made with, or replaces one; the work functions are given the Painter of the painting they continue
+def registerBackend(backend_name, sequential_work, parallel_work):
+    BACKEND_WORK[backend_name] = (sequential_work, parallel_work)
 
-    # find the best location for that color
-    host_result = numpy.zeros((number_of_workers * 5), dtype=numpy.uint32)
-    host_avail_coords = numpy.array(list_availabilty, dtype=numpy.uint32).flatten()
-    host_canvas = canvas_actual_color.flatten(order='C')
-    host_x_dim = numpy.array([canvas_actual_color.shape[0]], dtype=numpy.uint32)
-    host_y_dim = numpy.array([canvas_actual_color.shape[1]], dtype=numpy.uint32)
-    host_avail_count = numpy.array([count_available], dtype=numpy.uint32)
-    host_mode = numpy.array([config.PARSED_ARGS.q], dtype=numpy.uint32)
-
-    dev_result = pyopencl.Buffer(opencl_context, pyopencl.mem_flags.WRITE_ONLY, host_result.nbytes)
-    dev_colors = pyopencl.Buffer(opencl_context, pyopencl.mem_flags.READ_ONLY | pyopencl.mem_flags.COPY_HOST_PTR, hostbuf=host_colors)
-    dev_avail_coords = pyopencl.Buffer(opencl_context, pyopencl.mem_flags.READ_ONLY | pyopencl.mem_flags.COPY_HOST_PTR, hostbuf=host_avail_coords)
-    dev_canvas = pyopencl.Buffer(opencl_context, pyopencl.mem_flags.READ_ONLY | pyopencl.mem_flags.COPY_HOST_PTR, hostbuf=host_canvas)
-    dev_x_dim = pyopencl.Buffer(opencl_context, pyopencl.mem_flags.READ_ONLY | pyopencl.mem_flags.COPY_HOST_PTR, hostbuf=host_x_dim)
-    dev_y_dim = pyopencl.Buffer(opencl_context, pyopencl.mem_flags.READ_ONLY | pyopencl.mem_flags.COPY_HOST_PTR, hostbuf=host_y_dim)
-    dev_avail_count = pyopencl.Buffer(opencl_context, pyopencl.mem_flags.READ_ONLY | pyopencl.mem_flags.COPY_HOST_PTR, hostbuf=host_avail_count)
-    dev_mode = pyopencl.Buffer(opencl_context, pyopencl.mem_flags.READ_ONLY | pyopencl.mem_flags.COPY_HOST_PTR, hostbuf=host_mode)
-
-    # launch the kernel
-    opencl_event = opencl_kernel.getBestPositionForColor_openCL(opencl_queue, (number_of_workers,), None, dev_result, dev_colors, dev_avail_coords, dev_canvas, dev_x_dim, dev_y_dim, dev_avail_count, dev_mode)
-    opencl_event.wait()
 
-    # copy the output from the context to the Python process
-    pyopencl.enqueue_copy(opencl_queue, host_result, dev_result)
+# gives the arguments for painting with the named backend, the setup and the searches read the backend from the arguments
+#   a built in backend has its argument set and the arguments of the others cleared; raises ValueError if it cannot be used with the other arguments
+def getBackendArgs(painting_args, backend_name):
 
-    for worker_index in range(number_of_workers):
+    if ((backend_name not in BACKEND_ARGUMENTS) or (getBackendName(painting_args) == backend_name)):
+        return painting_args
 
-        # // record selected color
-        color_to_paint[0] = host_result[worker_index * 5 + 0]
-        color_to_paint[1] = host_result[worker_index * 5 + 1]
-        color_to_paint[2] = host_result[worker_index * 5 + 2]
+    backend_args = copy.copy(painting_args)
+    for argument_name in BACKEND_ARGUMENTS.values():
+        if (argument_name):
+            setattr(backend_args, argument_name, (argument_name == BACKEND_ARGUMENTS[backend_name]))
+    config.checkArgs(backend_args)
+    return backend_args
 
-        # // record best position
-        coordinate_to_paint[0] = host_result[worker_index * 5 + 3]
-        coordinate_to_paint[1] = host_result[worker_index * 5 + 4]
 
-        # attempt to paint the color at the corresponding location
-        paintToCanvas(color_to_paint, coordinate_to_paint)
+# gives the name of the backend selected by the arguments
+def getBackendName(painting_args):
+
+    if (painting_args.rtree):
+        return 'rtree'
+    elif (painting_args.opencl):
+        return 'opencl'
+    elif (painting_args.numba):
+        return 'numba'
+    elif (painting_args.numpy):
+        return 'numpy'
+    return 'python'
 
 
 # =============================================================================
 # BIOLER-PLATE
 # =============================================================================
 if __name__ == '__main__':
+    config.parseArgs()
     main()
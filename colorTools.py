@@ -1,81 +1,186 @@
-import concurrent.futures
-import time
 import numpy
-import colorsys
-import config
 
-# generate all colors of the color space, then shuffle the resulting array
+import os
+import tempfile
 
-COLOR_BIT_DEPTH = config.PARSED_ARGS.c
-VALUES_PER_CHANNEL = 2**COLOR_BIT_DEPTH
-NUMBER_SUB_COLORS = VALUES_PER_CHANNEL**2
-NUMBER_ALL_COLORS = VALUES_PER_CHANNEL**3
+# number of colors converted at once, bounds the size of the temporary float arrays
+COLORS_PER_CHUNK = 2**20
 
-USE_SHUFFLE = config.PARSED_ARGS.x
-HLS = config.PARSED_ARGS.hls
-HSV = config.PARSED_ARGS.hsv
+# OKLab, from linear [R,G,B] to cone responses, then from their cube roots to [L,a,b]
+OKLAB_TO_LMS = numpy.array([[0.4122214708, 0.5363325363, 0.0514459929], [0.2119034982, 0.6806995451, 0.1073969566], [0.0883024619, 0.2817188376, 0.6299787005]])
+OKLAB_FROM_LMS = numpy.array([[0.2104542553, 0.7936177850, -0.0040720468], [1.9779984951, -2.4285922050, 0.4505937099], [0.0259040371, 0.7827717662, -0.8086757660]])
+# OKLab colors are scaled and offset into bytes, the same scale on every channel so that distances are unchanged
+#   lightness starts at 1, so no color is black [0,0,0] like an unpainted location
+OKLAB_SCALE = 254
+OKLAB_OFFSET = numpy.array([1, 60, 80])
+# the OKLab byte colors of each color bit depth, made once in the user's cache directory and then memory mapped by every painting
+#   the table of a bit depth holds the colors generateColors makes with it, the table of no bit depth holds every [R,G,B] color
+PERCEPTUAL_TABLE_DIRECTORY = os.path.join(os.environ.get('XDG_CACHE_HOME', os.path.join(os.path.expanduser('~'), '.cache')), 'colorShredder')
+
+# the channel values and perceptual table of each bit depth, mapped by getPerceptualTable the first time they are needed
+perceptual_tables = {}
+
+# colorsys constants, kept identical so the vectorized conversions give the same results
+ONE_THIRD = 1.0/3.0
+ONE_SIXTH = 1.0/6.0
+TWO_THIRD = 2.0/3.0
+
+
+# generate all colors of the color space in the order they will be painted
+#   every color is identified by its index into the color cube, chan1_val * values_per_channel**2 + chan2_val * values_per_channel + chan3_val
+#   the order of the indexes is decided first, then the colors are produced from them one chunk at a time
+#   the order is drawn from the given numpy RandomState, so the same seed or saved state gives the same colors
+def generateColors(parsed_args, random_state):
 
-def generateColors():
-    
-    global USE_SHUFFLE
-    
     # Setup
-    list_of_all_colors = numpy.zeros([((2**COLOR_BIT_DEPTH)**3), 3], numpy.uint16)
-
-    hues = numpy.array(range((2**COLOR_BIT_DEPTH)))
-    numpy.random.shuffle(hues)
-
-    # using multiprocessing kick off a worker for each chan1_val value in range of chan1_val values
-    process_pool_executor = concurrent.futures.ProcessPoolExecutor()
-    process_pool_results = [process_pool_executor.submit(colorWorker, chan1_val) for chan1_val in hues]
-
-    # for each worker as it completes, insert its results into the array
-    # the order that this happens does not matter as the array will be shuffled anywasys
-    index_in_color_list = 0
-    for color_sub_list in concurrent.futures.as_completed(process_pool_results):
-        list_of_all_colors[index_in_color_list * NUMBER_SUB_COLORS: (index_in_color_list + 1) * NUMBER_SUB_COLORS] = color_sub_list.result()
-        index_in_color_list += 1
-        print("Generating colors... {:3.2f}".format(100*index_in_color_list/(2**COLOR_BIT_DEPTH)) + '%' + " complete.", end='\r')
+    color_bit_depth = parsed_args.c
+    values_per_channel = 2**color_bit_depth
+    number_sub_colors = values_per_channel**2
+    number_of_colors = values_per_channel**3
+    use_shuffle = parsed_args.x
+    list_of_all_colors = numpy.zeros([number_of_colors, 3], numpy.uint8)
+
+    if (use_shuffle < 0):
+        # every color in a random order
+        list_color_indexes = random_state.permutation(number_of_colors)
+    else:
+        # colors grouped by chan1_val, the groups in a random order and the colors within each group in a random order
+        hues = random_state.permutation(values_per_channel)
+        list_color_indexes = numpy.zeros([number_of_colors], numpy.int64)
+        for index_hue, chan1_val in enumerate(hues):
+            list_color_indexes[index_hue * number_sub_colors: (index_hue + 1) * number_sub_colors] = (chan1_val * number_sub_colors) + random_state.permutation(number_sub_colors)
+
+    # convert each chunk of indexes into colors
+    for index_chunk in range(0, number_of_colors, COLORS_PER_CHUNK):
+        list_of_all_colors[index_chunk: index_chunk + COLORS_PER_CHUNK] = getColorsForIndexes(list_color_indexes[index_chunk: index_chunk + COLORS_PER_CHUNK], color_bit_depth, (use_shuffle - 1), parsed_args.hls, parsed_args.hsv)
+        print("Generating colors... {:3.2f}".format(100*min(index_chunk + COLORS_PER_CHUNK, number_of_colors)/number_of_colors) + '%' + " complete.", end='\r')
     print("")
 
-    if (USE_SHUFFLE < 0):
-        print("Shuffling colors...  (This may take a long time for higher color bit-depths)")
-        numpy.random.shuffle(list_of_all_colors)
+    return list_of_all_colors
 
+
+# for the given color cube indexes produce the [R,G,B] uint8 colors
+def getColorsForIndexes(list_color_indexes, color_bit_depth, channel_shift, use_hls, use_hsv):
+
+    # Setup
+    values_per_channel = 2**color_bit_depth
+    output_color = [None, None, None]
+
+    # split the indexes into the value of each channel, then put each channel in its place
+    output_color[(0 + channel_shift) % 3] = (list_color_indexes >> (2 * color_bit_depth)) / values_per_channel
+    output_color[(1 + channel_shift) % 3] = ((list_color_indexes >> color_bit_depth) & (values_per_channel - 1)) / values_per_channel
+    output_color[(2 + channel_shift) % 3] = (list_color_indexes & (values_per_channel - 1)) / values_per_channel
+
+    if (use_hls):
+        rgb_color = hlsToRgb(output_color[0], output_color[1], output_color[2])
+    elif (use_hsv):
+        rgb_color = hsvToRgb(output_color[0], output_color[1], output_color[2])
     else:
-        USE_SHUFFLE = 1
+        rgb_color = output_color
 
-    return list_of_all_colors
+    return (numpy.stack(rgb_color, axis=1) * 255).astype(numpy.uint8)
+
+
+# colorsys.hls_to_rgb over arrays of h, l, and s
+def hlsToRgb(h, l, s):
+
+    m2 = numpy.where((l <= 0.5), (l * (1.0+s)), (l+s-(l*s)))
+    m1 = 2.0*l - m2
+    rgb_color = [getHlsChannel(m1, m2, h+ONE_THIRD), getHlsChannel(m1, m2, h), getHlsChannel(m1, m2, h-ONE_THIRD)]
+
+    # without saturation every channel is the lightness
+    return [numpy.where((s == 0.0), l, channel) for channel in rgb_color]
+
+
+# colorsys._v over arrays, gives one channel of an hls color
+def getHlsChannel(m1, m2, hue):
+
+    hue = hue % 1.0
+    return numpy.select([(hue < ONE_SIXTH), (hue < 0.5), (hue < TWO_THIRD)], [(m1 + (m2-m1)*hue*6.0), m2, (m1 + (m2-m1)*(TWO_THIRD-hue)*6.0)], m1)
+
+
+# colorsys.hsv_to_rgb over arrays of h, s, and v
+def hsvToRgb(h, s, v):
+
+    i = (h*6.0).astype(numpy.int64)
+    f = (h*6.0) - i
+    p = v*(1.0 - s)
+    q = v*(1.0 - s*f)
+    t = v*(1.0 - s*(1.0-f))
+    i = i%6
+
+    # pick the channels for the sextant of the hue
+    rgb_color = [numpy.choose(i, [v, q, p, p, t, v]), numpy.choose(i, [t, v, v, q, p, p]), numpy.choose(i, [p, p, t, v, v, q])]
 
+    # without saturation every channel is the value
+    return [numpy.where((s == 0.0), v, channel) for channel in rgb_color]
 
-# for a given chan1_val value generate every color possible with the remaing chan3_val and chan2_val values
-def colorWorker(chan1_val):
+
+# gives the bit depth of the perceptual table holding every color that the configuration generates
+#   -hls and -hsv colors can be any [R,G,B] color, they are looked up in the table of no bit depth
+def getPerceptualBitDepth(parsed_args):
+
+    if (parsed_args.hls or parsed_args.hsv):
+        return None
+    return parsed_args.c
+
+
+# gives the OKLab bytes of each of the given [R,G,B] uint8 colors, looked up in the perceptual table of the given bit depth
+#   each channel value is found among the channel values of the table, the colors must be ones the table holds
+def getPerceptualColors(list_colors, color_bit_depth):
+
+    # Setup
+    list_channel_values, perceptual_table = getPerceptualTable(color_bit_depth)
+    list_channel_indexes = numpy.searchsorted(list_channel_values, list_colors)
+
+    return perceptual_table[list_channel_indexes[..., 0], list_channel_indexes[..., 1], list_channel_indexes[..., 2]]
+
+
+# gives the channel values of the colors in the perceptual table of a bit depth, the values getColorsForIndexes gives each channel at that depth
+#   the table of no bit depth has every channel value
+def getPerceptualChannelValues(color_bit_depth):
+
+    if (color_bit_depth is None):
+        return numpy.arange(256)
+    return ((numpy.arange(2**color_bit_depth) * 255) // (2**color_bit_depth))
+
+
+# gives the channel values and a read only memory map of the perceptual table of a bit depth, indexed by the place of each channel value among them
+#   the table is made the first time it is needed, and written under a temporary name of its own so it is only found once it is complete
+#   processes making it at the same time each write their own, the last one replaces the others
+def getPerceptualTable(color_bit_depth):
+    # Global Access
+    global perceptual_tables
+
+    if (color_bit_depth not in perceptual_tables):
+        list_channel_values = getPerceptualChannelValues(color_bit_depth)
+        table_name = os.path.join(PERCEPTUAL_TABLE_DIRECTORY, ('oklab.npy' if (color_bit_depth is None) else ('oklab' + str(color_bit_depth) + '.npy')))
+        if not (os.path.exists(table_name)):
+            os.makedirs(PERCEPTUAL_TABLE_DIRECTORY, exist_ok=True)
+            with tempfile.NamedTemporaryFile(dir=PERCEPTUAL_TABLE_DIRECTORY, suffix='.tmp', delete=False) as table_file:
+                numpy.save(table_file, getOklabTable(list_channel_values))
+            os.replace(table_file.name, table_name)
+        perceptual_tables[color_bit_depth] = (list_channel_values, numpy.load(table_name, mmap_mode='r').view(numpy.ndarray))
+
+    return perceptual_tables[color_bit_depth]
+
+
+# produces the OKLab uint8 color of every color made of the given channel values, one chunk at a time
+def getOklabTable(list_channel_values):
 
     # Setup
-    color_sub_list = numpy.zeros([VALUES_PER_CHANNEL**2, 3], numpy.uint16)
-    index_in_color_sub_list = 0
-    output_color = [0,0,0]
-    channel_shift = (USE_SHUFFLE - 1)
-
-    # loop over every value of chan3_val and chan2_val producing each color that can have the given chan1_val
-    for chan2_val in range(VALUES_PER_CHANNEL):
-        for chan3_val in range(VALUES_PER_CHANNEL):
-            # insert the color in its place
-
-            output_color[(0 + channel_shift) % 3] = chan1_val / VALUES_PER_CHANNEL
-            output_color[(1 + channel_shift) % 3] = chan2_val / VALUES_PER_CHANNEL
-            output_color[(2 + channel_shift) % 3] = chan3_val / VALUES_PER_CHANNEL
-
-            if (HLS):
-                rgb_color = colorsys.hls_to_rgb((output_color[0]), (output_color[1]), (output_color[2]))
-            elif (HSV):
-                rgb_color = colorsys.hsv_to_rgb((output_color[0]), (output_color[1]), (output_color[2]))
-            else:
-                rgb_color = ((output_color[0]), (output_color[1]), (output_color[2]))
-
-            color_sub_list[index_in_color_sub_list] = numpy.array([(rgb_color[0] * 255), (rgb_color[1] * 255), (rgb_color[2] * 255)], numpy.uint16)
-            index_in_color_sub_list += 1
-
-    # return all colors with the given chan1_val value
-    numpy.random.shuffle(color_sub_list)
-    return color_sub_list
\ No newline at end of file
+    values_per_channel = list_channel_values.shape[0]
+    number_of_colors = values_per_channel**3
+    list_oklab_colors = numpy.zeros([number_of_colors, 3], numpy.uint8)
+
+    for index_chunk in range(0, number_of_colors, COLORS_PER_CHUNK):
+        chunk_indexes = numpy.arange(index_chunk, min((index_chunk + COLORS_PER_CHUNK), number_of_colors))
+        rgb_color = numpy.stack([list_channel_values[chunk_indexes // (values_per_channel**2)], list_channel_values[(chunk_indexes // values_per_channel) % values_per_channel], list_channel_values[chunk_indexes % values_per_channel]], axis=1) / 255.0
+
+        # undo the sRGB transfer curve, then convert the linear color
+        rgb_linear = numpy.where((rgb_color <= 0.04045), (rgb_color / 12.92), (((rgb_color + 0.055) / 1.055)**2.4))
+        oklab_color = numpy.cbrt(rgb_linear @ OKLAB_TO_LMS.T) @ OKLAB_FROM_LMS.T
+
+        list_oklab_colors[index_chunk: index_chunk + COLORS_PER_CHUNK] = numpy.clip(numpy.rint((oklab_color * OKLAB_SCALE) + OKLAB_OFFSET), 0, 255)
+
+    return list_oklab_colors.reshape(values_per_channel, values_per_channel, values_per_channel, 3)
@@ -1,7 +1,7 @@
 import os
+import json
 import numpy
 import argparse
-import rtree
 
 
 MODES = dict(
@@ -14,14 +14,17 @@ MODES = dict(
 DEFAULT_MODE = dict(
     GET_BEST_POSITION_MODE = MODES['DEFAULT'],
     USE_NUMBA = False,
+    USE_NUMPY = False,
     USE_OPENCL = False,
-    USE_RTREE = False
+    USE_RTREE = False,
+    USE_OKLAB = False
 )
 
 DEFAULT_COLOR = dict(
     COLOR_BIT_DEPTH = 6,
     SHUFFLE = True,
     SHUFFLE_CHANNEL = -1,
+    SEED = None,
     HLS = False,
     HSV = False,
     MULTIPROCESSING = True
@@ -31,14 +34,35 @@ DEFAULT_PAINTER = dict(
     LOCATIONS_PER_PAINTER = 200,
     MIN_MULTI_WORKLOAD = 400,
     MULTIPROCESSING = False,
+    PARTITION_FRONTIER = False,
+    MIN_PARTITION_SIZE = 2000,
     MAX_PAINTERS_CPU = (os.cpu_count() * 2),
     MAX_PAINTERS_GPU = (64 * 4),
     PRINT_RATE = 100,
+    CHECKPOINT_INTERVAL = 600,
+    MAX_QUEUED_SNAPSHOTS = 4,
+    STREAM_FRAMES = False,
+    FRAME_RATE = 6,
+    JOURNAL_PLACEMENTS = False,
+    JOURNAL_BLOCK_SIZE = 2**16,
+    PHASE_TIMERS = False,
+    PROFILE_WINDOW = None,
     DEBUG_WAIT = False,
     DEBUG_WAIT_TIME = 1,
     PAINTING_NAME = "painting"
 )
 
+DEFAULT_INDEX = dict(
+    CELLS_PER_CHANNEL = 16,
+    CANDIDATES_PER_COLOR = 4
+)
+
+DEFAULT_APPROX = dict(
+    SAMPLE_FRACTION = 1.0,
+    MIN_SAMPLED_LOCATIONS = 256,
+    QUALITY_SAMPLE_RATE = 100
+)
+
 DEFAULT_CANVAS = dict(
     CANVAS_WIDTH = 64,
     CANVAS_HEIGHT = 64,
@@ -46,8 +70,6 @@ DEFAULT_CANVAS = dict(
     START_Y = 0
 )
 
-print("")
-
 # Arguments
 CONFIG_PARSER = argparse.ArgumentParser(
     description="The Color Shredder chooses colors from a randomized set, placing colors one at a time in the location where the color \"fits best\". There are three available strategies for best fit. The process can also be accelerated with CPU Parallelism, Just-In-Time Compilation, OpenCL Parallelism, or a Spatial Data Structure.",
@@ -57,39 +79,100 @@ CONFIG_PARSER = argparse.ArgumentParser(
 CONFIG_PARSER.add_argument('-hls', action='store_true', help='generate colors using hls color space', default=DEFAULT_COLOR['HLS'])
 CONFIG_PARSER.add_argument('-hsv', action='store_true', help='generate colors using hsv color space', default=DEFAULT_COLOR['HSV'])
 CONFIG_PARSER.add_argument('-multi', action='store_true', help='enable multiprocessing for painting', default=DEFAULT_PAINTER['MULTIPROCESSING'])
+CONFIG_PARSER.add_argument('-partition', action='store_true', help='with -multi, split the search for each color across workers so the painting matches a single process', default=DEFAULT_PAINTER['PARTITION_FRONTIER'])
 CONFIG_PARSER.add_argument('-numba', action='store_true', help='enable just in time compilation for painting', default=DEFAULT_MODE['USE_NUMBA'])
-CONFIG_PARSER.add_argument('-rtree', action='store_true', help='use rTree for painting', default=DEFAULT_MODE['USE_RTREE'])
+CONFIG_PARSER.add_argument('-numpy', action='store_true', help='enable vectorized numpy search for painting', default=DEFAULT_MODE['USE_NUMPY'])
+CONFIG_PARSER.add_argument('-rtree', action='store_true', help='use a color space spatial index for painting', default=DEFAULT_MODE['USE_RTREE'])
 CONFIG_PARSER.add_argument('-opencl', action='store_true', help='use rTree for painting', default=DEFAULT_MODE['USE_OPENCL'])
+CONFIG_PARSER.add_argument('-oklab', action='store_true', help='compare colors by their distance in the OKLab perceptual color space instead of [R,G,B]', default=DEFAULT_MODE['USE_OKLAB'])
+CONFIG_PARSER.add_argument('-approx', metavar='frac', help='for each color score only about this fraction of the available locations, sampled at random, and report the quality lost; 1 searches them all', default=DEFAULT_APPROX['SAMPLE_FRACTION'], type=float)
 CONFIG_PARSER.add_argument('-c', metavar='dep', help='color space bit depth', default=DEFAULT_COLOR['COLOR_BIT_DEPTH'], type=int)
+CONFIG_PARSER.add_argument('-seed', metavar='seed', help='seed the color shuffle so that a painting can be repeated', default=DEFAULT_COLOR['SEED'], type=int)
 CONFIG_PARSER.add_argument('-x', metavar='chan', help='leave a color channel (1, 2, or 3) un-shuffled', default=DEFAULT_COLOR['SHUFFLE_CHANNEL'], type=int)
 CONFIG_PARSER.add_argument('-d', metavar='dim', nargs=2, help='dimensions of the output image', default=[DEFAULT_CANVAS['CANVAS_WIDTH'], DEFAULT_CANVAS['CANVAS_HEIGHT']], type=int)
 CONFIG_PARSER.add_argument('-s', metavar='crd', nargs=2, help='coordinates of the starting location', default=[DEFAULT_CANVAS['START_X'], DEFAULT_CANVAS['START_Y']], type=int)
 CONFIG_PARSER.add_argument('-f', metavar='flnm', help='name of output image', default=DEFAULT_PAINTER['PAINTING_NAME'], type=str)
 CONFIG_PARSER.add_argument('-r', metavar='rate', help='info print and update painting at this pixel rate', default=DEFAULT_PAINTER['PRINT_RATE'], type=int)
 CONFIG_PARSER.add_argument('-q', metavar='strt', choices=[1, 2, 3], help='strategy for choosing best location: min:0, avg:1, or quick:2', default=DEFAULT_MODE['GET_BEST_POSITION_MODE'], type=int)
+CONFIG_PARSER.add_argument('-stream', action='store_true', help='stream the animation frames to ffmpeg as they are painted, instead of writing a png of every frame to the painting directory', default=DEFAULT_PAINTER['STREAM_FRAMES'])
+CONFIG_PARSER.add_argument('-journal', action='store_true', help='record every placement in a journal that render.py can make frames from after painting, use with -r 0 to skip the snapshots', default=DEFAULT_PAINTER['JOURNAL_PLACEMENTS'])
+CONFIG_PARSER.add_argument('-memmap', metavar='dir', help='back the canvas arrays with files in a new directory in this directory, for canvases larger than memory; no snapshots or animation are made, only the stats and the finished painting, use -journal and render.py for frames', default=None, type=str)
+CONFIG_PARSER.add_argument('-checkpoint', metavar='secs', help='write a checkpoint to resume from every this many seconds, 0 to disable', default=DEFAULT_PAINTER['CHECKPOINT_INTERVAL'], type=int)
+CONFIG_PARSER.add_argument('-timers', action='store_true', help='time each phase of painting, adding the seconds spent in each phase to the stats CSV', default=DEFAULT_PAINTER['PHASE_TIMERS'])
+CONFIG_PARSER.add_argument('-profile', metavar=('start', 'count'), nargs=2, help='profile the main process while it places count colors, starting once start colors are placed', default=DEFAULT_PAINTER['PROFILE_WINDOW'], type=int)
+CONFIG_PARSER.add_argument('--resume', metavar='file', help='continue the painting saved in a checkpoint, using the arguments it was started with', default=None, type=str)
 CONFIG_PARSER.add_argument('-debug', action='store_true', help='generate colors using hls color space', default=DEFAULT_PAINTER['DEBUG_WAIT'])
-PARSED_ARGS = CONFIG_PARSER.parse_args()
-
-print("")
-if (PARSED_ARGS.rtree and PARSED_ARGS.multi):
-    print("Cannot use -m and -t together")
-    quit()
-if (PARSED_ARGS.rtree and PARSED_ARGS.numba):
-    print("Cannot use -j and -t together")
-    quit()
-if (PARSED_ARGS.rtree and not (PARSED_ARGS.q == 3)):
-    print("When using the rTree, shredder can only utilize the quick strategy")
-    quit()
-if not (PARSED_ARGS.r):
-    PARSED_ARGS.r = max(PARSED_ARGS.r, DEFAULT_PAINTER['MAX_PAINTERS'])
-
-
-# rTree properties
-index_properties = rtree.index.Property()
-index_properties.storage = rtree.index.RT_Memory
-index_properties.dimension = 3
-index_properties.variant = rtree.index.RT_Star
-# index_properties.near_minimum_overlap_factor = 32
-index_properties.leaf_capacity = 32
-index_properties.index_capacity = 32
-index_properties.fill_factor = 0.1
\ No newline at end of file
+
+# the parsed arguments, set by parseArgs() rather than at import so that importing has no side effects
+PARSED_ARGS = None
+
+
+# parses and checks the given command line arguments (sys.argv when None), then makes them the active configuration
+def parseArgs(argv=None):
+
+    # Global Access
+    global PARSED_ARGS
+
+    print("")
+    parsed_args = getResumedArgs(CONFIG_PARSER.parse_args(argv))
+
+    print("")
+    try:
+        checkArgs(parsed_args)
+    except ValueError as error:
+        print(error)
+        quit()
+
+    PARSED_ARGS = parsed_args
+    return PARSED_ARGS
+
+
+# gives the configuration of a painting without a command line: the default of every argument, replaced by the given options
+#   options are named like the arguments without their dashes, for example makeArgs(d=[128, 128], q=2, numpy=True)
+#   raises ValueError for unknown options and options that cannot be used together
+#   the checkpoint and -memmap paths are made absolute, so the painting finds them from whichever directory it is painted in
+def makeArgs(**options):
+
+    parsed_args = CONFIG_PARSER.parse_args([])
+    for option_name, option_value in options.items():
+        if not (hasattr(parsed_args, option_name)):
+            raise ValueError("Unknown option " + option_name)
+        setattr(parsed_args, option_name, option_value)
+
+    if (parsed_args.resume):
+        parsed_args.resume = os.path.abspath(parsed_args.resume)
+    parsed_args = getResumedArgs(parsed_args)
+    if (parsed_args.memmap):
+        parsed_args.memmap = os.path.abspath(parsed_args.memmap)
+    checkArgs(parsed_args)
+    return parsed_args
+
+
+# resuming a painting continues it with the arguments it was started with
+#   arguments added since the checkpoint was written take their defaults
+def getResumedArgs(parsed_args):
+
+    if (parsed_args.resume):
+        with numpy.load(parsed_args.resume) as checkpoint:
+            parsed_args = argparse.Namespace(**dict(vars(CONFIG_PARSER.parse_args([])), **dict(json.loads(str(checkpoint['arguments'])), resume=parsed_args.resume)))
+
+    return parsed_args
+
+
+# raises ValueError if the configuration uses arguments that cannot be used together
+def checkArgs(parsed_args):
+
+    if (parsed_args.rtree and parsed_args.numba):
+        raise ValueError("Cannot use -j and -t together")
+    if (parsed_args.rtree and parsed_args.numpy):
+        raise ValueError("Cannot use -numpy and -t together")
+    if (parsed_args.partition and not (parsed_args.multi)):
+        raise ValueError("Cannot use -partition without -multi")
+    if (parsed_args.partition and (parsed_args.rtree or parsed_args.opencl or parsed_args.numba)):
+        raise ValueError("Cannot use -partition with -rtree, -opencl, or -numba")
+    if (parsed_args.stream and parsed_args.memmap):
+        raise ValueError("Cannot use -stream with -memmap, -memmap paintings have no animation frames")
+    if not (0.0 < parsed_args.approx <= 1.0):
+        raise ValueError("-approx must be more than 0 and at most 1")
+    if ((parsed_args.approx < 1.0) and (parsed_args.multi or parsed_args.rtree or parsed_args.opencl)):
+        raise ValueError("Cannot use -approx with -multi, -rtree, or -opencl")
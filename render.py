@@ -0,0 +1,122 @@
+# =============================================================================
+# MODULES
+# =============================================================================
+import png
+import numpy
+
+import argparse
+import concurrent.futures
+import subprocess
+import os
+import sys
+
+import colorShredder
+
+
+# =============================================================================
+# MACROS
+# =============================================================================
+DEFAULT_RENDER = dict(
+    FRAME_COUNT = 100,
+    SCALE = 1,
+    FRAMES_DIRECTORY = "render",
+    FRAME_RATE = 6,
+    WORKERS = (os.cpu_count() or 1)
+)
+
+# Arguments
+RENDER_PARSER = argparse.ArgumentParser(
+    description="Renders the frames of a painting from the placement journal written by colorShredder.py -journal, and optionally makes an animation from them with ffmpeg.",
+    allow_abbrev=False
+)
+RENDER_PARSER.add_argument('journal', metavar='journal', help='placement journal to render', type=str)
+RENDER_PARSER.add_argument('-n', metavar='frms', help='number of frames, evenly spaced over the placements', default=DEFAULT_RENDER['FRAME_COUNT'], type=int)
+RENDER_PARSER.add_argument('-every', metavar='plcs', help='render a frame every this many placements instead of -n frames', default=None, type=int)
+RENDER_PARSER.add_argument('-scale', metavar='scl', help='width and height in pixels of each painted location', default=DEFAULT_RENDER['SCALE'], type=int)
+RENDER_PARSER.add_argument('-o', metavar='dir', help='directory to write the frames to', default=DEFAULT_RENDER['FRAMES_DIRECTORY'], type=str)
+RENDER_PARSER.add_argument('-video', metavar='flnm', help='make an animation of this name from the frames, any format ffmpeg can write', default=None, type=str)
+RENDER_PARSER.add_argument('-fps', metavar='fps', help='frame rate of the animation', default=DEFAULT_RENDER['FRAME_RATE'], type=int)
+RENDER_PARSER.add_argument('-p', metavar='procs', help='number of processes rendering frames', default=DEFAULT_RENDER['WORKERS'], type=int)
+
+
+# =============================================================================
+# RENDER
+# =============================================================================
+def main():
+
+    render_args = RENDER_PARSER.parse_args()
+
+    # Setup
+    canvas_dimensions, journal_records = readJournal(render_args.journal)
+    count_placements = journal_records.shape[0]
+    if not (count_placements):
+        print("The journal has no placements")
+        sys.exit(1)
+
+    # the number of placements painted in each frame, the last frame is always the whole painting
+    if (render_args.every):
+        list_frame_placements = numpy.append(numpy.arange(render_args.every, count_placements, render_args.every), count_placements)
+    else:
+        list_frame_placements = numpy.unique(numpy.linspace(0, count_placements, (render_args.n + 1)).astype(numpy.int64)[1:])
+    list_frame_names = [os.path.join(render_args.o, ("{:06d}".format(index) + '.png')) for index in range(list_frame_placements.shape[0])]
+
+    os.makedirs(render_args.o, exist_ok=True)
+    print("Rendering " + str(len(list_frame_names)) + " frames of " + str(count_placements) + " placements...")
+
+    # each process renders a run of consecutive frames, painting only the placements between them
+    number_of_workers = max(1, min(render_args.p, len(list_frame_names)))
+    list_worker_bounds = numpy.linspace(0, len(list_frame_names), (number_of_workers + 1)).astype(numpy.int64)
+    with concurrent.futures.ProcessPoolExecutor(number_of_workers) as render_manager:
+        list_render_work_queue = [render_manager.submit(renderFrames, render_args.journal, list_frame_placements[list_worker_bounds[index]:list_worker_bounds[index + 1]], list_frame_names[list_worker_bounds[index]:list_worker_bounds[index + 1]], render_args.scale) for index in range(number_of_workers)]
+        for render_worker in list_render_work_queue:
+            render_worker.result()
+
+    if (render_args.video):
+        subprocess.call(['ffmpeg', '-nostats', '-hide_banner', '-loglevel', 'panic', '-y', '-r', str(render_args.fps), '-i', os.path.join(render_args.o, '%06d.png'), render_args.video])
+
+    print("Rendered to " + (render_args.video or render_args.o))
+
+
+# gives the canvas dimensions of a placement journal, and a read only memory map of its records
+#   records after the last whole one, from a painting that was stopped while writing, are left out
+def readJournal(journal_name):
+
+    journal_header = numpy.fromfile(journal_name, colorShredder.JOURNAL_HEADER, 1)
+    if ((journal_header.shape[0] == 0) or (journal_header[0]['magic'] != colorShredder.JOURNAL_MAGIC)):
+        raise ValueError(journal_name + " is not a placement journal")
+
+    count_records = (os.path.getsize(journal_name) - colorShredder.JOURNAL_HEADER.itemsize) // colorShredder.JOURNAL_RECORD.itemsize
+    if not (count_records):
+        return (int(journal_header[0]['width']), int(journal_header[0]['height'])), numpy.zeros(0, colorShredder.JOURNAL_RECORD)
+
+    journal_records = numpy.memmap(journal_name, colorShredder.JOURNAL_RECORD, 'r', offset=colorShredder.JOURNAL_HEADER.itemsize, shape=(count_records,))
+    return (int(journal_header[0]['width']), int(journal_header[0]['height'])), journal_records
+
+
+# runs in a render process: paints the journal up to each of the given placement counts in turn, writing each frame
+def renderFrames(journal_name, list_frame_placements, list_frame_names, scale):
+
+    # Setup
+    canvas_dimensions, journal_records = readJournal(journal_name)
+    canvas_frame = numpy.zeros([canvas_dimensions[0], canvas_dimensions[1], 3], numpy.uint8)
+    frame_painter = png.Writer((canvas_dimensions[0] * scale), (canvas_dimensions[1] * scale), greyscale=False)
+    count_painted = 0
+
+    for count_frame_placements, frame_name in zip(list_frame_placements, list_frame_names):
+
+        # paint the placements since the last frame
+        records_painted = journal_records[count_painted:count_frame_placements]
+        canvas_frame[records_painted['x'], records_painted['y']] = records_painted['color']
+        count_painted = count_frame_placements
+
+        # enlarge each location to scale x scale pixels
+        canvas_scaled = canvas_frame
+        if (scale > 1):
+            canvas_scaled = numpy.repeat(numpy.repeat(canvas_frame, scale, 0), scale, 1)
+
+        with open(frame_name, 'wb') as frame_file:
+            frame_painter.write(frame_file, colorShredder.getRawOutput(canvas_scaled))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,184 @@
+# =============================================================================
+# MODULES
+# =============================================================================
+import numpy
+import pytest
+
+import os
+import hashlib
+
+import colorIndex
+import colorShredder
+import config
+
+
+# =============================================================================
+# MACROS
+# =============================================================================
+# a small painting with a fixed seed, its arrays backed by files in the test directory so that no animation is made with ffmpeg
+PAINTING_OPTIONS = dict(d=[24, 24], s=[12, 12], c=4, seed=7, checkpoint=0, r=0, memmap='.')
+# the backends each strategy is painted with and compared against the python backend
+#   the spatial index of the quick strategy breaks ties in the order of its cells, rather than the packed frontier, so it is not compared
+BACKENDS_COMPARED = [(q, backend_name) for q in (1, 2, 3) for backend_name in ('numpy', 'numba', 'opencl', 'rtree') if not ((backend_name == 'rtree') and (q == 3))]
+
+
+# =============================================================================
+# SETUP
+# =============================================================================
+# every test paints in a directory of its own
+@pytest.fixture(autouse=True)
+def paintingDirectory(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+
+# skips the test if the named backend cannot be loaded here
+def requireBackend(backend_name):
+
+    if (backend_name == 'numba'):
+        pytest.importorskip('numba')
+
+    elif (backend_name == 'opencl'):
+        pyopencl = pytest.importorskip('pyopencl')
+        try:
+            list_platforms = pyopencl.get_platforms()
+        except pyopencl.Error:
+            list_platforms = []
+        if not (list_platforms):
+            pytest.skip("no OpenCL platform")
+
+
+# gives the hash of a canvas
+def getCanvasHash(canvas_painting):
+    return hashlib.md5(numpy.ascontiguousarray(canvas_painting).tobytes()).hexdigest()
+
+
+# paints a painting of the given options to the end; gives the hash of its canvas
+def getPaintingHash(backend_name=None, **options):
+
+    painter = colorShredder.Painter(backend_name=backend_name, **dict(PAINTING_OPTIONS, **options))
+    while (painter.step(PAINTING_OPTIONS['d'][0] * PAINTING_OPTIONS['d'][1])):
+        pass
+    canvas_hash = getCanvasHash(painter.getCanvas())
+    painter.finish()
+    return canvas_hash
+
+
+# =============================================================================
+# PAINTER
+# =============================================================================
+# every backend paints the same painting as the python backend
+@pytest.mark.parametrize('q, backend_name', BACKENDS_COMPARED)
+def testBackendsPaintTheSame(q, backend_name):
+
+    requireBackend(backend_name)
+    assert getPaintingHash(backend_name, q=q, f=backend_name) == getPaintingHash('python', q=q, f='python')
+
+
+# the backends also paint the same painting when comparing colors in OKLab
+@pytest.mark.parametrize('backend_name', ['numpy', 'numba', 'opencl'])
+def testBackendsPaintTheSameOklab(backend_name):
+
+    requireBackend(backend_name)
+    assert getPaintingHash(backend_name, q=2, oklab=True, f=backend_name) == getPaintingHash('python', q=2, oklab=True, f='python')
+
+
+# a frontier split between the workers of -partition gives the same locations as one process searching all of it
+#   the workload and slice sizes are lowered so that even this small painting is split between several workers
+@pytest.mark.parametrize('q', [1, 2, 3])
+@pytest.mark.parametrize('use_numpy', [False, True])
+def testPartitionPaintsTheSame(q, use_numpy, monkeypatch):
+
+    painting_hash = getPaintingHash(q=q, numpy=use_numpy, f='sequential')
+
+    monkeypatch.setitem(config.DEFAULT_PAINTER, 'MIN_MULTI_WORKLOAD', 16)
+    monkeypatch.setitem(config.DEFAULT_PAINTER, 'MIN_PARTITION_SIZE', 16)
+    monkeypatch.setattr(os, 'cpu_count', lambda: 4)
+    assert getPaintingHash(q=q, numpy=use_numpy, multi=True, partition=True, f='partition') == painting_hash
+
+
+# a painting resumed from a checkpoint is painted the same as one that was never stopped
+@pytest.mark.parametrize('backend_name, options', [('python', dict(q=1)), ('numpy', dict(q=2)), ('numpy', dict(q=2, oklab=True)), ('numba', dict(q=3)), ('rtree', dict(q=2)), ('rtree', dict(q=3))])
+def testResumePaintsTheSame(backend_name, options):
+
+    requireBackend(backend_name)
+    painting_hash = getPaintingHash(backend_name, f='uninterrupted', **options)
+
+    painter = colorShredder.Painter(backend_name=backend_name, **dict(PAINTING_OPTIONS, f='resumed', **options))
+    painter.step(PAINTING_OPTIONS['d'][0] * PAINTING_OPTIONS['d'][1] // 3)
+    colorShredder.writeCheckpoint(colorShredder.getCheckpoint(painter), 'resumed.checkpoint.npz')
+    painter.finish()
+
+    painter = colorShredder.Painter(resume='resumed.checkpoint.npz')
+    painter.run()
+    assert getCanvasHash(painter.getCanvas()) == painting_hash
+
+
+# paintings painted in turns in one process each keep their own state
+def testPaintersInTurnsPaintTheSame():
+
+    list_options = [dict(q=1, f='minimum'), dict(q=2, numpy=True, f='average'), dict(q=3, rtree=True, f='quick')]
+    list_hashes = [getPaintingHash(**options) for options in list_options]
+
+    list_painters = [colorShredder.Painter(**dict(PAINTING_OPTIONS, **options)) for options in list_options]
+    list_painting = list(list_painters)
+    while (list_painting):
+        list_painting = [painter for painter in list_painting if painter.step(37)]
+    for painter in list_painters:
+        painter.finish()
+
+    assert [getCanvasHash(painter.getCanvas()) for painter in list_painters] == list_hashes
+
+
+# =============================================================================
+# COLOR INDEX
+# =============================================================================
+# gives a color index holding random colors, many of them the same so that distances are tied, after some are deleted and moved; and its colors by ID
+def getRandomColorIndex(random_state, capacity):
+
+    # Setup
+    color_index = colorIndex.ColorIndex(capacity, cells_per_channel=8)
+    list_colors = random_state.randint(0, 16, [capacity, 3]) * 17
+    list_indexed = numpy.ones(capacity, numpy.bool)
+
+    for entry_id in range(capacity):
+        color_index.insert(entry_id, list_colors[entry_id])
+    for entry_id in random_state.choice(capacity, (capacity // 4), replace=False):
+        color_index.delete(entry_id)
+        list_indexed[entry_id] = False
+    for entry_id in random_state.choice(numpy.flatnonzero(list_indexed), (capacity // 4), replace=False):
+        list_colors[entry_id] = random_state.randint(0, 256, 3)
+        color_index.move(entry_id, list_colors[entry_id])
+
+    return color_index, numpy.where(list_indexed[:, numpy.newaxis], list_colors, -1)
+
+
+# gives the squared euclidian distance from the requested color to each color, None for an ID that is not indexed
+def getBruteForceDistances(list_colors, requested_color):
+    return [(None if (color[0] < 0) else int(numpy.square(color - requested_color).sum())) for color in list_colors]
+
+
+# the nearest entries are as near as the nearest found by checking every entry
+@pytest.mark.parametrize('count', [1, 5])
+def testNearestMatchesBruteForce(count):
+
+    random_state = numpy.random.RandomState(3)
+    color_index, list_colors = getRandomColorIndex(random_state, 500)
+
+    for requested_color in random_state.randint(0, 256, [100, 3]):
+        list_distances = getBruteForceDistances(list_colors, requested_color)
+        nearest_ids = color_index.nearest(requested_color, count)
+        assert [list_distances[entry_id] for entry_id in nearest_ids] == sorted(distance for distance in list_distances if distance is not None)[:count]
+
+
+# the tied entries are every entry at the smallest distance found by checking every entry
+def testNearestTiedMatchesBruteForce():
+
+    random_state = numpy.random.RandomState(4)
+    color_index, list_colors = getRandomColorIndex(random_state, 500)
+
+    for requested_color in random_state.randint(0, 256, [100, 3]):
+        list_distances = getBruteForceDistances(list_colors, requested_color)
+        distance_minimum = min(distance for distance in list_distances if distance is not None)
+        tied_ids, tied_distance = color_index.nearestTied(requested_color)
+        assert tied_distance == distance_minimum
+        assert sorted(tied_ids.tolist()) == [entry_id for entry_id, distance in enumerate(list_distances) if (distance == distance_minimum)]